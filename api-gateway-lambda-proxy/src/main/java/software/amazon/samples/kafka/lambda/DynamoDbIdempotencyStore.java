@@ -0,0 +1,81 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import software.amazon.awssdk.regions.Region;
+import software.amazon.awssdk.services.dynamodb.DynamoDbClient;
+import software.amazon.awssdk.services.dynamodb.model.AttributeValue;
+import software.amazon.awssdk.services.dynamodb.model.ConditionalCheckFailedException;
+
+import java.time.Instant;
+import java.util.Map;
+
+// Idempotency store in a DynamoDB table with the partition key "id" and the TTL attribute "expiration". DynamoDB deletes
+// expired items only eventually, so the expiration is checked on every read and claim.
+public class DynamoDbIdempotencyStore implements IdempotencyStore {
+
+    static final String IN_PROGRESS = "IN_PROGRESS";
+    static final String COMPLETED = "COMPLETED";
+
+    private final DynamoDbClient dynamoDb;
+    private final String tableName;
+
+    public DynamoDbIdempotencyStore(DynamoDbClient dynamoDb, String tableName) {
+        this.dynamoDb = dynamoDb;
+        this.tableName = tableName;
+    }
+
+    // Creates the store of the table IDEMPOTENCY_TABLE, the client is created during init and kept for all invocations
+    public static DynamoDbIdempotencyStore fromEnvironment() {
+        DynamoDbClient dynamoDb = DynamoDbClient.builder()
+                .region(Region.of(System.getenv("AWS_REGION")))
+                .build();
+        return new DynamoDbIdempotencyStore(dynamoDb, System.getenv("IDEMPOTENCY_TABLE"));
+    }
+
+    @Override
+    public String get(String key) {
+        Map<String, AttributeValue> item = dynamoDb.getItem(request -> request.tableName(tableName).key(keyOf(key)).consistentRead(true)).item();
+        if (item == null || item.isEmpty() || isExpired(item) || !COMPLETED.equals(item.get("status").s())) {
+            return null;
+        }
+        return item.get("response").s();
+    }
+
+    @Override
+    public boolean claim(String key, long expiresAt) {
+        try {
+            dynamoDb.putItem(request -> request.tableName(tableName)
+                    .item(Map.of("id", AttributeValue.fromS(key),
+                            "status", AttributeValue.fromS(IN_PROGRESS),
+                            "expiration", AttributeValue.fromN(String.valueOf(expiresAt))))
+                    .conditionExpression("attribute_not_exists(id) OR expiration < :now")
+                    .expressionAttributeValues(Map.of(":now", AttributeValue.fromN(String.valueOf(Instant.now().getEpochSecond())))));
+            return true;
+        } catch (ConditionalCheckFailedException e) {
+            return false;
+        }
+    }
+
+    @Override
+    public void complete(String key, String response, long expiresAt) {
+        dynamoDb.putItem(request -> request.tableName(tableName)
+                .item(Map.of("id", AttributeValue.fromS(key),
+                        "status", AttributeValue.fromS(COMPLETED),
+                        "response", AttributeValue.fromS(response),
+                        "expiration", AttributeValue.fromN(String.valueOf(expiresAt)))));
+    }
+
+    @Override
+    public void release(String key) {
+        dynamoDb.deleteItem(request -> request.tableName(tableName).key(keyOf(key)));
+    }
+
+    private static Map<String, AttributeValue> keyOf(String key) {
+        return Map.of("id", AttributeValue.fromS(key));
+    }
+
+    private static boolean isExpired(Map<String, AttributeValue> item) {
+        return Long.parseLong(item.get("expiration").n()) < Instant.now().getEpochSecond();
+    }
+}
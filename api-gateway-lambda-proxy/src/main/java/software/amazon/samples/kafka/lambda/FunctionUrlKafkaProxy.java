@@ -0,0 +1,95 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.amazonaws.services.lambda.runtime.Context;
+import com.amazonaws.services.lambda.runtime.RequestHandler;
+import com.amazonaws.services.lambda.runtime.events.APIGatewayProxyRequestEvent;
+import com.amazonaws.services.lambda.runtime.events.APIGatewayProxyResponseEvent;
+
+import java.net.URLDecoder;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+
+// Handler of the function URL ingress. Function URLs invoke the function with the payload format 2.0 and without
+// routes: the handler maps the method and path to the resources of the REST API (resource and path parameters) and
+// delegates to SimpleApiGatewayKafkaProxy, so all ingress types share the same request handling.
+public class FunctionUrlKafkaProxy implements RequestHandler<Map<String, Object>, Map<String, Object>> {
+
+    // Path segment of the resource of the stack (apigateway_api_id + "Resource") and the method of the API
+    final String apiResource = System.getenv().getOrDefault("API_RESOURCE", "ProducerAPIResource");
+    final String apiMethod = System.getenv().getOrDefault("API_METHOD", "POST");
+
+    final SimpleApiGatewayKafkaProxy proxy;
+
+    public FunctionUrlKafkaProxy() {
+        this(new SimpleApiGatewayKafkaProxy());
+    }
+
+    FunctionUrlKafkaProxy(SimpleApiGatewayKafkaProxy proxy) {
+        this.proxy = proxy;
+    }
+
+    @Override
+    @SuppressWarnings("unchecked")
+    public Map<String, Object> handleRequest(Map<String, Object> event, Context context) {
+        Map<String, Object> http = (Map<String, Object>) ((Map<String, Object>) event.getOrDefault("requestContext", Map.of())).getOrDefault("http", Map.of());
+        if (!apiMethod.equalsIgnoreCase(String.valueOf(http.get("method")))) {
+            return createResponse(405, "{\"message\": \"Method not allowed\"}");
+        }
+
+        APIGatewayProxyRequestEvent input = toRequest((String) event.get("rawPath"));
+        if (input == null) {
+            return createResponse(404, "{\"message\": \"Not found\"}");
+        }
+        input.withHeaders((Map<String, String>) event.get("headers"))
+                .withBody((String) event.get("body"))
+                .withIsBase64Encoded(Boolean.TRUE.equals(event.get("isBase64Encoded")))
+                .withHttpMethod(apiMethod);
+
+        APIGatewayProxyResponseEvent response = proxy.handleRequest(input, context);
+        Map<String, Object> result = createResponse(response.getStatusCode(), response.getBody());
+        result.put("headers", response.getHeaders());
+        return result;
+    }
+
+    // Maps the path to a resource of the REST API with its path parameters, returns null if there is no such resource:
+    // /<resource>, /<resource>/batch, /<resource>/{key} (path parameter key strategy), /{topic} and /{topic}/batch
+    // (allowed topics)
+    APIGatewayProxyRequestEvent toRequest(String rawPath) {
+        List<String> segments = new ArrayList<>();
+        for (String segment : (rawPath == null ? "" : rawPath).split("/")) {
+            if (!segment.isEmpty()) {
+                segments.add(URLDecoder.decode(segment, StandardCharsets.UTF_8));
+            }
+        }
+        boolean batch = segments.size() == 2 && SimpleApiGatewayKafkaProxy.BATCH_RESOURCE.equals(segments.get(1));
+        Map<String, String> pathParameters = new HashMap<>();
+        String resource;
+        if (segments.size() == 1 && segments.get(0).equals(apiResource)) {
+            resource = "/" + apiResource;
+        } else if (batch && segments.get(0).equals(apiResource)) {
+            resource = "/" + apiResource + "/" + SimpleApiGatewayKafkaProxy.BATCH_RESOURCE;
+        } else if (segments.size() == 2 && segments.get(0).equals(apiResource) && RecordKeyStrategy.PATH_PARAMETER.equals(proxy.keyStrategy.getStrategy())) {
+            resource = "/" + apiResource + "/{" + proxy.keyStrategy.getSource() + "}";
+            pathParameters.put(proxy.keyStrategy.getSource(), segments.get(1));
+        } else if (!proxy.allowedTopics.isEmpty() && (segments.size() == 1 || batch)) {
+            resource = batch ? "/{" + SimpleApiGatewayKafkaProxy.TOPIC_PATH_PARAMETER + "}/" + SimpleApiGatewayKafkaProxy.BATCH_RESOURCE : "/{" + SimpleApiGatewayKafkaProxy.TOPIC_PATH_PARAMETER + "}";
+            pathParameters.put(SimpleApiGatewayKafkaProxy.TOPIC_PATH_PARAMETER, segments.get(0));
+        } else {
+            return null;
+        }
+        return new APIGatewayProxyRequestEvent().withResource(resource).withPath(rawPath).withPathParameters(pathParameters);
+    }
+
+    private static Map<String, Object> createResponse(int statusCode, String body) {
+        Map<String, Object> response = new HashMap<>();
+        response.put("statusCode", statusCode);
+        response.put("headers", Map.of("Content-Type", "application/json"));
+        response.put("body", body);
+        return response;
+    }
+}
@@ -0,0 +1,196 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.fasterxml.jackson.databind.ObjectMapper;
+import com.fasterxml.jackson.databind.node.ObjectNode;
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.io.PrintStream;
+import java.util.Comparator;
+import java.util.HashMap;
+import java.util.LinkedHashMap;
+import java.util.Map;
+import java.util.function.LongSupplier;
+
+// Detects hot keys and salts them, so that the records of a single very frequent key are spread over up to "salts"
+// partitions instead of overloading one. The key frequencies of a window (HOT_KEY_WINDOW_SECONDS) are counted with the
+// Space-Saving algorithm in "capacity" counters, keys with at least "threshold" records in the window are hot: from the
+// record that crosses the threshold until the end of the following window. A salted key is "<key>#<salt>" and the
+// record carries the salt in the header X-Key-Salt, consumers merge the salted keys back into the key. The records of a
+// salted key are no longer ordered across its partitions.
+//
+// The hot keys of every finished window are published as CloudWatch metric HotKeyRecords with the dimensions Service
+// and Topic in the embedded metric format. The key is a property of the log event, not a dimension: keys are unbounded
+// and may identify customers, every distinct dimension value would be a custom metric. Counts are per execution environment.
+public class HotKeyDetector {
+
+    // Record header with the salt of a salted key, and the separator between key and salt
+    public static final String SALT_HEADER = "X-Key-Salt";
+    public static final String SALT_SEPARATOR = "#";
+
+    // Logger instance for logging events of this class
+    private static final Logger log = LogManager.getLogger(HotKeyDetector.class);
+
+    private static final ObjectMapper OBJECT_MAPPER = new ObjectMapper();
+
+    private final int salts;
+    private final long threshold;
+    private final long windowMillis;
+    private final int capacity;
+    private final String namespace;
+    private final String service;
+    private final PrintStream out;
+    private final LongSupplier clock;
+
+    // Space-Saving counters of the current window per "<topic>/<key>": count and the overestimation of the count
+    private final Map<String, long[]> counters = new HashMap<>();
+    private long windowStart;
+
+    // Hot keys of the previous window with their counts, they stay salted during the current window
+    private Map<String, Long> previousHotKeys = Map.of();
+
+    // Hot keys of the finished window that were not published yet
+    private Map<String, Long> unpublished = Map.of();
+
+    // Salts are assigned round robin, so the records of a hot key are spread evenly
+    private long nextSalt;
+
+    public HotKeyDetector(int salts, long threshold, long windowSeconds, int capacity) {
+        this(salts, threshold, windowSeconds, capacity,
+                System.getenv().getOrDefault("POWERTOOLS_METRICS_NAMESPACE", "ServerlessKafka"),
+                System.getenv().getOrDefault("POWERTOOLS_SERVICE_NAME", "ServerlessKafkaProducer"),
+                System.out, System::currentTimeMillis);
+    }
+
+    HotKeyDetector(int salts, long threshold, long windowSeconds, int capacity, String namespace, String service, PrintStream out, LongSupplier clock) {
+        if (salts < 2 || threshold <= 0 || windowSeconds <= 0 || capacity <= 0) {
+            throw new IllegalArgumentException("HOT_KEY_SALTS must be at least 2, HOT_KEY_THRESHOLD, HOT_KEY_WINDOW_SECONDS and HOT_KEY_CAPACITY must be positive");
+        }
+        this.salts = salts;
+        this.threshold = threshold;
+        this.windowMillis = windowSeconds * 1000;
+        this.capacity = capacity;
+        this.namespace = namespace;
+        this.service = service;
+        this.out = out;
+        this.clock = clock;
+        this.windowStart = clock.getAsLong();
+    }
+
+    // Creates the detector from the environment of the function, or returns null if HOT_KEY_SALTS is not set
+    public static HotKeyDetector fromEnvironment() {
+        int salts = Integer.parseInt(System.getenv().getOrDefault("HOT_KEY_SALTS", "0"));
+        if (salts <= 1) {
+            return null;
+        }
+        return new HotKeyDetector(salts,
+                Long.parseLong(System.getenv().getOrDefault("HOT_KEY_THRESHOLD", "1000")),
+                Long.parseLong(System.getenv().getOrDefault("HOT_KEY_WINDOW_SECONDS", "60")),
+                Integer.parseInt(System.getenv().getOrDefault("HOT_KEY_CAPACITY", "100")));
+    }
+
+    // Counts a record of the key and returns the salt of the record, or -1 if the key is not hot. Records without key
+    // are spread by the producer already.
+    public synchronized int saltOf(String topic, String key) {
+        if (key == null) {
+            return -1;
+        }
+        rotateWindow();
+        String entry = topic + "/" + key;
+        long[] counter = counters.get(entry);
+        if (counter == null) {
+            counter = new long[2];
+            if (counters.size() >= capacity) {
+                // The key replaces the least frequent key, it inherits its count as overestimation
+                Map.Entry<String, long[]> minimum = null;
+                for (Map.Entry<String, long[]> candidate : counters.entrySet()) {
+                    if (minimum == null || candidate.getValue()[0] < minimum.getValue()[0]) {
+                        minimum = candidate;
+                    }
+                }
+                counters.remove(minimum.getKey());
+                counter[0] = minimum.getValue()[0];
+                counter[1] = minimum.getValue()[0];
+            }
+            counters.put(entry, counter);
+        }
+        counter[0]++;
+        // Only the guaranteed count decides, so frequent replacements of rare keys do not make them hot
+        if (counter[0] - counter[1] >= threshold || previousHotKeys.containsKey(entry)) {
+            return (int) (nextSalt++ % salts);
+        }
+        return -1;
+    }
+
+    // Returns the hot keys ("<topic>/<key>") of the current window with their guaranteed counts, most frequent first
+    synchronized Map<String, Long> currentHotKeys() {
+        rotateWindow();
+        return hotKeysOf(counters);
+    }
+
+    // Publishes the hot keys of the windows that finished since the last call, one metric document per hot key
+    public void publish() {
+        Map<String, Long> hotKeys;
+        synchronized (this) {
+            rotateWindow();
+            hotKeys = unpublished;
+            unpublished = Map.of();
+        }
+        if (!hotKeys.isEmpty()) {
+            log.info(String.format("Hot keys of the last window: %s", hotKeys));
+        }
+        for (Map.Entry<String, Long> hotKey : hotKeys.entrySet()) {
+            try {
+                out.println(OBJECT_MAPPER.writeValueAsString(createMetricDocument(hotKey.getKey(), hotKey.getValue())));
+            } catch (Exception e) {
+                log.error("Could not publish the hot key metrics", e);
+            }
+        }
+    }
+
+    // Salts a key
+    public static String salt(String key, int salt) {
+        return key + SALT_SEPARATOR + salt;
+    }
+
+    // Starts a new window if the current one is over, its hot keys stay salted during the new window
+    private void rotateWindow() {
+        long now = clock.getAsLong();
+        if (now - windowStart < windowMillis) {
+            return;
+        }
+        Map<String, Long> hotKeys = hotKeysOf(counters);
+        previousHotKeys = now - windowStart < 2 * windowMillis ? hotKeys : Map.of();
+        if (!hotKeys.isEmpty()) {
+            unpublished = hotKeys;
+        }
+        counters.clear();
+        windowStart = now;
+    }
+
+    private Map<String, Long> hotKeysOf(Map<String, long[]> counts) {
+        Map<String, Long> hotKeys = new LinkedHashMap<>();
+        counts.entrySet().stream()
+                .filter(entry -> entry.getValue()[0] - entry.getValue()[1] >= threshold)
+                .sorted(Comparator.comparingLong(entry -> entry.getValue()[1] - entry.getValue()[0]))
+                .forEach(entry -> hotKeys.put(entry.getKey(), entry.getValue()[0] - entry.getValue()[1]));
+        return hotKeys;
+    }
+
+    // Creates the embedded metric format document of a hot key, the key is only a log field
+    ObjectNode createMetricDocument(String hotKey, long records) {
+        int separator = hotKey.indexOf('/');
+        ObjectNode document = OBJECT_MAPPER.createObjectNode();
+        ObjectNode directive = document.putObject("_aws").put("Timestamp", clock.getAsLong())
+                .putArray("CloudWatchMetrics").addObject().put("Namespace", namespace);
+        directive.putArray("Dimensions").addArray().add("Service").add("Topic");
+        directive.putArray("Metrics").addObject().put("Name", "HotKeyRecords").put("Unit", "Count");
+        document.put("Service", service);
+        document.put("Topic", hotKey.substring(0, separator));
+        document.put("HotKey", hotKey.substring(separator + 1));
+        document.put("HotKeyRecords", records);
+        return document;
+    }
+}
@@ -0,0 +1,20 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+// Shared store of the responses of requests with an Idempotency-Key, all execution environments of the function see
+// the same entries. Entries expire at the given epoch second, expired entries are treated as absent.
+public interface IdempotencyStore {
+
+    // Returns the stored response of the key, or null if there is none or the request is still in progress
+    String get(String key);
+
+    // Marks the request of the key as in progress until expiresAt, returns false if there is an unexpired entry already
+    boolean claim(String key, long expiresAt);
+
+    // Stores the response of the request of the key
+    void complete(String key, String response, long expiresAt);
+
+    // Removes the in progress entry of a request that failed, so that its retry is processed
+    void release(String key);
+}
@@ -0,0 +1,118 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.time.Instant;
+import java.util.LinkedHashMap;
+import java.util.Map;
+import java.util.function.LongSupplier;
+
+// Remembers the responses of requests with an Idempotency-Key, so that client retries are answered with the response
+// of the original request (with its partition and offset) instead of writing the messages again. The responses of the
+// execution environment are kept in an LRU cache of cacheSize entries, which answers retries without a network call.
+// The optional shared store answers retries that reach another execution environment and keeps concurrent requests
+// with the same key from both writing. Without it, only retries reaching the same execution environment are detected.
+public class IdempotentRequests {
+
+    // Header of the client chosen key, e.g. a UUID per logical request
+    public static final String IDEMPOTENCY_KEY_HEADER = "Idempotency-Key";
+
+    // Response header of replayed responses
+    public static final String REPLAYED_HEADER = "Idempotent-Replayed";
+
+    // Longer keys are rejected, DynamoDB partition keys are limited to 2048 bytes
+    public static final int MAX_KEY_LENGTH = 255;
+
+    // Logger instance for logging events of this class
+    private static final Logger log = LogManager.getLogger(IdempotentRequests.class);
+
+    private final IdempotencyStore store;
+    private final long ttlSeconds;
+    private final LongSupplier clock;
+
+    // Responses and the epoch second they expire at, in access order
+    private final Map<String, Map.Entry<String, Long>> cache;
+
+    public IdempotentRequests(IdempotencyStore store, int cacheSize, long ttlSeconds) {
+        this(store, cacheSize, ttlSeconds, () -> Instant.now().getEpochSecond());
+    }
+
+    IdempotentRequests(IdempotencyStore store, int cacheSize, long ttlSeconds, LongSupplier clock) {
+        if (cacheSize <= 0 || ttlSeconds <= 0) {
+            throw new IllegalArgumentException("IDEMPOTENCY_CACHE_SIZE and IDEMPOTENCY_TTL_SECONDS must be positive");
+        }
+        this.store = store;
+        this.ttlSeconds = ttlSeconds;
+        this.clock = clock;
+        this.cache = new LinkedHashMap<>(16, 0.75f, true) {
+            @Override
+            protected boolean removeEldestEntry(Map.Entry<String, Map.Entry<String, Long>> eldest) {
+                return size() > cacheSize;
+            }
+        };
+    }
+
+    // Creates the idempotent requests from the environment of the function, with the DynamoDB store if IDEMPOTENCY_TABLE is set
+    public static IdempotentRequests fromEnvironment() {
+        String table = System.getenv("IDEMPOTENCY_TABLE");
+        return new IdempotentRequests(table == null || table.isEmpty() ? null : DynamoDbIdempotencyStore.fromEnvironment(),
+                Integer.parseInt(System.getenv().getOrDefault("IDEMPOTENCY_CACHE_SIZE", "10000")),
+                Long.parseLong(System.getenv().getOrDefault("IDEMPOTENCY_TTL_SECONDS", "3600")));
+    }
+
+    // Returns the response of the request of the key, or null if it was not processed yet: from the cache, or from the
+    // store, which then warms the cache
+    public String lookup(String key) {
+        synchronized (cache) {
+            Map.Entry<String, Long> cached = cache.get(key);
+            if (cached != null && cached.getValue() >= clock.getAsLong()) {
+                return cached.getKey();
+            }
+        }
+        String response = store == null ? null : store.get(key);
+        if (response != null) {
+            remember(key, response);
+        }
+        return response;
+    }
+
+    // Claims the key for the current request for at most inProgressSeconds (the remaining time of the invocation),
+    // returns false if another request with the key is in progress or completed in the meantime
+    public boolean claim(String key, long inProgressSeconds) {
+        return store == null || store.claim(key, clock.getAsLong() + Math.max(1, inProgressSeconds));
+    }
+
+    // Stores the response of the request of the key
+    public void complete(String key, String response) {
+        remember(key, response);
+        if (store != null) {
+            try {
+                store.complete(key, response, clock.getAsLong() + ttlSeconds);
+            } catch (RuntimeException e) {
+                // The messages are written, the client gets its response. Retries reaching other execution environments
+                // write them again once the claim expired.
+                log.error("Could not store the response of the idempotency key", e);
+            }
+        }
+    }
+
+    // Releases the key of a request that was not processed, so that its retry is processed instead of rejected as in progress
+    public void release(String key) {
+        if (store != null) {
+            try {
+                store.release(key);
+            } catch (RuntimeException e) {
+                log.error("Could not release the idempotency key, retries are rejected until the claim expires", e);
+            }
+        }
+    }
+
+    private void remember(String key, String response) {
+        synchronized (cache) {
+            cache.put(key, Map.entry(response, clock.getAsLong() + ttlSeconds));
+        }
+    }
+}
@@ -2,24 +2,129 @@
 // SPDX-License-Identifier: MIT-0
 package software.amazon.samples.kafka.lambda;
 
+import java.util.ArrayList;
+import java.util.LinkedHashMap;
+import java.util.List;
 import java.util.Map;
 import java.util.Properties;
+import java.util.Set;
+import java.util.function.Predicate;
 
 public class KafkaProducerPropertiesFactoryImpl implements KafkaProducerPropertiesFactory {
 
+    // Tuning setting of the producer: the environment variable it is read from, the producer property, its default
+    // and the validation of the value
+    static class ProducerSetting {
+        final String environmentVariable;
+        final String property;
+        final String defaultValue;
+        final String description;
+        final Predicate<String> valid;
+
+        ProducerSetting(String environmentVariable, String property, String defaultValue, String description, Predicate<String> valid) {
+            this.environmentVariable = environmentVariable;
+            this.property = property;
+            this.defaultValue = defaultValue;
+            this.description = description;
+            this.valid = valid;
+        }
+    }
+
+    // Tuning settings, set through serverless_kafka_producer_config in cdk.context.json. The defaults are tuned for Lambda:
+    // the execution environment is frozen between invocations, so idle connections are kept for as long as the broker
+    // keeps them and warm invocations reuse the authenticated connection instead of a new SASL/IAM handshake.
+    static final List<ProducerSetting> TUNING_SETTINGS = List.of(
+        new ProducerSetting("PRODUCER_ACKS", "acks", "all", "one of 0, 1, all, -1", oneOf("0", "1", "all", "-1")),
+        new ProducerSetting("PRODUCER_ENABLE_IDEMPOTENCE", "enable.idempotence", "true", "true or false", oneOf("true", "false")),
+        new ProducerSetting("PRODUCER_COMPRESSION_TYPE", "compression.type", "none", "one of none, gzip, snappy, lz4, zstd", oneOf("none", "gzip", "snappy", "lz4", "zstd")),
+        new ProducerSetting("PRODUCER_LINGER_MS", "linger.ms", "0", "a number of milliseconds between 0 and 60000", between(0, 60000)),
+        new ProducerSetting("PRODUCER_BATCH_SIZE", "batch.size", "16384", "a number of bytes between 0 and 1048576", between(0, 1048576)),
+        new ProducerSetting("PRODUCER_MAX_IN_FLIGHT_REQUESTS", "max.in.flight.requests.per.connection", "5", "a number between 1 and 100", between(1, 100)),
+        new ProducerSetting("PRODUCER_REQUEST_TIMEOUT_MS", "request.timeout.ms", "30000", "a number of milliseconds between 1000 and 900000", between(1000, 900000)),
+        new ProducerSetting("PRODUCER_DELIVERY_TIMEOUT_MS", "delivery.timeout.ms", "60000", "a number of milliseconds between 1000 and 900000", between(1000, 900000)),
+        new ProducerSetting("PRODUCER_MAX_BLOCK_MS", "max.block.ms", "10000", "a number of milliseconds between 0 and 900000", between(0, 900000)),
+        new ProducerSetting("PRODUCER_CONNECTIONS_MAX_IDLE_MS", "connections.max.idle.ms", "540000", "a number of milliseconds between 1000 and 3600000", between(1000, 3600000)),
+        new ProducerSetting("PRODUCER_RECONNECT_BACKOFF_MS", "reconnect.backoff.ms", "50", "a number of milliseconds between 0 and 60000", between(0, 60000)),
+        new ProducerSetting("PRODUCER_RECONNECT_BACKOFF_MAX_MS", "reconnect.backoff.max.ms", "1000", "a number of milliseconds between 0 and 60000", between(0, 60000)),
+        new ProducerSetting("PRODUCER_METADATA_MAX_AGE_MS", "metadata.max.age.ms", "300000", "a number of milliseconds between 1000 and 3600000", between(1000, 3600000)),
+        // Topics without records for this long are dropped from the metadata cache, the next record of the topic then
+        // waits for its metadata. The default keeps the metadata of rarely used topics of the topic resources.
+        new ProducerSetting("PRODUCER_METADATA_MAX_IDLE_MS", "metadata.max.idle.ms", "3600000", "a number of milliseconds between 5000 and 86400000", between(5000, 86400000))
+    );
+
+    private final Map<String, String> environment;
+
+    // Tuning properties read from the environment, validated when the factory is created
+    private final Map<String, String> tuningProperties;
+
     private Properties kafkaProducerProperties;
 
-    // Constructor for the KafkaProducerPropertiesFactoryImpl.
+    // Constructor for the KafkaProducerPropertiesFactoryImpl. The handler creates it during init, so invalid settings
+    // fail the init instead of the first request.
     public KafkaProducerPropertiesFactoryImpl() {
+        this(System.getenv());
+    }
 
+    KafkaProducerPropertiesFactoryImpl(Map<String, String> environment) {
+        this.environment = environment;
+        this.tuningProperties = getTuningProperties(environment);
+    }
+
+    // Returns a validation that accepts the given values
+    private static Predicate<String> oneOf(String... values) {
+        Set<String> accepted = Set.of(values);
+        return accepted::contains;
+    }
+
+    // Returns a validation that accepts integers between min and max
+    private static Predicate<String> between(long min, long max) {
+        return value -> {
+            try {
+                long number = Long.parseLong(value.trim());
+                return number >= min && number <= max;
+            } catch (NumberFormatException e) {
+                return false;
+            }
+        };
+    }
+
+    // Reads and validates the tuning settings. All invalid settings are reported at once, including combinations the
+    // producer would reject or silently change.
+    static Map<String, String> getTuningProperties(Map<String, String> environment) {
+        Map<String, String> properties = new LinkedHashMap<>();
+        List<String> errors = new ArrayList<>();
+        for (ProducerSetting setting : TUNING_SETTINGS) {
+            String value = environment.getOrDefault(setting.environmentVariable, setting.defaultValue).trim();
+            if (!setting.valid.test(value)) {
+                errors.add(String.format("%s (%s) must be %s, but is '%s'", setting.environmentVariable, setting.property, setting.description, value));
+            }
+            properties.put(setting.property, value);
+        }
+        if (errors.isEmpty()) {
+            if ("true".equals(properties.get("enable.idempotence"))) {
+                if (!Set.of("all", "-1").contains(properties.get("acks"))) {
+                    errors.add("PRODUCER_ENABLE_IDEMPOTENCE requires PRODUCER_ACKS to be all");
+                }
+                if (Long.parseLong(properties.get("max.in.flight.requests.per.connection")) > 5) {
+                    errors.add("PRODUCER_ENABLE_IDEMPOTENCE requires PRODUCER_MAX_IN_FLIGHT_REQUESTS to be at most 5");
+                }
+            }
+            if (Long.parseLong(properties.get("delivery.timeout.ms")) < Long.parseLong(properties.get("linger.ms")) + Long.parseLong(properties.get("request.timeout.ms"))) {
+                errors.add("PRODUCER_DELIVERY_TIMEOUT_MS must be at least PRODUCER_LINGER_MS + PRODUCER_REQUEST_TIMEOUT_MS");
+            }
+        }
+        if (!errors.isEmpty()) {
+            throw new IllegalArgumentException("Invalid producer settings: " + String.join("; ", errors));
+        }
+        return properties;
     }
 
     // This method retrieves the Kafka bootstrap server details from environment variables.
     private String getBootstrapServer() {
-        return System.getenv("BOOTSTRAP_SERVER");
+        return environment.get("BOOTSTRAP_SERVER");
     }
 
-    // This method returns Kafka Producer properties. If the properties were previously created, 
+    // This method returns Kafka Producer properties. If the properties were previously created,
     // it returns the existing ones. Otherwise, it creates new properties.
     @Override
     public Properties getProducerProperties() {
@@ -32,9 +137,9 @@ public class KafkaProducerPropertiesFactoryImpl implements KafkaProducerProperti
         String callbackHandler = software.amazon.msk.auth.iam.IAMClientCallbackHandler.class.getCanonicalName();
         String loginModule = software.amazon.msk.auth.iam.IAMLoginModule.class.getCanonicalName();
 
-        // Configuration map with necessary Kafka Producer properties. 
-        // This includes serializers, bootstrap server details, security protocol, SASL mechanism, 
-        // and JAAS config for SASL, callback handler, max idle time, and reconnect backoff time.
+        // Configuration map with necessary Kafka Producer properties.
+        // This includes serializers, bootstrap server details, security protocol, SASL mechanism,
+        // and JAAS config for SASL and the callback handler. The tuning properties are added below.
         Map<String, String> configuration = Map.of(
             "key.serializer", serializer, // Serializer class for key that implements the `org.apache.kafka.common.serialization.Serializer` interface.
             "value.serializer", serializer, // Serializer class for value that implements the `org.apache.kafka.common.serialization.Serializer` interface.
@@ -42,18 +147,17 @@ public class KafkaProducerPropertiesFactoryImpl implements KafkaProducerProperti
             "security.protocol", "SASL_SSL", // Protocol used to communicate with brokers. SASL_SSL is the recommended setting for encryption and authentication.
             "sasl.mechanism", "AWS_MSK_IAM", // SASL mechanism used for client connections. This may be any mechanism for which a security provider is available.
             "sasl.jaas.config", loginModule+ " required;", // JAAS configuration settings. The format for the value is: '<loginModuleClass> <controlFlag> (<optionName>=<optionValue>)*;'. The IAMLoginModule class is used for AWS MSK IAM authentication.
-            "sasl.client.callback.handler.class", callbackHandler, // The fully qualified name of a SASL client callback handler class that implements the AuthenticateCallbackHandler interface.
-            "connections.max.idle.ms", "60", // Close idle connections after the number of milliseconds specified by this config.
-            "reconnect.backoff.ms", "1000" // The amount of time to wait before attempting to reconnect to a given host when a connection fails. 
+            "sasl.client.callback.handler.class", callbackHandler // The fully qualified name of a SASL client callback handler class that implements the AuthenticateCallbackHandler interface.
         );
 
         // Initializing the Kafka Producer Properties.
         kafkaProducerProperties = new Properties();
 
-        // Populating the Kafka Producer Properties with the configuration map.
+        // Populating the Kafka Producer Properties with the configuration map and the tuning properties.
         for (Map.Entry<String, String> configEntry : configuration.entrySet()) {
             kafkaProducerProperties.put(configEntry.getKey(), configEntry.getValue());
         }
+        kafkaProducerProperties.putAll(tuningProperties);
 
         // Return the configured Kafka Producer Properties.
         return kafkaProducerProperties;
@@ -0,0 +1,139 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.fasterxml.jackson.databind.ObjectMapper;
+import com.fasterxml.jackson.databind.node.ObjectNode;
+import org.apache.kafka.common.TopicPartition;
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.io.PrintStream;
+import java.util.ArrayList;
+import java.util.HashMap;
+import java.util.HashSet;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Map;
+import java.util.Set;
+import java.util.function.LongSupplier;
+
+// Counts the written records and their distinct keys per partition over a window (PARTITION_METRICS_WINDOW_SECONDS) and
+// publishes them as CloudWatch metrics (PartitionRecords and PartitionDistinctKeys with the dimensions Service, Topic and
+// Partition). A skewed key distribution shows up as partitions with far more records and keys than the others, which a
+// single invocation with a handful of records cannot show. Counts are per execution environment, like the hot keys of
+// HotKeyDetector. The metrics are written in the embedded metric format to the function log, CloudWatch extracts them
+// from there.
+public class PartitionDistribution {
+
+    // Distinct keys tracked per partition and window, beyond it PartitionDistinctKeys is a lower bound. Bounds the
+    // memory of unique keys (request_id key strategy).
+    static final int MAX_DISTINCT_KEYS = 100_000;
+
+    // Logger instance for logging events of this class
+    private static final Logger log = LogManager.getLogger(PartitionDistribution.class);
+
+    private static final ObjectMapper OBJECT_MAPPER = new ObjectMapper();
+
+    private final String namespace;
+    private final String service;
+    private final PrintStream out;
+    private final long windowMillis;
+    private final LongSupplier clock;
+
+    // Records and distinct keys per topic partition of the current window
+    private final Map<TopicPartition, Long> records = new LinkedHashMap<>();
+    private final Map<TopicPartition, Set<String>> keys = new HashMap<>();
+    private long windowStart;
+
+    // Counts of the finished windows that were not published yet
+    private final List<Map<TopicPartition, long[]>> finishedWindows = new ArrayList<>();
+
+    public PartitionDistribution() {
+        this(System.getenv().getOrDefault("POWERTOOLS_METRICS_NAMESPACE", "ServerlessKafka"),
+                System.getenv().getOrDefault("POWERTOOLS_SERVICE_NAME", "ServerlessKafkaProducer"),
+                System.out,
+                Long.parseLong(System.getenv().getOrDefault("PARTITION_METRICS_WINDOW_SECONDS", "60")),
+                System::currentTimeMillis);
+    }
+
+    PartitionDistribution(String namespace, String service, PrintStream out, long windowSeconds, LongSupplier clock) {
+        if (windowSeconds <= 0) {
+            throw new IllegalArgumentException("PARTITION_METRICS_WINDOW_SECONDS must be positive, but is " + windowSeconds);
+        }
+        this.namespace = namespace;
+        this.service = service;
+        this.out = out;
+        this.windowMillis = windowSeconds * 1000;
+        this.clock = clock;
+        this.windowStart = clock.getAsLong();
+    }
+
+    // Counts a written record, called from the request thread and from producer callbacks
+    public synchronized void record(String topic, int partition, String key) {
+        rotateWindow();
+        TopicPartition topicPartition = new TopicPartition(topic, partition);
+        records.merge(topicPartition, 1L, Long::sum);
+        Set<String> partitionKeys = keys.computeIfAbsent(topicPartition, p -> new HashSet<>());
+        if (partitionKeys.size() < MAX_DISTINCT_KEYS) {
+            partitionKeys.add(key);
+        }
+    }
+
+    // Returns the records and distinct keys per topic partition of the windows that finished since the last call
+    synchronized List<Map<TopicPartition, long[]>> drain() {
+        rotateWindow();
+        List<Map<TopicPartition, long[]>> windows = new ArrayList<>(finishedWindows);
+        finishedWindows.clear();
+        return windows;
+    }
+
+    // Publishes the counts of the windows that finished since the last call, one metric document per partition and
+    // window. Called after every invocation, a window is published by the first invocation after it ended.
+    public void publish() {
+        for (Map<TopicPartition, long[]> window : drain()) {
+            for (Map.Entry<TopicPartition, long[]> entry : window.entrySet()) {
+                try {
+                    out.println(OBJECT_MAPPER.writeValueAsString(createMetricDocument(entry.getKey(), entry.getValue()[0], entry.getValue()[1])));
+                } catch (Exception e) {
+                    log.error("Could not publish the partition metrics", e);
+                }
+            }
+        }
+    }
+
+    // Finishes the current window if it is over
+    private void rotateWindow() {
+        long now = clock.getAsLong();
+        if (now - windowStart < windowMillis) {
+            return;
+        }
+        if (!records.isEmpty()) {
+            Map<TopicPartition, long[]> counts = new LinkedHashMap<>();
+            for (Map.Entry<TopicPartition, Long> entry : records.entrySet()) {
+                counts.put(entry.getKey(), new long[]{entry.getValue(), keys.get(entry.getKey()).size()});
+            }
+            finishedWindows.add(counts);
+        }
+        records.clear();
+        keys.clear();
+        windowStart = now;
+    }
+
+    // Creates the embedded metric format document of a partition
+    ObjectNode createMetricDocument(TopicPartition partition, long partitionRecords, long distinctKeys) {
+        ObjectNode document = OBJECT_MAPPER.createObjectNode();
+        ObjectNode directive = document.putObject("_aws").put("Timestamp", clock.getAsLong())
+                .putArray("CloudWatchMetrics").addObject().put("Namespace", namespace);
+        directive.putArray("Dimensions").addArray().add("Service").add("Topic").add("Partition");
+        directive.putArray("Metrics")
+                .add(OBJECT_MAPPER.createObjectNode().put("Name", "PartitionRecords").put("Unit", "Count"))
+                .add(OBJECT_MAPPER.createObjectNode().put("Name", "PartitionDistinctKeys").put("Unit", "Count"));
+        document.put("Service", service);
+        document.put("Topic", partition.topic());
+        document.put("Partition", String.valueOf(partition.partition()));
+        document.put("PartitionRecords", partitionRecords);
+        document.put("PartitionDistinctKeys", distinctKeys);
+        return document;
+    }
+}
@@ -0,0 +1,163 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.fasterxml.jackson.databind.JsonNode;
+import com.fasterxml.jackson.databind.ObjectMapper;
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.net.URI;
+import java.net.http.HttpClient;
+import java.net.http.HttpRequest;
+import java.net.http.HttpResponse;
+import java.util.concurrent.Semaphore;
+import java.util.concurrent.TimeUnit;
+
+// Internal Lambda extension (a thread of the runtime process) that drains the producer after the response was returned.
+// Lambda only freezes the execution environment once the runtime and all extensions are done with an invocation. On an
+// INVOKE event the extension waits until the handler signals the end of the invocation (at most until the deadline of
+// the invocation), flushes the records the handler only enqueued, and only then asks for the next event. Records that
+// are still buffered when the process is shut down are flushed by a shutdown hook.
+public class ProducerDrainExtension {
+
+    // Name the extension is registered with
+    public static final String EXTENSION_NAME = "serverless-kafka-producer-drain";
+
+    // Logger instance for logging events of this class
+    private static final Logger log = LogManager.getLogger(ProducerDrainExtension.class);
+
+    // Events of the Extensions API (https://docs.aws.amazon.com/lambda/latest/dg/runtimes-extensions-api.html)
+    public interface ExtensionsApi {
+
+        // Registers the extension for INVOKE events (internal extensions do not receive SHUTDOWN events)
+        void register(String name) throws Exception;
+
+        // Blocks until the next event. Calling it also tells Lambda that the extension finished the previous invocation.
+        JsonNode nextEvent() throws Exception;
+    }
+
+    // Client of the Extensions API of the execution environment (AWS_LAMBDA_RUNTIME_API)
+    public static class HttpExtensionsApi implements ExtensionsApi {
+
+        private static final ObjectMapper OBJECT_MAPPER = new ObjectMapper();
+
+        private final HttpClient client = HttpClient.newHttpClient();
+        private final String baseUrl;
+        private String identifier;
+
+        public HttpExtensionsApi(String runtimeApi) {
+            this.baseUrl = "http://" + runtimeApi + "/2020-01-01/extension";
+        }
+
+        @Override
+        public void register(String name) throws Exception {
+            HttpRequest request = HttpRequest.newBuilder(URI.create(baseUrl + "/register"))
+                    .header("Lambda-Extension-Name", name)
+                    .header("Content-Type", "application/json")
+                    .POST(HttpRequest.BodyPublishers.ofString("{\"events\": [\"INVOKE\"]}"))
+                    .build();
+            HttpResponse<String> response = client.send(request, HttpResponse.BodyHandlers.ofString());
+            if (response.statusCode() != 200) {
+                throw new IllegalStateException("Registration of the extension failed with status code " + response.statusCode());
+            }
+            identifier = response.headers().firstValue("Lambda-Extension-Identifier").orElseThrow();
+        }
+
+        @Override
+        public JsonNode nextEvent() throws Exception {
+            HttpRequest request = HttpRequest.newBuilder(URI.create(baseUrl + "/event/next"))
+                    .header("Lambda-Extension-Identifier", identifier)
+                    .GET()
+                    .build();
+            return OBJECT_MAPPER.readTree(client.send(request, HttpResponse.BodyHandlers.ofString()).body());
+        }
+    }
+
+    private final ExtensionsApi api;
+    private final Runnable drain;
+    private final Semaphore finished = new Semaphore(0);
+    private volatile boolean running;
+    private volatile long drains;
+
+    public ProducerDrainExtension(ExtensionsApi api, Runnable drain) {
+        this.api = api;
+        this.drain = drain;
+    }
+
+    // Registers the extension (during init, before the runtime asks for the first invocation) and starts its thread.
+    // Returns false if the extension could not be registered, the handler then has to flush itself.
+    public boolean start() {
+        try {
+            api.register(EXTENSION_NAME);
+        } catch (Exception e) {
+            log.error("Could not register the producer drain extension, records are flushed by the handler", e);
+            return false;
+        }
+        running = true;
+        Thread thread = new Thread(this::run, EXTENSION_NAME);
+        thread.setDaemon(true);
+        thread.start();
+        Runtime.getRuntime().addShutdownHook(new Thread(this::stop));
+        return true;
+    }
+
+    // Signals the end of the invocation, the extension drains the producer while the runtime returns the response
+    public void invocationFinished() {
+        finished.release();
+    }
+
+    public boolean isRunning() {
+        return running;
+    }
+
+    // Number of completed drains, one per invocation
+    public long getDrains() {
+        return drains;
+    }
+
+    private void run() {
+        try {
+            while (running) {
+                JsonNode event = api.nextEvent();
+                if ("SHUTDOWN".equals(event.path("eventType").asText())) {
+                    break;
+                }
+                // Wait for the handler, at most until the deadline of the invocation
+                long deadlineMs = event.path("deadlineMs").asLong(0);
+                long timeoutMs = deadlineMs > 0 ? Math.max(0, deadlineMs - System.currentTimeMillis()) : Long.MAX_VALUE;
+                finished.tryAcquire(timeoutMs, TimeUnit.MILLISECONDS);
+                drain();
+            }
+        } catch (Exception e) {
+            log.error("Producer drain extension stopped, records are flushed by the handler", e);
+        } finally {
+            running = false;
+            drain();
+        }
+    }
+
+    private void drain() {
+        try {
+            drain.run();
+            drains++;
+        } catch (Exception e) {
+            log.error("Could not drain the producer", e);
+        }
+    }
+
+    public void stop() {
+        running = false;
+        drain();
+    }
+
+    // Starts the extension if the function runs in Lambda, returns null otherwise (the handler flushes itself)
+    public static ProducerDrainExtension startFromEnvironment(Runnable drain) {
+        String runtimeApi = System.getenv("AWS_LAMBDA_RUNTIME_API");
+        if (runtimeApi == null || runtimeApi.isEmpty()) {
+            return null;
+        }
+        ProducerDrainExtension extension = new ProducerDrainExtension(new HttpExtensionsApi(runtimeApi), drain);
+        return extension.start() ? extension : null;
+    }
+}
@@ -0,0 +1,116 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.amazonaws.services.lambda.runtime.events.APIGatewayProxyRequestEvent;
+import com.fasterxml.jackson.core.JsonPointer;
+import com.fasterxml.jackson.databind.JsonNode;
+
+import java.util.Map;
+import java.util.Set;
+
+// Strategy the record key of a message is taken from (KEY_STRATEGY), the key determines the partition of the record:
+// "request_id" (default) uses the ID of the request, so keys are unique and records are spread over all partitions,
+// "json_pointer" takes the key from the message at the JSON pointer KEY_SOURCE (e.g. /customerId), "header" from the
+// request header KEY_SOURCE and "path_parameter" from the path parameter KEY_SOURCE. With the last three, all records of
+// an entity are written to the same partition in order, and downstream deduplication and compaction can use the key.
+public class RecordKeyStrategy {
+
+    public static final String REQUEST_ID = "request_id";
+    public static final String JSON_POINTER = "json_pointer";
+    public static final String HEADER = "header";
+    public static final String PATH_PARAMETER = "path_parameter";
+
+    private static final Set<String> STRATEGIES = Set.of(REQUEST_ID, JSON_POINTER, HEADER, PATH_PARAMETER);
+
+    private final String strategy;
+    private final String source;
+
+    // Compiled once, evaluating it on a parsed message is a lookup per path segment
+    private final JsonPointer pointer;
+
+    public RecordKeyStrategy(String strategy, String source) {
+        if (!STRATEGIES.contains(strategy)) {
+            throw new IllegalArgumentException(String.format("KEY_STRATEGY must be one of %s, but is '%s'", STRATEGIES, strategy));
+        }
+        if (!REQUEST_ID.equals(strategy) && (source == null || source.isEmpty())) {
+            throw new IllegalArgumentException(String.format("KEY_STRATEGY %s requires KEY_SOURCE", strategy));
+        }
+        this.strategy = strategy;
+        this.source = source;
+        this.pointer = JSON_POINTER.equals(strategy) ? JsonPointer.compile(source) : null;
+    }
+
+    // Creates the strategy from the environment of the function, invalid settings fail the init
+    public static RecordKeyStrategy fromEnvironment() {
+        return new RecordKeyStrategy(System.getenv().getOrDefault("KEY_STRATEGY", REQUEST_ID), System.getenv("KEY_SOURCE"));
+    }
+
+    public String getStrategy() {
+        return strategy;
+    }
+
+    public String getSource() {
+        return source;
+    }
+
+    // Returns true if the key is read from the message, the handler then parses the body once for all messages
+    public boolean needsMessage() {
+        return JSON_POINTER.equals(strategy);
+    }
+
+    // Returns the key of a message of the request, or null if the request does not contain it. The request ID strategy
+    // returns the given request key (the request ID, with the index of the message for batch requests).
+    public String keyOf(APIGatewayProxyRequestEvent input, JsonNode message, String requestKey) {
+        switch (strategy) {
+            case JSON_POINTER:
+                return message == null ? null : valueOf(message.at(pointer));
+            case HEADER:
+                return lookup(input.getHeaders(), true);
+            case PATH_PARAMETER:
+                return lookup(input.getPathParameters(), false);
+            default:
+                return requestKey;
+        }
+    }
+
+    // Describes where the key is read from, for the response to requests without key
+    public String describe() {
+        switch (strategy) {
+            case JSON_POINTER:
+                return "the JSON pointer " + source;
+            case HEADER:
+                return "the header " + source;
+            case PATH_PARAMETER:
+                return "the path parameter " + source;
+            default:
+                return "the request ID";
+        }
+    }
+
+    // Only scalar values are keys, objects and arrays have no canonical string form
+    private static String valueOf(JsonNode node) {
+        if (node == null || node.isMissingNode() || node.isNull() || node.isContainerNode()) {
+            return null;
+        }
+        String value = node.asText();
+        return value.isEmpty() ? null : value;
+    }
+
+    // Header names are case-insensitive, path parameter names are not
+    private String lookup(Map<String, String> values, boolean ignoreCase) {
+        if (values == null) {
+            return null;
+        }
+        String value = values.get(source);
+        if (value == null && ignoreCase) {
+            for (Map.Entry<String, String> entry : values.entrySet()) {
+                if (entry.getKey().equalsIgnoreCase(source)) {
+                    value = entry.getValue();
+                    break;
+                }
+            }
+        }
+        return value == null || value.isEmpty() ? null : value;
+    }
+}
@@ -0,0 +1,106 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.amazonaws.services.lambda.runtime.events.APIGatewayProxyRequestEvent;
+
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.IOException;
+import java.io.InputStream;
+import java.nio.charset.StandardCharsets;
+import java.util.Base64;
+import java.util.Map;
+import java.util.zip.GZIPInputStream;
+
+// Decodes the body of a request. API Gateway passes bodies of the binary media types (application/gzip) base64 encoded.
+// Bodies sent with "Content-Encoding: gzip" or "Content-Type: application/gzip" are decompressed, at most up to
+// maxDecompressedBytes, so a small compressed request cannot expand into a body the function cannot hold.
+public class RequestBodyDecoder {
+
+    public static final String GZIP = "gzip";
+    public static final String GZIP_MEDIA_TYPE = "application/gzip";
+
+    // Request that cannot be decoded, with the status code of the response
+    public static class InvalidBodyException extends Exception {
+        private final int statusCode;
+
+        public InvalidBodyException(int statusCode, String message) {
+            super(message);
+            this.statusCode = statusCode;
+        }
+
+        public int getStatusCode() {
+            return statusCode;
+        }
+    }
+
+    private final long maxDecompressedBytes;
+
+    public RequestBodyDecoder(long maxDecompressedBytes) {
+        if (maxDecompressedBytes <= 0) {
+            throw new IllegalArgumentException("MAX_DECOMPRESSED_BODY_BYTES must be positive, but is " + maxDecompressedBytes);
+        }
+        this.maxDecompressedBytes = maxDecompressedBytes;
+    }
+
+    // Creates the decoder from the environment of the function, the default cap is the default maximum record size of Kafka
+    public static RequestBodyDecoder fromEnvironment() {
+        return new RequestBodyDecoder(Long.parseLong(System.getenv().getOrDefault("MAX_DECOMPRESSED_BODY_BYTES", "1048576")));
+    }
+
+    // Returns true if the body of the request is gzip compressed
+    public static boolean isCompressed(APIGatewayProxyRequestEvent input) {
+        String contentEncoding = getHeader(input.getHeaders(), "Content-Encoding");
+        String contentType = getHeader(input.getHeaders(), "Content-Type");
+        return (contentEncoding != null && contentEncoding.trim().equalsIgnoreCase(GZIP))
+                || (contentType != null && contentType.trim().toLowerCase().startsWith(GZIP_MEDIA_TYPE));
+    }
+
+    // Returns the body of the request as text: base64 encoded bodies are decoded and compressed bodies decompressed
+    public String decode(APIGatewayProxyRequestEvent input) throws InvalidBodyException {
+        String body = input.getBody();
+        if (body == null) {
+            return null;
+        }
+        boolean base64Encoded = Boolean.TRUE.equals(input.getIsBase64Encoded());
+        if (!isCompressed(input)) {
+            return base64Encoded ? new String(Base64.getDecoder().decode(body), StandardCharsets.UTF_8) : body;
+        }
+        if (!base64Encoded) {
+            // API Gateway only passes binary bodies unchanged for the binary media types
+            throw new InvalidBodyException(415, "Compressed bodies have to be sent with Content-Type " + GZIP_MEDIA_TYPE);
+        }
+        return decompress(Base64.getDecoder().decode(body));
+    }
+
+    // Decompresses a gzip body, reading at most one byte more than the cap
+    String decompress(byte[] compressed) throws InvalidBodyException {
+        ByteArrayOutputStream decompressed = new ByteArrayOutputStream(Math.min(compressed.length * 4, (int) Math.min(maxDecompressedBytes, Integer.MAX_VALUE)));
+        try (InputStream in = new GZIPInputStream(new ByteArrayInputStream(compressed))) {
+            byte[] buffer = new byte[8192];
+            for (int read = in.read(buffer); read >= 0; read = in.read(buffer)) {
+                if (decompressed.size() + read > maxDecompressedBytes) {
+                    throw new InvalidBodyException(413, String.format("The decompressed body exceeds %s bytes", maxDecompressedBytes));
+                }
+                decompressed.write(buffer, 0, read);
+            }
+        } catch (IOException e) {
+            throw new InvalidBodyException(400, "The body is not valid gzip: " + e.getMessage());
+        }
+        return decompressed.toString(StandardCharsets.UTF_8);
+    }
+
+    // Returns the value of a header, header names are case-insensitive
+    static String getHeader(Map<String, String> headers, String name) {
+        if (headers == null) {
+            return null;
+        }
+        for (Map.Entry<String, String> entry : headers.entrySet()) {
+            if (entry.getKey().equalsIgnoreCase(name)) {
+                return entry.getValue();
+            }
+        }
+        return null;
+    }
+}
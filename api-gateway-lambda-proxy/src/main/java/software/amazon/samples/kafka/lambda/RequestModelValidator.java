@@ -0,0 +1,53 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.fasterxml.jackson.databind.JsonNode;
+
+// Validates request bodies against the request models of the REST API (RequestModel and BatchRequestModel of the
+// producer stack). The HTTP API and the function URL have no request models, and API Gateway does not validate
+// compressed bodies, the function validates these requests itself so every ingress type accepts the same requests.
+public class RequestModelValidator {
+
+    private final int batchMaxMessages;
+
+    public RequestModelValidator(int batchMaxMessages) {
+        this.batchMaxMessages = batchMaxMessages;
+    }
+
+    // Creates the validator from the environment of the function, BATCH_MAX_MESSAGES is apigateway_batch_max_messages
+    public static RequestModelValidator fromEnvironment() {
+        return new RequestModelValidator(Integer.parseInt(System.getenv().getOrDefault("BATCH_MAX_MESSAGES", "500")));
+    }
+
+    // Returns the validation error of a single message request, or null if it is valid:
+    // an object with the string property "payload"
+    public String validateMessage(JsonNode message) {
+        if (!message.isObject()) {
+            return "The message must be an object";
+        }
+        if (!message.path("payload").isTextual()) {
+            return "The message must have the string property payload";
+        }
+        return null;
+    }
+
+    // Returns the validation error of a batch request, or null if it is valid: an object with the array "messages" of
+    // 1 to batchMaxMessages messages
+    public String validateBatch(JsonNode batch) {
+        JsonNode messages = batch.path("messages");
+        if (!messages.isArray() || messages.isEmpty()) {
+            return "The request contains no messages";
+        }
+        if (messages.size() > batchMaxMessages) {
+            return String.format("The request contains more than %s messages", batchMaxMessages);
+        }
+        for (int i = 0; i < messages.size(); i++) {
+            String error = validateMessage(messages.get(i));
+            if (error != null) {
+                return String.format("Message %s: %s", i, error);
+            }
+        }
+        return null;
+    }
+}
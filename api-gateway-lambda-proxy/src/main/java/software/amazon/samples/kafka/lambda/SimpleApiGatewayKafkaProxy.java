@@ -6,27 +6,67 @@ import com.amazonaws.services.lambda.runtime.Context;
 import com.amazonaws.services.lambda.runtime.RequestHandler;
 import com.amazonaws.services.lambda.runtime.events.APIGatewayProxyRequestEvent;
 import com.amazonaws.services.lambda.runtime.events.APIGatewayProxyResponseEvent;
+import com.fasterxml.jackson.core.JsonProcessingException;
+import com.fasterxml.jackson.databind.JsonNode;
+import com.fasterxml.jackson.databind.ObjectMapper;
+import com.fasterxml.jackson.databind.node.ArrayNode;
+import com.fasterxml.jackson.databind.node.ObjectNode;
+import org.apache.kafka.clients.producer.Callback;
 import org.apache.kafka.clients.producer.KafkaProducer;
 import org.apache.kafka.clients.producer.ProducerRecord;
 import org.apache.kafka.clients.producer.RecordMetadata;
+import org.apache.kafka.common.serialization.StringSerializer;
 import org.apache.logging.log4j.LogManager;
 import org.apache.logging.log4j.Logger;
+import org.crac.Core;
+import org.crac.Resource;
 import software.amazon.lambda.powertools.logging.Logging;
 import software.amazon.lambda.powertools.tracing.Tracing;
 
+import java.io.ByteArrayOutputStream;
+import java.nio.charset.StandardCharsets;
+import java.time.Duration;
+import java.util.ArrayList;
+import java.util.Base64;
 import java.util.HashMap;
+import java.util.LinkedHashSet;
+import java.util.List;
 import java.util.Map;
+import java.util.Set;
+import java.util.concurrent.ExecutionException;
 import java.util.concurrent.Future;
-
-import static software.amazon.lambda.powertools.utilities.jmespath.Base64Function.decode;
+import java.util.concurrent.atomic.AtomicLong;
+import java.util.zip.GZIPOutputStream;
 
 // This class is part of the AWS samples package and specifically deals with Kafka integration in a Lambda function.
 // It serves as a simple API Gateway to Kafka Proxy, accepting requests and forwarding them to a Kafka topic.
-public class SimpleApiGatewayKafkaProxy implements RequestHandler<APIGatewayProxyRequestEvent, APIGatewayProxyResponseEvent> {
+// With SnapStart the runtime hooks (CRaC) prime the producer before the snapshot and reconnect it after the restore.
+public class SimpleApiGatewayKafkaProxy implements RequestHandler<APIGatewayProxyRequestEvent, APIGatewayProxyResponseEvent>, Resource {
 
     // Specifies the name of the Kafka topic where the messages will be sent
     public final String TOPIC_NAME = System.getenv("TOPIC_NAME");
 
+    // Topics requests can write to through the topic path parameter (ALLOWED_TOPICS, comma separated), in addition to TOPIC_NAME
+    public Set<String> allowedTopics = parseTopics(System.getenv("ALLOWED_TOPICS"));
+
+    // Path parameter of the resources that write to the topic of the path, e.g. POST /orders
+    public static final String TOPIC_PATH_PARAMETER = "topic";
+
+    // Name of the record header carrying the X-Ray trace header of the request, the consumer links its batch segments to it
+    public static final String TRACE_HEADER = "X-Amzn-Trace-Id";
+
+    // Path segment of the batch resource, requests to it carry an array of messages instead of a single payload
+    public static final String BATCH_RESOURCE = "batch";
+
+    // Acknowledgement mode in which the response is returned as soon as the records are enqueued in the producer
+    public static final String ASYNC_ACK_MODE = "async";
+
+    // Number of times the request path is run before the snapshot, so that the JIT compiles it
+    static final int PRIMING_ITERATIONS = 1000;
+
+    // Parses batch requests and serializes their responses
+    private static final ObjectMapper OBJECT_MAPPER = new ObjectMapper();
+
     // Logger instance for logging events of this class
     private static final Logger log = LogManager.getLogger(SimpleApiGatewayKafkaProxy.class);
     
@@ -34,7 +74,123 @@ public class SimpleApiGatewayKafkaProxy implements RequestHandler<APIGatewayProx
     public KafkaProducerPropertiesFactory kafkaProducerProperties = new KafkaProducerPropertiesFactoryImpl();
     
     // Instance of KafkaProducer
-    private KafkaProducer<String, String> producer;
+    KafkaProducer<String, String> producer;
+
+    // "sync" (default) waits until the records are written and returns 200, "async" returns 202 once they are enqueued
+    public String ackMode = System.getenv().getOrDefault("ACK_MODE", "sync");
+
+    // Strategy the record keys are taken from, the request ID by default
+    public RecordKeyStrategy keyStrategy = RecordKeyStrategy.fromEnvironment();
+
+    // Decodes base64 encoded and decompresses gzip compressed request bodies, up to MAX_DECOMPRESSED_BODY_BYTES
+    public RequestBodyDecoder bodyDecoder = RequestBodyDecoder.fromEnvironment();
+
+    // Validates requests against the request models of the REST API. VALIDATE_REQUESTS is set for the ingress types
+    // without request models (HTTP API and function URL), compressed requests are always validated.
+    public boolean validateRequests = Boolean.parseBoolean(System.getenv().getOrDefault("VALIDATE_REQUESTS", "false"));
+    public RequestModelValidator requestValidator = RequestModelValidator.fromEnvironment();
+
+    // Responses of requests with an Idempotency-Key, in an LRU cache and the optional shared store (IDEMPOTENCY_TABLE)
+    public IdempotentRequests idempotentRequests = IdempotentRequests.fromEnvironment();
+
+    // Records and distinct keys per partition, published after every invocation
+    final PartitionDistribution partitionDistribution = new PartitionDistribution();
+
+    // Salts hot keys so their records are spread over HOT_KEY_SALTS partitions, null if HOT_KEY_SALTS is not set
+    public HotKeyDetector hotKeys = HotKeyDetector.fromEnvironment();
+
+    // Drains the records of async invocations after the response was returned, null if the handler has to flush itself
+    ProducerDrainExtension drainExtension;
+
+    // Number of records of async invocations that could not be written
+    final AtomicLong asyncSendFailures = new AtomicLong();
+
+    // Counts the written records of async invocations and logs the ones that could not be written, the client already
+    // got its response
+    private Callback asyncSendCallback(String topic, String key) {
+        return (metadata, exception) -> {
+            if (exception != null) {
+                asyncSendFailures.incrementAndGet();
+                log.error(String.format("Enqueued record could not be written (%s failures so far)", asyncSendFailures.get()), exception);
+            } else {
+                partitionDistribution.record(topic, metadata.partition(), key);
+            }
+        };
+    }
+
+    // The runtime creates the handler during init, which is when the drain extension and the runtime hooks have to register
+    public SimpleApiGatewayKafkaProxy() {
+        if (isAsyncAck()) {
+            drainExtension = ProducerDrainExtension.startFromEnvironment(this::drainProducer);
+        }
+        Core.getGlobalContext().register(this);
+    }
+
+    // Runs before the SnapStart snapshot is taken. Without it the snapshot would not contain the producer, it is created
+    // on the first request. The connections and credentials of the primed producer are closed, every restored execution
+    // environment would share them.
+    @Override
+    public void beforeCheckpoint(org.crac.Context<? extends Resource> context) {
+        try {
+            primeProducer();
+        } catch (Exception e) {
+            log.error("Could not prime the producer before the snapshot", e);
+        }
+        closeProducer();
+    }
+
+    // Runs after an execution environment was restored from the snapshot: connects a new producer to the brokers, so the
+    // first request does not wait for the connection, the SASL/IAM authentication and the metadata of the topic
+    @Override
+    public void afterRestore(org.crac.Context<? extends Resource> context) {
+        try {
+            fetchTopicMetadata(createProducer());
+        } catch (Exception e) {
+            log.error("Could not connect the producer after the restore", e);
+        }
+    }
+
+    // Creates and connects the producer, which loads the producer, SASL/IAM authentication and network classes, and runs
+    // the request path (decompression, parsing, record creation, serialization, response) without sending, so the JIT compiles it
+    void primeProducer() throws Exception {
+        // Fetching the metadata of the topics connects to the brokers and authenticates with IAM
+        fetchTopicMetadata(createProducer());
+
+        StringSerializer serializer = new StringSerializer();
+        ByteArrayOutputStream compressed = new ByteArrayOutputStream();
+        try (GZIPOutputStream out = new GZIPOutputStream(compressed)) {
+            out.write("{\"messages\": [{\"payload\": \"priming\"}]}".getBytes(StandardCharsets.UTF_8));
+        }
+        APIGatewayProxyRequestEvent input = new APIGatewayProxyRequestEvent()
+                .withHeaders(Map.of("Content-Encoding", RequestBodyDecoder.GZIP))
+                .withIsBase64Encoded(true)
+                .withBody(Base64.getEncoder().encodeToString(compressed.toByteArray()));
+        for (int i = 0; i < PRIMING_ITERATIONS; i++) {
+            JsonNode messages = OBJECT_MAPPER.readTree(bodyDecoder.decode(input)).path("messages");
+            String key = keyStrategy.keyOf(input, messages.get(0), "priming-" + i);
+            ProducerRecord<String, String> record = createRecord(TOPIC_NAME, key, OBJECT_MAPPER.writeValueAsString(messages.get(0)));
+            serializer.serialize(record.topic(), record.headers(), record.key());
+            serializer.serialize(record.topic(), record.headers(), record.value());
+            OBJECT_MAPPER.writeValueAsString(OBJECT_MAPPER.createObjectNode().put("partition", 0).put("offset", i));
+        }
+    }
+
+    // Fetches the metadata of all topics the function writes to. The producer keeps it cached and refreshes it in the
+    // background, so no request waits for the metadata of its topic.
+    void fetchTopicMetadata(KafkaProducer<String, String> producer) {
+        producer.partitionsFor(TOPIC_NAME);
+        for (String topic : allowedTopics) {
+            producer.partitionsFor(topic);
+        }
+    }
+
+    // Closes the producer, the next request (or the restore hook) creates a new one
+    void closeProducer() {
+        if (producer != null) {
+            producer.close(Duration.ofSeconds(5));
+            producer = null;
+        }
+    }
 
     // Overridden method from the RequestHandler interface to handle incoming API Gateway proxy events
     @Override
@@ -45,37 +201,280 @@ public class SimpleApiGatewayKafkaProxy implements RequestHandler<APIGatewayProx
         // Creating a response object to send back 
         APIGatewayProxyResponseEvent response = createEmptyResponse();
         try {
-            // Extracting the message from the request body
-            String message = getMessageBody(input);
+            // Extracting the message from the request body, compressed bodies are decompressed
+            String message = bodyDecoder.decode(input);
+            if (message == null && mustValidate(input)) {
+                return createErrorResponse(response, 400, "The request has no body");
+            }
+
+            // Requests to the topic resources write to the topic of the path, if it is allowed
+            String topic = resolveTopic(input);
+            if (topic == null) {
+                return createErrorResponse(response, 404, "Unknown topic " + input.getPathParameters().get(TOPIC_PATH_PARAMETER));
+            }
+
+            // Retries of requests with an Idempotency-Key are answered with the response of the original request. In async
+            // mode the response does not tell whether the messages were written, there is nothing to replay.
+            String idempotencyKey = isAsyncAck() ? null : RequestBodyDecoder.getHeader(input.getHeaders(), IdempotentRequests.IDEMPOTENCY_KEY_HEADER);
+            if (idempotencyKey != null) {
+                if (idempotencyKey.isEmpty() || idempotencyKey.length() > IdempotentRequests.MAX_KEY_LENGTH) {
+                    return createErrorResponse(response, 400, String.format("The %s must have 1 to %s characters", IdempotentRequests.IDEMPOTENCY_KEY_HEADER, IdempotentRequests.MAX_KEY_LENGTH));
+                }
+                return handleIdempotentRequest(input, topic, message, idempotencyKey, context, response);
+            }
+            return handleMessages(input, topic, message, context, response, false);
+        } catch (RequestBodyDecoder.InvalidBodyException e) {
+            return createErrorResponse(response, e.getStatusCode(), e.getMessage());
+        } catch (JsonProcessingException e) {
+            return createErrorResponse(response, 400, "The body is not valid JSON");
+        } catch (Exception e) {
+            // In case of exception, log the error message and return a 500 status code
+            log.error(e.getMessage(), e);
+            return response.withBody(e.getMessage()).withStatusCode(500);
+        } finally {
+            partitionDistribution.publish();
+            if (hotKeys != null) {
+                hotKeys.publish();
+            }
+            // Let the drain extension flush the enqueued records while the runtime returns the response
+            if (drainExtension != null && drainExtension.isRunning()) {
+                drainExtension.invocationFinished();
+            }
+        }
+    }
 
-            // Create a Kafka producer
-            KafkaProducer<String, String> producer = createProducer();
+    // Returns true if the function has to validate the request: API Gateway did not validate it against the request models
+    boolean mustValidate(APIGatewayProxyRequestEvent input) {
+        return validateRequests || RequestBodyDecoder.isCompressed(input);
+    }
 
-            // Creating a record with topic name, request ID as key and message as value 
-            ProducerRecord<String, String> record = new ProducerRecord<String, String>(TOPIC_NAME, context.getAwsRequestId(), message);
+    // Returns true if the response is returned as soon as the records are enqueued
+    boolean isAsyncAck() {
+        return ASYNC_ACK_MODE.equals(ackMode);
+    }
+
+    // Flushes the enqueued records of an async invocation, unless the drain extension does it after the response.
+    // Without the extension the execution environment could be frozen (or shut down) with records still in the buffer.
+    private void flushUnlessDrainedAfterResponse(KafkaProducer<String, String> producer) {
+        if (drainExtension == null || !drainExtension.isRunning()) {
+            producer.flush();
+        }
+    }
 
-            // Sending the record to Kafka topic and getting the metadata of the record
-            Future<RecordMetadata> send = producer.send(record);
+    // Writes all enqueued records, called by the drain extension after the response and on shutdown
+    void drainProducer() {
+        if (producer != null) {
             producer.flush();
+        }
+    }
 
-            // Retrieve metadata about the sent record
-            RecordMetadata metadata = send.get();
+    // Processes a request with an Idempotency-Key once. Retries get the stored response of the original request, with
+    // its partitions and offsets and the header Idempotent-Replayed, and no messages are written again. A retry while
+    // the original request is still in progress gets 409. Only successful responses are stored, the retry of a request
+    // that failed writes its messages.
+    private APIGatewayProxyResponseEvent handleIdempotentRequest(APIGatewayProxyRequestEvent input, String topic, String message, String idempotencyKey, Context context, APIGatewayProxyResponseEvent response) throws Exception {
+        // The key is scoped to the topic and the resource, the same key sent to another resource is another request
+        String key = topic + "/" + (isBatchRequest(input) ? BATCH_RESOURCE : "message") + "/" + idempotencyKey;
+        String stored = idempotentRequests.lookup(key);
+        if (stored == null && !idempotentRequests.claim(key, context.getRemainingTimeInMillis() / 1000)) {
+            stored = idempotentRequests.lookup(key);
+            if (stored == null) {
+                return createErrorResponse(response, 409, "A request with the " + IdempotentRequests.IDEMPOTENCY_KEY_HEADER + " is in progress");
+            }
+        }
+        if (stored != null) {
+            log.info("Replaying the response of the idempotency key, no messages were written");
+            response.getHeaders().put(IdempotentRequests.REPLAYED_HEADER, "true");
+            return response.withStatusCode(200).withBody(stored);
+        }
 
-            // Logging the partition where the message was sent
-            log.info(String.format("Message was send to partition %s", metadata.partition()));
+        boolean completed = false;
+        try {
+            APIGatewayProxyResponseEvent result = handleMessages(input, topic, message, context, response, true);
+            if (result.getStatusCode() == 200) {
+                idempotentRequests.complete(key, result.getBody());
+                completed = true;
+            }
+            return result;
+        } finally {
+            if (!completed) {
+                idempotentRequests.release(key);
+            }
+        }
+    }
 
-            // If the message was successfully sent, return a 200 status code
-            return response.withStatusCode(200).withBody("Message successfully pushed to kafka");
-        } catch (Exception e) {
-            // In case of exception, log the error message and return a 500 status code
-            log.error(e.getMessage(), e);
-            return response.withBody(e.getMessage()).withStatusCode(500);
+    // Writes the messages of a batch or single message request. With reportPosition the response of a single message
+    // request contains the partition and offset of the record, like the response of a batch request.
+    private APIGatewayProxyResponseEvent handleMessages(APIGatewayProxyRequestEvent input, String topic, String message, Context context, APIGatewayProxyResponseEvent response, boolean reportPosition) throws Exception {
+        // Create a Kafka producer, it serves all topics
+        KafkaProducer<String, String> producer = createProducer();
+
+        // Batch requests are sent with a single flush (or only enqueued in async mode)
+        if (isBatchRequest(input)) {
+            return handleBatchRequest(input, topic, message, producer, context, response);
         }
+        return handleMessageRequest(input, topic, message, producer, context, response, reportPosition);
+    }
+
+    // Sends the message of a single message request
+    private APIGatewayProxyResponseEvent handleMessageRequest(APIGatewayProxyRequestEvent input, String topic, String message, KafkaProducer<String, String> producer, Context context, APIGatewayProxyResponseEvent response, boolean reportPosition) throws Exception {
+        // The message is only parsed if the key is read from it or if it has to be validated, it is forwarded as it was sent
+        boolean validate = mustValidate(input);
+        JsonNode parsed = keyStrategy.needsMessage() || validate ? OBJECT_MAPPER.readTree(message) : null;
+        String error = validate ? requestValidator.validateMessage(parsed) : null;
+        if (error != null) {
+            return createErrorResponse(response, 400, error);
+        }
+        String key = keyStrategy.keyOf(input, parsed, context.getAwsRequestId());
+        if (key == null) {
+            return createMissingKeyResponse(response);
+        }
+
+        // Creating a record with topic name, key and message as value
+        ProducerRecord<String, String> record = createRecord(topic, key, message);
+
+        // In async mode the record is only enqueued, it is sent with the records of the following requests
+        if (isAsyncAck()) {
+            producer.send(record, asyncSendCallback(topic, key));
+            flushUnlessDrainedAfterResponse(producer);
+            return response.withStatusCode(202).withBody("Message accepted for kafka");
+        }
+
+        // Sending the record to Kafka topic and getting the metadata of the record
+        Future<RecordMetadata> send = producer.send(record);
+        producer.flush();
+
+        // Retrieve metadata about the sent record
+        RecordMetadata metadata = send.get();
+
+        // Logging the partition where the message was sent
+        log.info(String.format("Message was send to partition %s", metadata.partition()));
+        partitionDistribution.record(topic, metadata.partition(), key);
+
+        // If the message was successfully sent, return a 200 status code
+        if (reportPosition) {
+            return response.withStatusCode(200).withBody(OBJECT_MAPPER.writeValueAsString(OBJECT_MAPPER.createObjectNode()
+                    .put("message", "Message successfully pushed to kafka")
+                    .put("topic", topic).put("partition", metadata.partition()).put("offset", metadata.offset())));
+        }
+        return response.withStatusCode(200).withBody("Message successfully pushed to kafka");
+    }
+
+    // Sends all messages of a batch request with a single flush and reports the partition and offset of every message in
+    // request order. Every message is forwarded as JSON object, like the body of a single message request, and gets its
+    // key from the key strategy (the request ID with its index by default). If any message could not be written, the
+    // response has status code 500 and the error of the failed messages, so the client can resend only those.
+    @Tracing
+    private APIGatewayProxyResponseEvent handleBatchRequest(APIGatewayProxyRequestEvent input, String topic, String body, KafkaProducer<String, String> producer, Context context, APIGatewayProxyResponseEvent response) throws Exception {
+        JsonNode batch = OBJECT_MAPPER.readTree(body);
+        String error = mustValidate(input) ? requestValidator.validateBatch(batch) : null;
+        if (error != null) {
+            return createErrorResponse(response, 400, error);
+        }
+        JsonNode messages = batch.path("messages");
+        if (!messages.isArray() || messages.isEmpty()) {
+            return createErrorResponse(response, 400, "The request contains no messages");
+        }
+
+        // The keys of all messages are resolved before any message is sent, a batch is either rejected or sent
+        List<String> keys = new ArrayList<>(messages.size());
+        for (int i = 0; i < messages.size(); i++) {
+            String key = keyStrategy.keyOf(input, messages.get(i), context.getAwsRequestId() + "-" + i);
+            if (key == null) {
+                return createMissingKeyResponse(response);
+            }
+            keys.add(key);
+        }
+
+        // In async mode the records are only enqueued and the response reports the number of accepted messages
+        if (isAsyncAck()) {
+            for (int i = 0; i < messages.size(); i++) {
+                producer.send(createRecord(topic, keys.get(i), OBJECT_MAPPER.writeValueAsString(messages.get(i))), asyncSendCallback(topic, keys.get(i)));
+            }
+            flushUnlessDrainedAfterResponse(producer);
+            return response.withStatusCode(202).withBody(String.format("{\"accepted\": %s}", messages.size()));
+        }
+
+        List<Future<RecordMetadata>> sends = new ArrayList<>(messages.size());
+        for (int i = 0; i < messages.size(); i++) {
+            String message = OBJECT_MAPPER.writeValueAsString(messages.get(i));
+            sends.add(producer.send(createRecord(topic, keys.get(i), message)));
+        }
+        producer.flush();
+
+        ArrayNode results = OBJECT_MAPPER.createArrayNode();
+        int failed = 0;
+        for (int i = 0; i < sends.size(); i++) {
+            ObjectNode result = results.addObject();
+            try {
+                RecordMetadata metadata = sends.get(i).get();
+                result.put("partition", metadata.partition()).put("offset", metadata.offset());
+                partitionDistribution.record(topic, metadata.partition(), keys.get(i));
+            } catch (ExecutionException e) {
+                failed++;
+                result.put("error", e.getCause().getMessage());
+            }
+        }
+        log.info(String.format("Batch of %s messages was sent, %s failed", sends.size(), failed));
+
+        ObjectNode responseBody = OBJECT_MAPPER.createObjectNode();
+        responseBody.put("failed", failed);
+        responseBody.set("messages", results);
+        return response.withStatusCode(failed == 0 ? 200 : 500).withBody(OBJECT_MAPPER.writeValueAsString(responseBody));
+    }
+
+    // Rejects a request that does not contain the key of the key strategy
+    private APIGatewayProxyResponseEvent createMissingKeyResponse(APIGatewayProxyResponseEvent response) {
+        return createErrorResponse(response, 400, "The request contains no key in " + keyStrategy.describe());
+    }
+
+    // Returns the topic of the request: the topic path parameter if the request was sent to a topic resource and the
+    // topic is allowed, TOPIC_NAME otherwise. Returns null for topics that are not allowed.
+    String resolveTopic(APIGatewayProxyRequestEvent input) {
+        String topic = input.getPathParameters() == null ? null : input.getPathParameters().get(TOPIC_PATH_PARAMETER);
+        if (topic == null) {
+            return TOPIC_NAME;
+        }
+        return topic.equals(TOPIC_NAME) || allowedTopics.contains(topic) ? topic : null;
+    }
+
+    // Parses a comma separated list of topics
+    static Set<String> parseTopics(String topics) {
+        Set<String> parsed = new LinkedHashSet<>();
+        if (topics != null) {
+            for (String topic : topics.split(",")) {
+                if (!topic.trim().isEmpty()) {
+                    parsed.add(topic.trim());
+                }
+            }
+        }
+        return parsed;
+    }
+
+    // Returns true if the request was sent to the batch resource
+    static boolean isBatchRequest(APIGatewayProxyRequestEvent input) {
+        String resource = input.getResource();
+        return resource != null && resource.endsWith("/" + BATCH_RESOURCE);
+    }
+
+    // Creates the record for a message and propagates the trace context of the request, so that the consumer time is part of the same trace.
+    // The key of a hot key is salted and the record carries the salt.
+    ProducerRecord<String, String> createRecord(String topic, String key, String message) {
+        int salt = hotKeys == null ? -1 : hotKeys.saltOf(topic, key);
+        ProducerRecord<String, String> record = new ProducerRecord<String, String>(topic, salt < 0 ? key : HotKeyDetector.salt(key, salt), message);
+        if (salt >= 0) {
+            record.headers().add(HotKeyDetector.SALT_HEADER, String.valueOf(salt).getBytes(StandardCharsets.UTF_8));
+        }
+        String traceHeader = getTraceHeader();
+        if (traceHeader != null) {
+            record.headers().add(TRACE_HEADER, traceHeader.getBytes(StandardCharsets.UTF_8));
+        }
+        return record;
     }
 
     // Creates a Kafka producer if it doesn't already exist
     @Tracing
-    private KafkaProducer<String, String> createProducer() {
+    KafkaProducer<String, String> createProducer() {
         if (producer == null) {
             log.info("Connecting to kafka cluster");
             producer = new KafkaProducer<String, String>(kafkaProducerProperties.getProducerProperties());
@@ -83,14 +482,23 @@ public class SimpleApiGatewayKafkaProxy implements RequestHandler<APIGatewayProx
         return producer;
     }
 
-    // Extracts the message from the request body. If it's base64 encoded, it's decoded first.
-    private String getMessageBody(APIGatewayProxyRequestEvent input) {
-        String body = input.getBody();
+    // Returns the X-Ray trace header of the current invocation. The Lambda runtime sets it as system property per invocation,
+    // the environment variable is the fallback for older runtimes. Returns null if the invocation is not traced.
+    static String getTraceHeader() {
+        String traceHeader = System.getProperty("com.amazonaws.xray.traceHeader");
+        if (traceHeader == null || traceHeader.isEmpty()) {
+            traceHeader = System.getenv("_X_AMZN_TRACE_ID");
+        }
+        return traceHeader == null || traceHeader.isEmpty() ? null : traceHeader;
+    }
 
-        if (input.getIsBase64Encoded()) {
-            body = decode(body);
+    // Creates a response for a request that could not be processed, with a JSON message
+    private APIGatewayProxyResponseEvent createErrorResponse(APIGatewayProxyResponseEvent response, int statusCode, String message) {
+        try {
+            return response.withStatusCode(statusCode).withBody(OBJECT_MAPPER.writeValueAsString(OBJECT_MAPPER.createObjectNode().put("message", message)));
+        } catch (JsonProcessingException e) {
+            return response.withStatusCode(statusCode).withBody(message);
         }
-        return body;
     }
 
     // Creates an empty API Gateway proxy response event with predefined headers.
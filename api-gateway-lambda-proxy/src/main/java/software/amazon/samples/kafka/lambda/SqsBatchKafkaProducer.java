@@ -0,0 +1,230 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.amazonaws.services.lambda.runtime.Context;
+import com.amazonaws.services.lambda.runtime.RequestHandler;
+import com.amazonaws.services.lambda.runtime.events.APIGatewayProxyRequestEvent;
+import com.amazonaws.services.lambda.runtime.events.SQSBatchResponse;
+import com.amazonaws.services.lambda.runtime.events.SQSEvent;
+import com.fasterxml.jackson.databind.JsonNode;
+import com.fasterxml.jackson.databind.ObjectMapper;
+import org.apache.kafka.clients.producer.KafkaProducer;
+import org.apache.kafka.clients.producer.ProducerRecord;
+import org.apache.kafka.clients.producer.RecordMetadata;
+import org.apache.logging.log4j.LogManager;
+import org.apache.logging.log4j.Logger;
+
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.HashMap;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Map;
+import java.util.concurrent.ExecutionException;
+import java.util.concurrent.Future;
+
+// Handler of the queue ingest mode. API Gateway sends every request to the ingest queue (body as message body, resource,
+// request ID, topic, key source and Idempotency-Key as message attributes), and the event source mapping delivers them in large batches.
+// The records of all messages of a batch are sent with a single flush, so many requests share each produce request.
+// Messages that could not be written are reported as batch item failures, the queue delivers them again and moves them
+// to the dead-letter queue after the maximum number of receives. Topic resolution, key strategy, validation, hot key
+// salting and the Idempotency-Key of requests are the ones of SimpleApiGatewayKafkaProxy.
+public class SqsBatchKafkaProducer implements RequestHandler<SQSEvent, SQSBatchResponse> {
+
+    // Message attributes set by the integration of the API (serverless_kafka_producer_stack.py)
+    public static final String RESOURCE_ATTRIBUTE = "resource";
+    public static final String REQUEST_ID_ATTRIBUTE = "requestId";
+    public static final String TOPIC_ATTRIBUTE = "topic";
+    public static final String KEY_ATTRIBUTE = "key";
+    public static final String IDEMPOTENCY_KEY_ATTRIBUTE = "idempotencyKey";
+
+    // System attribute with the X-Ray trace header of the request that sent the message
+    public static final String TRACE_ATTRIBUTE = "AWSTraceHeader";
+
+    private static final ObjectMapper OBJECT_MAPPER = new ObjectMapper();
+
+    // Logger instance for logging events of this class
+    private static final Logger log = LogManager.getLogger(SqsBatchKafkaProducer.class);
+
+    final SimpleApiGatewayKafkaProxy proxy;
+
+    public SqsBatchKafkaProducer() {
+        this(new SimpleApiGatewayKafkaProxy());
+    }
+
+    SqsBatchKafkaProducer(SimpleApiGatewayKafkaProxy proxy) {
+        this.proxy = proxy;
+    }
+
+    @Override
+    public SQSBatchResponse handleRequest(SQSEvent event, Context context) {
+        List<SQSBatchResponse.BatchItemFailure> failures = new ArrayList<>();
+        // Idempotency keys claimed by this batch per message ID, the keys of messages that were not written are released
+        Map<String, String> claimedKeys = new HashMap<>();
+        try {
+            KafkaProducer<String, String> producer = proxy.createProducer();
+
+            // Records of every message that could be converted, they are all sent before the single flush
+            Map<String, List<ProducerRecord<String, String>>> records = new LinkedHashMap<>();
+            Map<String, List<Future<RecordMetadata>>> sends = new LinkedHashMap<>();
+            for (SQSEvent.SQSMessage message : event.getRecords()) {
+                String idempotencyKey;
+                try {
+                    records.put(message.getMessageId(), createRecords(message));
+                    idempotencyKey = idempotencyKeyOf(message);
+                } catch (Exception e) {
+                    log.error(String.format("Message %s could not be converted into records", message.getMessageId()), e);
+                    failures.add(new SQSBatchResponse.BatchItemFailure(message.getMessageId()));
+                    continue;
+                }
+                if (idempotencyKey != null) {
+                    // Retries of a written request (or of a request earlier in the batch) are deleted without writing
+                    // them again, a retry of a request in progress in another invocation is delivered again later
+                    String stored = proxy.idempotentRequests.lookup(idempotencyKey);
+                    if (stored == null && !claimedKeys.containsValue(idempotencyKey)
+                            && !proxy.idempotentRequests.claim(idempotencyKey, context.getRemainingTimeInMillis() / 1000)) {
+                        stored = proxy.idempotentRequests.lookup(idempotencyKey);
+                        if (stored == null) {
+                            failures.add(new SQSBatchResponse.BatchItemFailure(message.getMessageId()));
+                            continue;
+                        }
+                    }
+                    if (stored != null || claimedKeys.containsValue(idempotencyKey)) {
+                        log.info(String.format("Message %s is a retry of request %s, its records are not written again", message.getMessageId(), idempotencyKey));
+                        continue;
+                    }
+                    claimedKeys.put(message.getMessageId(), idempotencyKey);
+                }
+                List<Future<RecordMetadata>> messageSends = new ArrayList<>();
+                for (ProducerRecord<String, String> record : records.get(message.getMessageId())) {
+                    messageSends.add(producer.send(record));
+                }
+                sends.put(message.getMessageId(), messageSends);
+            }
+            producer.flush();
+
+            // A message failed if any of its records could not be written, the retry writes all of its records again
+            for (Map.Entry<String, List<Future<RecordMetadata>>> messageSends : sends.entrySet()) {
+                List<ProducerRecord<String, String>> messageRecords = records.get(messageSends.getKey());
+                boolean failed = false;
+                for (int i = 0; i < messageSends.getValue().size(); i++) {
+                    try {
+                        RecordMetadata metadata = messageSends.getValue().get(i).get();
+                        proxy.partitionDistribution.record(metadata.topic(), metadata.partition(), messageRecords.get(i).key());
+                    } catch (ExecutionException e) {
+                        log.error(String.format("Record of message %s could not be written", messageSends.getKey()), e.getCause());
+                        failed = true;
+                    }
+                }
+                if (failed) {
+                    failures.add(new SQSBatchResponse.BatchItemFailure(messageSends.getKey()));
+                } else if (claimedKeys.containsKey(messageSends.getKey())) {
+                    proxy.idempotentRequests.complete(claimedKeys.remove(messageSends.getKey()),
+                            OBJECT_MAPPER.createObjectNode().put("messageId", messageSends.getKey()).toString());
+                }
+            }
+            log.info(String.format("Batch of %s messages was sent, %s failed", event.getRecords().size(), failures.size()));
+        } finally {
+            // Releases the keys of the messages that were not written, so that their retries write them
+            for (String idempotencyKey : claimedKeys.values()) {
+                proxy.idempotentRequests.release(idempotencyKey);
+            }
+            proxy.partitionDistribution.publish();
+            if (proxy.hotKeys != null) {
+                proxy.hotKeys.publish();
+            }
+        }
+        return new SQSBatchResponse(failures);
+    }
+
+    // Returns the idempotency key of the request of a message, scoped to the topic and resource like the direct ingest
+    // scopes it, or null if the request had no Idempotency-Key
+    String idempotencyKeyOf(SQSEvent.SQSMessage message) {
+        String idempotencyKey = attribute(message, IDEMPOTENCY_KEY_ATTRIBUTE);
+        if (idempotencyKey == null) {
+            return null;
+        }
+        if (idempotencyKey.length() > IdempotentRequests.MAX_KEY_LENGTH) {
+            throw new IllegalArgumentException(String.format("The %s must have 1 to %s characters", IdempotentRequests.IDEMPOTENCY_KEY_HEADER, IdempotentRequests.MAX_KEY_LENGTH));
+        }
+        APIGatewayProxyRequestEvent input = toRequest(message);
+        return proxy.resolveTopic(input) + "/" + (SimpleApiGatewayKafkaProxy.isBatchRequest(input) ? SimpleApiGatewayKafkaProxy.BATCH_RESOURCE : "message") + "/" + idempotencyKey;
+    }
+
+    // Creates the records of a message: one for a single message request, one per message for a batch request. Invalid
+    // messages (e.g. sent to the queue directly) are rejected with an exception, they end up in the dead-letter queue.
+    List<ProducerRecord<String, String>> createRecords(SQSEvent.SQSMessage message) throws Exception {
+        APIGatewayProxyRequestEvent input = toRequest(message);
+        String topic = proxy.resolveTopic(input);
+        if (topic == null) {
+            throw new IllegalArgumentException("Unknown topic " + input.getPathParameters().get(SimpleApiGatewayKafkaProxy.TOPIC_PATH_PARAMETER));
+        }
+        String requestId = attribute(message, REQUEST_ID_ATTRIBUTE);
+        if (requestId == null) {
+            requestId = message.getMessageId();
+        }
+
+        JsonNode body = OBJECT_MAPPER.readTree(message.getBody());
+        List<ProducerRecord<String, String>> records = new ArrayList<>();
+        if (SimpleApiGatewayKafkaProxy.isBatchRequest(input)) {
+            String error = proxy.requestValidator.validateBatch(body);
+            if (error != null) {
+                throw new IllegalArgumentException(error);
+            }
+            JsonNode messages = body.path("messages");
+            for (int i = 0; i < messages.size(); i++) {
+                records.add(createRecord(input, topic, messages.get(i), OBJECT_MAPPER.writeValueAsString(messages.get(i)), requestId + "-" + i, message));
+            }
+        } else {
+            String error = proxy.requestValidator.validateMessage(body);
+            if (error != null) {
+                throw new IllegalArgumentException(error);
+            }
+            // The message is forwarded as it was sent, like by the direct ingest
+            records.add(createRecord(input, topic, body, message.getBody(), requestId, message));
+        }
+        return records;
+    }
+
+    // Creates the record of a message with the key of the key strategy and the trace header of the request
+    private ProducerRecord<String, String> createRecord(APIGatewayProxyRequestEvent input, String topic, JsonNode parsed, String value, String requestKey, SQSEvent.SQSMessage message) {
+        String key = proxy.keyStrategy.keyOf(input, parsed, requestKey);
+        if (key == null) {
+            throw new IllegalArgumentException("The request contains no key in " + proxy.keyStrategy.describe());
+        }
+        ProducerRecord<String, String> record = proxy.createRecord(topic, key, value);
+        String traceHeader = message.getAttributes() == null ? null : message.getAttributes().get(TRACE_ATTRIBUTE);
+        if (traceHeader != null) {
+            record.headers().remove(SimpleApiGatewayKafkaProxy.TRACE_HEADER);
+            record.headers().add(SimpleApiGatewayKafkaProxy.TRACE_HEADER, traceHeader.getBytes(StandardCharsets.UTF_8));
+        }
+        return record;
+    }
+
+    // Restores the parts of the API request the proxy reads from the message attributes: the resource, the topic path
+    // parameter and the key of the header or path parameter key strategies
+    APIGatewayProxyRequestEvent toRequest(SQSEvent.SQSMessage message) {
+        Map<String, String> pathParameters = new HashMap<>();
+        Map<String, String> headers = new HashMap<>();
+        String topic = attribute(message, TOPIC_ATTRIBUTE);
+        if (topic != null) {
+            pathParameters.put(SimpleApiGatewayKafkaProxy.TOPIC_PATH_PARAMETER, topic);
+        }
+        String key = attribute(message, KEY_ATTRIBUTE);
+        if (key != null && proxy.keyStrategy.getSource() != null) {
+            pathParameters.put(proxy.keyStrategy.getSource(), key);
+            headers.put(proxy.keyStrategy.getSource(), key);
+        }
+        return new APIGatewayProxyRequestEvent()
+                .withResource(attribute(message, RESOURCE_ATTRIBUTE))
+                .withPathParameters(pathParameters)
+                .withHeaders(headers)
+                .withBody(message.getBody());
+    }
+
+    private static String attribute(SQSEvent.SQSMessage message, String name) {
+        SQSEvent.MessageAttribute attribute = message.getMessageAttributes() == null ? null : message.getMessageAttributes().get(name);
+        return attribute == null || attribute.getStringValue() == null || attribute.getStringValue().isEmpty() ? null : attribute.getStringValue();
+    }
+}
@@ -0,0 +1,120 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.amazonaws.services.lambda.runtime.Context;
+import com.amazonaws.services.lambda.runtime.events.APIGatewayProxyRequestEvent;
+import com.fasterxml.jackson.databind.JsonNode;
+import com.fasterxml.jackson.databind.ObjectMapper;
+
+import java.nio.file.Files;
+import java.util.Arrays;
+import java.util.Properties;
+import java.util.concurrent.BlockingQueue;
+import java.util.concurrent.LinkedBlockingQueue;
+import java.util.concurrent.Semaphore;
+
+import static org.mockito.Mockito.mock;
+import static org.mockito.Mockito.when;
+
+// Compares the latency of the sync and the async acknowledgement mode against a local broker: the time until the
+// response is returned (what the client waits for) and the time until the invocation is finished (when Lambda would
+// freeze the execution environment). In async mode the drain extension flushes after every invocation, like in Lambda.
+//
+// mvn -q test-compile dependency:build-classpath -Dmdep.outputFile=target/classpath.txt
+// java -cp target/classes:target/test-classes:$(cat target/classpath.txt) software.amazon.samples.kafka.lambda.AckModeLatencyBenchmark [requests]
+public class AckModeLatencyBenchmark {
+
+    private static final ObjectMapper OBJECT_MAPPER = new ObjectMapper();
+
+    // Stand-in for the Extensions API: invoke() hands an INVOKE event to the extension, awaitFinished() waits until the
+    // extension asks for the next event again
+    static class LocalExtensionsApi implements ProducerDrainExtension.ExtensionsApi {
+        private final BlockingQueue<JsonNode> events = new LinkedBlockingQueue<>();
+        private final Semaphore ready = new Semaphore(0);
+
+        @Override
+        public void register(String name) {
+        }
+
+        @Override
+        public JsonNode nextEvent() throws InterruptedException {
+            ready.release();
+            return events.take();
+        }
+
+        void invoke(long timeoutMs) {
+            events.add(OBJECT_MAPPER.createObjectNode().put("eventType", "INVOKE").put("deadlineMs", System.currentTimeMillis() + timeoutMs));
+        }
+
+        void awaitFinished() throws InterruptedException {
+            ready.acquire();
+        }
+    }
+
+    public static void main(String[] args) throws Exception {
+        int requests = args.length > 0 ? Integer.parseInt(args[0]) : 1000;
+        KafkaLocalServer server = new KafkaLocalServer(Files.createTempDirectory("kafka").toFile(), 2181);
+        server.start();
+        try {
+            System.out.printf("%-6s %10s %10s %10s %10s%n", "mode", "resp p50", "resp p99", "done p50", "done p99");
+            for (String mode : new String[]{"sync", SimpleApiGatewayKafkaProxy.ASYNC_ACK_MODE}) {
+                long[][] latencies = run(mode, server.getZookeeperConnectionString(), requests);
+                System.out.printf("%-6s %8.2fms %8.2fms %8.2fms %8.2fms%n", mode,
+                        percentile(latencies[0], 50), percentile(latencies[0], 99), percentile(latencies[1], 50), percentile(latencies[1], 99));
+            }
+        } finally {
+            server.stop();
+        }
+    }
+
+    // Returns the response and the finished latencies (nanoseconds) of the measured requests, after as many warm-up requests
+    private static long[][] run(String mode, String bootstrapServers, int requests) throws Exception {
+        Properties props = new Properties();
+        props.put("bootstrap.servers", bootstrapServers);
+        props.put("key.serializer", "org.apache.kafka.common.serialization.StringSerializer");
+        props.put("value.serializer", "org.apache.kafka.common.serialization.StringSerializer");
+
+        SimpleApiGatewayKafkaProxy handler = new SimpleApiGatewayKafkaProxy();
+        handler.kafkaProducerProperties = () -> props;
+        handler.ackMode = mode;
+        LocalExtensionsApi api = new LocalExtensionsApi();
+        if (handler.isAsyncAck()) {
+            handler.drainExtension = new ProducerDrainExtension(api, handler::drainProducer);
+            handler.drainExtension.start();
+            api.awaitFinished();
+        }
+
+        Context context = mock(Context.class);
+        when(context.getAwsRequestId()).thenReturn("benchmark");
+        APIGatewayProxyRequestEvent event = new APIGatewayProxyRequestEvent()
+                .withResource("/ProducerAPIResource")
+                .withIsBase64Encoded(false)
+                .withBody("{\"payload\": \"Hello World\"}");
+
+        long[] responded = new long[requests];
+        long[] finished = new long[requests];
+        for (int i = -requests; i < requests; i++) {
+            long start = System.nanoTime();
+            if (handler.drainExtension != null) {
+                api.invoke(30000);
+            }
+            handler.handleRequest(event, context);
+            long response = System.nanoTime();
+            if (handler.drainExtension != null) {
+                api.awaitFinished();
+            }
+            if (i >= 0) {
+                responded[i] = response - start;
+                finished[i] = System.nanoTime() - start;
+            }
+        }
+        return new long[][]{responded, finished};
+    }
+
+    private static double percentile(long[] nanos, double percentile) {
+        long[] sorted = nanos.clone();
+        Arrays.sort(sorted);
+        return sorted[(int) Math.min(sorted.length - 1, Math.ceil(percentile / 100 * sorted.length) - 1)] / 1e6;
+    }
+}
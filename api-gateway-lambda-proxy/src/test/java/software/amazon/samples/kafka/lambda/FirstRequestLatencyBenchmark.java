@@ -0,0 +1,108 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.amazonaws.services.lambda.runtime.Context;
+import com.amazonaws.services.lambda.runtime.events.APIGatewayProxyRequestEvent;
+
+import java.io.BufferedReader;
+import java.io.InputStreamReader;
+import java.nio.file.Files;
+import java.nio.file.Paths;
+import java.util.ArrayList;
+import java.util.Collections;
+import java.util.List;
+import java.util.Properties;
+
+import static org.mockito.Mockito.mock;
+import static org.mockito.Mockito.when;
+
+// Compares the latency of the first request of an execution environment without and with the runtime hooks against a
+// local broker. Every measurement runs in a new JVM: "cold" handles the first request like an execution environment
+// without SnapStart (classes not loaded, no connection), "primed" runs beforeCheckpoint and afterRestore first, like an
+// execution environment restored from a snapshot that was taken after the priming. The JVM of the restore is the JVM
+// of the checkpoint here, so the numbers do not include the restore itself (the "Restore Duration" of the REPORT log
+// line in Lambda).
+//
+// mvn -q test-compile dependency:build-classpath -Dmdep.outputFile=target/classpath.txt
+// TOPIC_NAME=ServerlessKafkaTopic java -cp target/classes:target/test-classes:$(cat target/classpath.txt) software.amazon.samples.kafka.lambda.FirstRequestLatencyBenchmark [runs]
+public class FirstRequestLatencyBenchmark {
+
+    // Prefix of the line the child JVM reports its latency with, the other lines are log output
+    private static final String LATENCY_PREFIX = "first-request-ms=";
+
+    public static void main(String[] args) throws Exception {
+        if (args.length == 3 && "child".equals(args[0])) {
+            System.out.println(LATENCY_PREFIX + firstRequest(args[1], args[2]));
+            System.exit(0);
+        }
+        int runs = args.length > 0 ? Integer.parseInt(args[0]) : 5;
+        KafkaLocalServer server = new KafkaLocalServer(Files.createTempDirectory("kafka").toFile(), 2181);
+        server.start();
+        try {
+            System.out.printf("%-7s %10s %10s %10s%n", "mode", "min", "median", "max");
+            for (String mode : new String[]{"cold", "primed"}) {
+                List<Double> latencies = new ArrayList<>();
+                for (int i = 0; i < runs; i++) {
+                    latencies.add(runChild(mode, server.getZookeeperConnectionString()));
+                }
+                Collections.sort(latencies);
+                System.out.printf("%-7s %8.2fms %8.2fms %8.2fms%n", mode,
+                        latencies.get(0), latencies.get(latencies.size() / 2), latencies.get(latencies.size() - 1));
+            }
+        } finally {
+            server.stop();
+        }
+    }
+
+    // Runs one measurement in a new JVM and returns the latency of its first request in milliseconds
+    private static double runChild(String mode, String bootstrapServers) throws Exception {
+        String java = Paths.get(System.getProperty("java.home"), "bin", "java").toString();
+        ProcessBuilder builder = new ProcessBuilder(java, "-cp", System.getProperty("java.class.path"),
+                FirstRequestLatencyBenchmark.class.getName(), "child", mode, bootstrapServers);
+        builder.redirectError(ProcessBuilder.Redirect.INHERIT);
+        Process process = builder.start();
+        String latency = null;
+        try (BufferedReader reader = new BufferedReader(new InputStreamReader(process.getInputStream()))) {
+            for (String line = reader.readLine(); line != null; line = reader.readLine()) {
+                if (line.startsWith(LATENCY_PREFIX)) {
+                    latency = line.substring(LATENCY_PREFIX.length()).trim();
+                }
+            }
+        }
+        if (process.waitFor() != 0 || latency == null) {
+            throw new IllegalStateException("The " + mode + " measurement failed");
+        }
+        return Double.parseDouble(latency);
+    }
+
+    // Creates the handler, primes it if requested, and returns the latency of the first request in milliseconds
+    private static double firstRequest(String mode, String bootstrapServers) {
+        Properties props = new Properties();
+        props.put("bootstrap.servers", bootstrapServers);
+        props.put("key.serializer", "org.apache.kafka.common.serialization.StringSerializer");
+        props.put("value.serializer", "org.apache.kafka.common.serialization.StringSerializer");
+
+        SimpleApiGatewayKafkaProxy handler = new SimpleApiGatewayKafkaProxy();
+        handler.kafkaProducerProperties = () -> props;
+        if ("primed".equals(mode)) {
+            handler.beforeCheckpoint(null);
+            handler.afterRestore(null);
+        }
+
+        Context context = mock(Context.class);
+        when(context.getAwsRequestId()).thenReturn("benchmark");
+        APIGatewayProxyRequestEvent event = new APIGatewayProxyRequestEvent()
+                .withResource("/ProducerAPIResource")
+                .withIsBase64Encoded(false)
+                .withBody("{\"payload\": \"Hello World\"}");
+
+        long start = System.nanoTime();
+        int statusCode = handler.handleRequest(event, context).getStatusCode();
+        double latency = (System.nanoTime() - start) / 1e6;
+        if (statusCode != 200) {
+            throw new IllegalStateException("The first request failed with status code " + statusCode);
+        }
+        return latency;
+    }
+}
@@ -0,0 +1,56 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.amazonaws.services.lambda.runtime.events.APIGatewayProxyRequestEvent;
+import org.junit.Test;
+
+import java.util.Map;
+import java.util.Set;
+
+import static org.junit.Assert.assertEquals;
+import static org.junit.Assert.assertNull;
+
+public class FunctionUrlKafkaProxyTest {
+
+    @Test
+    public void pathsMapToTheResourcesOfTheRestApi() {
+        SimpleApiGatewayKafkaProxy proxy = new SimpleApiGatewayKafkaProxy();
+        proxy.keyStrategy = new RecordKeyStrategy(RecordKeyStrategy.PATH_PARAMETER, "customerId");
+        proxy.allowedTopics = Set.of("orders");
+        FunctionUrlKafkaProxy functionUrl = new FunctionUrlKafkaProxy(proxy);
+
+        assertEquals("/ProducerAPIResource", functionUrl.toRequest("/ProducerAPIResource").getResource());
+        assertEquals("/ProducerAPIResource/batch", functionUrl.toRequest("/ProducerAPIResource/batch/").getResource());
+
+        APIGatewayProxyRequestEvent keyed = functionUrl.toRequest("/ProducerAPIResource/c%2D1");
+        assertEquals("/ProducerAPIResource/{customerId}", keyed.getResource());
+        assertEquals(Map.of("customerId", "c-1"), keyed.getPathParameters());
+
+        APIGatewayProxyRequestEvent topic = functionUrl.toRequest("/orders/batch");
+        assertEquals("/{topic}/batch", topic.getResource());
+        assertEquals(Map.of("topic", "orders"), topic.getPathParameters());
+
+        assertNull(functionUrl.toRequest("/"));
+        assertNull(functionUrl.toRequest("/orders/batch/1"));
+    }
+
+    @Test
+    public void topicPathsRequireAllowedTopics() {
+        FunctionUrlKafkaProxy functionUrl = new FunctionUrlKafkaProxy(new SimpleApiGatewayKafkaProxy());
+
+        assertNull(functionUrl.toRequest("/orders"));
+        assertNull(functionUrl.toRequest("/ProducerAPIResource/c-1"));
+    }
+
+    @Test
+    public void otherMethodsAreRejected() {
+        FunctionUrlKafkaProxy functionUrl = new FunctionUrlKafkaProxy(new SimpleApiGatewayKafkaProxy());
+
+        Map<String, Object> response = functionUrl.handleRequest(Map.of(
+                "rawPath", "/ProducerAPIResource",
+                "requestContext", Map.of("http", Map.of("method", "GET"))), null);
+
+        assertEquals(405, response.get("statusCode"));
+    }
+}
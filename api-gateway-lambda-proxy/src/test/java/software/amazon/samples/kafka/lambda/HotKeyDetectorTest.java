@@ -0,0 +1,83 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.fasterxml.jackson.databind.JsonNode;
+import com.fasterxml.jackson.databind.ObjectMapper;
+import org.junit.Test;
+
+import java.io.ByteArrayOutputStream;
+import java.io.PrintStream;
+import java.nio.charset.StandardCharsets;
+import java.util.HashSet;
+import java.util.Map;
+import java.util.Set;
+import java.util.concurrent.atomic.AtomicLong;
+
+import static org.junit.Assert.assertEquals;
+import static org.junit.Assert.assertThrows;
+import static org.junit.Assert.assertTrue;
+
+public class HotKeyDetectorTest {
+
+    private final AtomicLong now = new AtomicLong(1_000_000);
+    private final ByteArrayOutputStream metrics = new ByteArrayOutputStream();
+    private final HotKeyDetector detector = new HotKeyDetector(4, 10, 60, 3, "ServerlessKafka", "ServerlessKafkaProducer",
+            new PrintStream(metrics, true, StandardCharsets.UTF_8), now::get);
+
+    @Test
+    public void keysAboveTheThresholdAreSaltedWithBoundedSalts() {
+        Set<Integer> salts = new HashSet<>();
+        for (int i = 0; i < 9; i++) {
+            assertEquals(-1, detector.saltOf("orders", "customer-1"));
+        }
+        for (int i = 0; i < 20; i++) {
+            salts.add(detector.saltOf("orders", "customer-1"));
+        }
+
+        assertEquals(Set.of(0, 1, 2, 3), salts);
+        assertEquals(-1, detector.saltOf("orders", "customer-2"));
+        assertEquals(-1, detector.saltOf("orders", null));
+        assertEquals(Map.of("orders/customer-1", 29L), detector.currentHotKeys());
+    }
+
+    @Test
+    public void replacedKeysDoNotBecomeHot() {
+        for (int i = 0; i < 10; i++) {
+            detector.saltOf("orders", "a");
+            detector.saltOf("orders", "b");
+            detector.saltOf("orders", "c");
+        }
+        // A new key replaces the least frequent key and inherits its count, but only as overestimation
+        assertEquals(-1, detector.saltOf("orders", "d"));
+        assertEquals(2, detector.currentHotKeys().size());
+    }
+
+    @Test
+    public void hotKeysStaySaltedForOneWindowAndArePublished() throws Exception {
+        for (int i = 0; i < 10; i++) {
+            detector.saltOf("orders", "customer-1");
+        }
+        detector.publish();
+        assertEquals(0, metrics.size());
+
+        now.addAndGet(60_000);
+        assertTrue(detector.saltOf("orders", "customer-1") >= 0);
+        detector.publish();
+
+        JsonNode document = new ObjectMapper().readTree(metrics.toString(StandardCharsets.UTF_8));
+        assertEquals("customer-1", document.get("HotKey").asText());
+        assertEquals("orders", document.get("Topic").asText());
+        assertEquals(10, document.get("HotKeyRecords").asLong());
+        // The key is a log field, not a dimension
+        assertEquals("[[\"Service\",\"Topic\"]]", document.get("_aws").get("CloudWatchMetrics").get(0).get("Dimensions").toString());
+
+        now.addAndGet(120_000);
+        assertEquals(-1, detector.saltOf("orders", "customer-1"));
+    }
+
+    @Test
+    public void invalidSettingsFailAtStartup() {
+        assertThrows(IllegalArgumentException.class, () -> new HotKeyDetector(1, 10, 60, 100));
+    }
+}
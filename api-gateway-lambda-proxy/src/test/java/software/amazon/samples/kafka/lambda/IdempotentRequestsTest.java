@@ -0,0 +1,96 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import org.junit.Test;
+
+import java.util.HashMap;
+import java.util.Map;
+import java.util.concurrent.atomic.AtomicLong;
+
+import static org.junit.Assert.assertEquals;
+import static org.junit.Assert.assertFalse;
+import static org.junit.Assert.assertNull;
+import static org.junit.Assert.assertTrue;
+
+public class IdempotentRequestsTest {
+
+    // Shared store of the tests, the status of an entry is its response, null while in progress
+    private static class MapStore implements IdempotencyStore {
+        final Map<String, String> responses = new HashMap<>();
+        int gets;
+
+        @Override
+        public String get(String key) {
+            gets++;
+            return responses.get(key);
+        }
+
+        @Override
+        public boolean claim(String key, long expiresAt) {
+            if (responses.containsKey(key)) {
+                return false;
+            }
+            responses.put(key, null);
+            return true;
+        }
+
+        @Override
+        public void complete(String key, String response, long expiresAt) {
+            responses.put(key, response);
+        }
+
+        @Override
+        public void release(String key) {
+            responses.remove(key);
+        }
+    }
+
+    @Test
+    public void responsesAreCachedUntilTheyExpire() {
+        AtomicLong now = new AtomicLong(1000);
+        IdempotentRequests requests = new IdempotentRequests(null, 10, 60, now::get);
+
+        assertNull(requests.lookup("a"));
+        assertTrue(requests.claim("a", 30));
+        requests.complete("a", "{\"partition\": 0, \"offset\": 1}");
+
+        assertEquals("{\"partition\": 0, \"offset\": 1}", requests.lookup("a"));
+        now.addAndGet(61);
+        assertNull(requests.lookup("a"));
+    }
+
+    @Test
+    public void leastRecentlyUsedResponsesAreEvicted() {
+        IdempotentRequests requests = new IdempotentRequests(null, 2, 60, () -> 1000);
+        requests.complete("a", "1");
+        requests.complete("b", "2");
+        requests.lookup("a");
+        requests.complete("c", "3");
+
+        assertEquals("1", requests.lookup("a"));
+        assertNull(requests.lookup("b"));
+        assertEquals("3", requests.lookup("c"));
+    }
+
+    @Test
+    public void theSharedStoreAnswersOtherExecutionEnvironments() {
+        MapStore store = new MapStore();
+        IdempotentRequests first = new IdempotentRequests(store, 10, 60);
+        IdempotentRequests second = new IdempotentRequests(store, 10, 60);
+
+        assertTrue(first.claim("a", 30));
+        assertFalse(second.claim("a", 30));
+        assertNull(second.lookup("a"));
+
+        first.complete("a", "1");
+        assertEquals("1", second.lookup("a"));
+        int gets = store.gets;
+        assertEquals("1", second.lookup("a"));
+        assertEquals(gets, store.gets);
+
+        assertTrue(first.claim("b", 30));
+        first.release("b");
+        assertTrue(second.claim("b", 30));
+    }
+}
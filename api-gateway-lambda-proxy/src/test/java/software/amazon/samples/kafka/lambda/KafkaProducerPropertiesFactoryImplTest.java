@@ -0,0 +1,67 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import org.junit.Test;
+
+import java.util.Map;
+import java.util.Properties;
+
+import static org.junit.Assert.assertEquals;
+import static org.junit.Assert.assertThrows;
+import static org.junit.Assert.assertTrue;
+
+public class KafkaProducerPropertiesFactoryImplTest {
+
+    @Test
+    public void defaultsKeepConnectionsOpen() {
+        Properties properties = new KafkaProducerPropertiesFactoryImpl(Map.of("BOOTSTRAP_SERVER", "broker:9098")).getProducerProperties();
+
+        assertEquals("broker:9098", properties.get("bootstrap.servers"));
+        assertEquals("540000", properties.get("connections.max.idle.ms"));
+        assertEquals("all", properties.get("acks"));
+        assertEquals("true", properties.get("enable.idempotence"));
+    }
+
+    @Test
+    public void settingsAreReadFromTheEnvironment() {
+        Properties properties = new KafkaProducerPropertiesFactoryImpl(Map.of(
+                "BOOTSTRAP_SERVER", "broker:9098",
+                "PRODUCER_COMPRESSION_TYPE", "zstd",
+                "PRODUCER_LINGER_MS", "5",
+                "PRODUCER_BATCH_SIZE", "65536")).getProducerProperties();
+
+        assertEquals("zstd", properties.get("compression.type"));
+        assertEquals("5", properties.get("linger.ms"));
+        assertEquals("65536", properties.get("batch.size"));
+    }
+
+    @Test
+    public void invalidSettingsFailAtStartup() {
+        IllegalArgumentException error = assertThrows(IllegalArgumentException.class, () -> new KafkaProducerPropertiesFactoryImpl(Map.of(
+                "PRODUCER_COMPRESSION_TYPE", "brotli",
+                "PRODUCER_LINGER_MS", "soon")));
+
+        assertTrue(error.getMessage().contains("PRODUCER_COMPRESSION_TYPE"));
+        assertTrue(error.getMessage().contains("PRODUCER_LINGER_MS"));
+    }
+
+    @Test
+    public void idempotenceRequiresAcksAll() {
+        assertThrows(IllegalArgumentException.class, () -> new KafkaProducerPropertiesFactoryImpl(Map.of("PRODUCER_ACKS", "1")));
+
+        Properties properties = new KafkaProducerPropertiesFactoryImpl(Map.of(
+                "BOOTSTRAP_SERVER", "broker:9098",
+                "PRODUCER_ACKS", "1",
+                "PRODUCER_ENABLE_IDEMPOTENCE", "false")).getProducerProperties();
+
+        assertEquals("1", properties.get("acks"));
+    }
+
+    @Test
+    public void deliveryTimeoutCoversLingerAndRequestTimeout() {
+        assertThrows(IllegalArgumentException.class, () -> new KafkaProducerPropertiesFactoryImpl(Map.of(
+                "PRODUCER_REQUEST_TIMEOUT_MS", "30000",
+                "PRODUCER_DELIVERY_TIMEOUT_MS", "20000")));
+    }
+}
@@ -0,0 +1,50 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.fasterxml.jackson.databind.JsonNode;
+import com.fasterxml.jackson.databind.ObjectMapper;
+import org.junit.Test;
+
+import java.io.ByteArrayOutputStream;
+import java.io.PrintStream;
+import java.nio.charset.StandardCharsets;
+import java.util.concurrent.atomic.AtomicLong;
+
+import static org.junit.Assert.assertEquals;
+
+public class PartitionDistributionTest {
+
+    @Test
+    public void recordsAndDistinctKeysArePublishedPerPartitionAndWindow() throws Exception {
+        ByteArrayOutputStream out = new ByteArrayOutputStream();
+        AtomicLong now = new AtomicLong(1_000_000);
+        PartitionDistribution distribution = new PartitionDistribution("ServerlessKafka", "ServerlessKafkaProducer", new PrintStream(out, true, StandardCharsets.UTF_8), 60, now::get);
+
+        // The records of several invocations of the window are counted together
+        distribution.record("orders", 0, "a");
+        distribution.record("orders", 0, "a");
+        distribution.publish();
+        distribution.record("orders", 0, "b");
+        distribution.record("orders", 1, "c");
+        distribution.publish();
+        assertEquals("", out.toString(StandardCharsets.UTF_8));
+
+        now.addAndGet(60_000);
+        distribution.publish();
+
+        String[] documents = out.toString(StandardCharsets.UTF_8).trim().split("\n");
+        assertEquals(2, documents.length);
+        JsonNode partition0 = new ObjectMapper().readTree(documents[0]);
+        assertEquals("orders", partition0.get("Topic").asText());
+        assertEquals("0", partition0.get("Partition").asText());
+        assertEquals(3, partition0.get("PartitionRecords").asLong());
+        assertEquals(2, partition0.get("PartitionDistinctKeys").asLong());
+        assertEquals("ServerlessKafka", partition0.at("/_aws/CloudWatchMetrics/0/Namespace").asText());
+
+        // The counts are reset after publishing
+        out.reset();
+        distribution.publish();
+        assertEquals("", out.toString(StandardCharsets.UTF_8));
+    }
+}
@@ -0,0 +1,58 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.amazonaws.services.lambda.runtime.events.APIGatewayProxyRequestEvent;
+import com.fasterxml.jackson.databind.JsonNode;
+import com.fasterxml.jackson.databind.ObjectMapper;
+import org.junit.Test;
+
+import java.util.Map;
+
+import static org.junit.Assert.assertEquals;
+import static org.junit.Assert.assertFalse;
+import static org.junit.Assert.assertNull;
+import static org.junit.Assert.assertThrows;
+import static org.junit.Assert.assertTrue;
+
+public class RecordKeyStrategyTest {
+
+    private static final ObjectMapper OBJECT_MAPPER = new ObjectMapper();
+
+    @Test
+    public void requestIdIsTheDefault() {
+        RecordKeyStrategy strategy = new RecordKeyStrategy(RecordKeyStrategy.REQUEST_ID, null);
+
+        assertFalse(strategy.needsMessage());
+        assertEquals("request-1", strategy.keyOf(new APIGatewayProxyRequestEvent(), null, "request-1"));
+    }
+
+    @Test
+    public void keyIsReadFromTheMessage() throws Exception {
+        RecordKeyStrategy strategy = new RecordKeyStrategy(RecordKeyStrategy.JSON_POINTER, "/customer/id");
+        JsonNode message = OBJECT_MAPPER.readTree("{\"payload\": \"a\", \"customer\": {\"id\": 42}}");
+
+        assertTrue(strategy.needsMessage());
+        assertEquals("42", strategy.keyOf(new APIGatewayProxyRequestEvent(), message, "request-1"));
+        assertNull(strategy.keyOf(new APIGatewayProxyRequestEvent(), OBJECT_MAPPER.readTree("{\"customer\": {}}"), "request-1"));
+        assertNull(strategy.keyOf(new APIGatewayProxyRequestEvent(), OBJECT_MAPPER.readTree("{\"customer\": {\"id\": [1]}}"), "request-1"));
+    }
+
+    @Test
+    public void keyIsReadFromTheRequest() {
+        APIGatewayProxyRequestEvent input = new APIGatewayProxyRequestEvent()
+                .withHeaders(Map.of("x-customer-id", "c-1"))
+                .withPathParameters(Map.of("customerId", "c-2"));
+
+        assertEquals("c-1", new RecordKeyStrategy(RecordKeyStrategy.HEADER, "X-Customer-Id").keyOf(input, null, "request-1"));
+        assertEquals("c-2", new RecordKeyStrategy(RecordKeyStrategy.PATH_PARAMETER, "customerId").keyOf(input, null, "request-1"));
+        assertNull(new RecordKeyStrategy(RecordKeyStrategy.PATH_PARAMETER, "customerid").keyOf(input, null, "request-1"));
+    }
+
+    @Test
+    public void invalidSettingsFailAtStartup() {
+        assertThrows(IllegalArgumentException.class, () -> new RecordKeyStrategy("random", null));
+        assertThrows(IllegalArgumentException.class, () -> new RecordKeyStrategy(RecordKeyStrategy.HEADER, ""));
+        assertThrows(IllegalArgumentException.class, () -> new RecordKeyStrategy(RecordKeyStrategy.JSON_POINTER, "customer"));
+    }
+}
@@ -0,0 +1,67 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.amazonaws.services.lambda.runtime.events.APIGatewayProxyRequestEvent;
+import org.junit.Test;
+
+import java.io.ByteArrayOutputStream;
+import java.io.IOException;
+import java.nio.charset.StandardCharsets;
+import java.util.Base64;
+import java.util.Map;
+import java.util.zip.GZIPOutputStream;
+
+import static org.junit.Assert.assertEquals;
+import static org.junit.Assert.assertThrows;
+
+public class RequestBodyDecoderTest {
+
+    private final RequestBodyDecoder decoder = new RequestBodyDecoder(1024);
+
+    // Returns a request with the gzip compressed body, as API Gateway passes binary media types to the function
+    static APIGatewayProxyRequestEvent compressedRequest(String body) throws IOException {
+        ByteArrayOutputStream compressed = new ByteArrayOutputStream();
+        try (GZIPOutputStream out = new GZIPOutputStream(compressed)) {
+            out.write(body.getBytes(StandardCharsets.UTF_8));
+        }
+        return new APIGatewayProxyRequestEvent()
+                .withHeaders(Map.of("content-type", "application/gzip"))
+                .withIsBase64Encoded(true)
+                .withBody(Base64.getEncoder().encodeToString(compressed.toByteArray()));
+    }
+
+    @Test
+    public void uncompressedBodiesAreDecoded() throws Exception {
+        assertEquals("{\"payload\": \"a\"}", decoder.decode(new APIGatewayProxyRequestEvent().withIsBase64Encoded(false).withBody("{\"payload\": \"a\"}")));
+        assertEquals("{\"test\":\"body\"}", decoder.decode(new APIGatewayProxyRequestEvent().withIsBase64Encoded(true).withBody("eyJ0ZXN0IjoiYm9keSJ9")));
+    }
+
+    @Test
+    public void compressedBodiesAreDecompressed() throws Exception {
+        assertEquals("{\"payload\": \"a\"}", decoder.decode(compressedRequest("{\"payload\": \"a\"}")));
+    }
+
+    @Test
+    public void decompressedBodiesAreCapped() throws Exception {
+        APIGatewayProxyRequestEvent input = compressedRequest("{\"payload\": \"" + "a".repeat(2048) + "\"}");
+
+        RequestBodyDecoder.InvalidBodyException error = assertThrows(RequestBodyDecoder.InvalidBodyException.class, () -> decoder.decode(input));
+        assertEquals(413, error.getStatusCode());
+    }
+
+    @Test
+    public void invalidCompressedBodiesAreRejected() {
+        APIGatewayProxyRequestEvent notGzip = new APIGatewayProxyRequestEvent()
+                .withHeaders(Map.of("Content-Encoding", "gzip"))
+                .withIsBase64Encoded(true)
+                .withBody(Base64.getEncoder().encodeToString("{\"payload\": \"a\"}".getBytes(StandardCharsets.UTF_8)));
+        APIGatewayProxyRequestEvent notBinary = new APIGatewayProxyRequestEvent()
+                .withHeaders(Map.of("Content-Encoding", "gzip"))
+                .withIsBase64Encoded(false)
+                .withBody("{\"payload\": \"a\"}");
+
+        assertEquals(400, assertThrows(RequestBodyDecoder.InvalidBodyException.class, () -> decoder.decode(notGzip)).getStatusCode());
+        assertEquals(415, assertThrows(RequestBodyDecoder.InvalidBodyException.class, () -> decoder.decode(notBinary)).getStatusCode());
+    }
+}
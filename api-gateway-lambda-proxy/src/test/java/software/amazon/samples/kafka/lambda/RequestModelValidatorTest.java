@@ -0,0 +1,33 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.fasterxml.jackson.databind.ObjectMapper;
+import org.junit.Test;
+
+import static org.junit.Assert.assertEquals;
+import static org.junit.Assert.assertNull;
+
+public class RequestModelValidatorTest {
+
+    private static final ObjectMapper OBJECT_MAPPER = new ObjectMapper();
+
+    private final RequestModelValidator validator = new RequestModelValidator(2);
+
+    @Test
+    public void messagesRequireAStringPayload() throws Exception {
+        assertNull(validator.validateMessage(OBJECT_MAPPER.readTree("{\"payload\": \"a\", \"customerId\": 1}")));
+        assertEquals("The message must be an object", validator.validateMessage(OBJECT_MAPPER.readTree("[]")));
+        assertEquals("The message must have the string property payload", validator.validateMessage(OBJECT_MAPPER.readTree("{\"payload\": 1}")));
+    }
+
+    @Test
+    public void batchesAreLimited() throws Exception {
+        assertNull(validator.validateBatch(OBJECT_MAPPER.readTree("{\"messages\": [{\"payload\": \"a\"}, {\"payload\": \"b\"}]}")));
+        assertEquals("The request contains no messages", validator.validateBatch(OBJECT_MAPPER.readTree("{\"messages\": []}")));
+        assertEquals("The request contains more than 2 messages",
+                validator.validateBatch(OBJECT_MAPPER.readTree("{\"messages\": [{\"payload\": \"a\"}, {\"payload\": \"b\"}, {\"payload\": \"c\"}]}")));
+        assertEquals("Message 1: The message must have the string property payload",
+                validator.validateBatch(OBJECT_MAPPER.readTree("{\"messages\": [{\"payload\": \"a\"}, {}]}")));
+    }
+}
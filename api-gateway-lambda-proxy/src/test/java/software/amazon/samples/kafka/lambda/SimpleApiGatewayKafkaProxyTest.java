@@ -4,7 +4,9 @@ package software.amazon.samples.kafka.lambda;
 
 import com.amazonaws.services.lambda.runtime.Context;
 import com.amazonaws.services.lambda.runtime.events.APIGatewayProxyRequestEvent;
+import com.amazonaws.services.lambda.runtime.events.APIGatewayProxyResponseEvent;
 import com.amazonaws.services.lambda.runtime.tests.EventLoader;
+import org.apache.kafka.clients.consumer.ConsumerRecord;
 import org.apache.kafka.clients.consumer.ConsumerRecords;
 import org.apache.kafka.clients.consumer.KafkaConsumer;
 import org.junit.After;
@@ -12,15 +14,22 @@ import org.junit.Before;
 import org.junit.Rule;
 import org.junit.Test;
 import org.junit.rules.TemporaryFolder;
+import com.fasterxml.jackson.databind.JsonNode;
+import com.fasterxml.jackson.databind.ObjectMapper;
 import org.junit.runner.RunWith;
 import org.mockito.Mock;
 import org.mockito.junit.MockitoJUnitRunner;
 
+import java.nio.charset.StandardCharsets;
 import java.time.Duration;
 import java.util.Arrays;
+import java.util.Map;
 import java.util.Properties;
 
 import static org.junit.Assert.assertEquals;
+import static org.junit.Assert.assertNotNull;
+import static org.junit.Assert.assertNull;
+import static org.junit.Assert.assertTrue;
 import static org.mockito.Mockito.when;
 
 
@@ -76,6 +85,259 @@ public class SimpleApiGatewayKafkaProxyTest {
         consumer.close();
     }
 
+    @Test
+    public void handleRequestPropagatesTraceHeader() {
+        String traceHeader = "Root=1-5759e988-bd862e3fe1be46a994272793;Parent=53995c3f42cd8ad8;Sampled=1";
+        System.setProperty("com.amazonaws.xray.traceHeader", traceHeader);
+
+        when(contextMock.getAwsRequestId()).thenReturn("1");
+        when(kafkaProducerPropertiesFactoryMock.getProducerProperties()).thenReturn(producerProps());
+
+        SimpleApiGatewayKafkaProxy simpleApiGatewayKafkaProxy= new SimpleApiGatewayKafkaProxy();
+        simpleApiGatewayKafkaProxy.kafkaProducerProperties = kafkaProducerPropertiesFactoryMock;
+
+        APIGatewayProxyRequestEvent event = EventLoader.loadApiGatewayRestEvent("src/test/resources/test_event.json");
+
+        try {
+            simpleApiGatewayKafkaProxy.handleRequest(event, contextMock);
+        } finally {
+            System.clearProperty("com.amazonaws.xray.traceHeader");
+        }
+
+        KafkaConsumer<String, String> consumer = new KafkaConsumer<>(consumerProperties());
+        consumer.subscribe(Arrays.asList(TOPIC_NAME));
+        ConsumerRecords<String, String> records = consumer.poll(Duration.ofSeconds(5));
+
+        ConsumerRecord<String, String> record = records.iterator().next();
+        assertEquals(traceHeader, new String(record.headers().lastHeader(SimpleApiGatewayKafkaProxy.TRACE_HEADER).value(), StandardCharsets.UTF_8));
+        consumer.close();
+    }
+
+    @Test
+    public void handleBatchRequest() throws Exception {
+
+        when(contextMock.getAwsRequestId()).thenReturn("1");
+        when(kafkaProducerPropertiesFactoryMock.getProducerProperties()).thenReturn(producerProps());
+
+        SimpleApiGatewayKafkaProxy simpleApiGatewayKafkaProxy= new SimpleApiGatewayKafkaProxy();
+        simpleApiGatewayKafkaProxy.kafkaProducerProperties = kafkaProducerPropertiesFactoryMock;
+
+        APIGatewayProxyRequestEvent event = new APIGatewayProxyRequestEvent()
+                .withResource("/ProducerAPIResource/" + SimpleApiGatewayKafkaProxy.BATCH_RESOURCE)
+                .withIsBase64Encoded(false)
+                .withBody("{\"messages\": [{\"payload\": \"a\"}, {\"payload\": \"b\"}, {\"payload\": \"c\"}]}");
+
+        APIGatewayProxyResponseEvent response = simpleApiGatewayKafkaProxy.handleRequest(event, contextMock);
+
+        assertEquals(200, (int) response.getStatusCode());
+        JsonNode results = new ObjectMapper().readTree(response.getBody()).get("messages");
+        assertEquals(3, results.size());
+        assertEquals(results.get(0).get("offset").asLong() + 2, results.get(2).get("offset").asLong());
+
+        KafkaConsumer<String, String> consumer = new KafkaConsumer<>(consumerProperties());
+        consumer.subscribe(Arrays.asList(TOPIC_NAME));
+        ConsumerRecords<String, String> records = consumer.poll(Duration.ofSeconds(5));
+
+        assertEquals(3, records.count());
+        assertEquals("{\"payload\":\"a\"}", records.iterator().next().value());
+        consumer.close();
+    }
+
+    @Test
+    public void handleRequestAsyncAck() {
+
+        when(contextMock.getAwsRequestId()).thenReturn("1");
+        when(kafkaProducerPropertiesFactoryMock.getProducerProperties()).thenReturn(producerProps());
+
+        SimpleApiGatewayKafkaProxy simpleApiGatewayKafkaProxy= new SimpleApiGatewayKafkaProxy();
+        simpleApiGatewayKafkaProxy.kafkaProducerProperties = kafkaProducerPropertiesFactoryMock;
+        simpleApiGatewayKafkaProxy.ackMode = SimpleApiGatewayKafkaProxy.ASYNC_ACK_MODE;
+
+        APIGatewayProxyRequestEvent event = EventLoader.loadApiGatewayRestEvent("src/test/resources/test_event.json");
+
+        APIGatewayProxyResponseEvent response = simpleApiGatewayKafkaProxy.handleRequest(event, contextMock);
+
+        // Without the drain extension the handler flushes the enqueued record itself
+        assertEquals(202, (int) response.getStatusCode());
+        KafkaConsumer<String, String> consumer = new KafkaConsumer<>(consumerProperties());
+        consumer.subscribe(Arrays.asList(TOPIC_NAME));
+        ConsumerRecords<String, String> records = consumer.poll(Duration.ofSeconds(5));
+
+        assertEquals(1, records.count());
+        assertEquals(0, simpleApiGatewayKafkaProxy.asyncSendFailures.get());
+        consumer.close();
+    }
+
+    @Test
+    public void handleRequestAfterRestore() {
+
+        when(contextMock.getAwsRequestId()).thenReturn("1");
+        when(kafkaProducerPropertiesFactoryMock.getProducerProperties()).thenReturn(producerProps());
+
+        SimpleApiGatewayKafkaProxy simpleApiGatewayKafkaProxy= new SimpleApiGatewayKafkaProxy();
+        simpleApiGatewayKafkaProxy.kafkaProducerProperties = kafkaProducerPropertiesFactoryMock;
+
+        // The primed producer is closed before the snapshot and a connected one is created after the restore
+        simpleApiGatewayKafkaProxy.beforeCheckpoint(null);
+        assertNull(simpleApiGatewayKafkaProxy.producer);
+        simpleApiGatewayKafkaProxy.afterRestore(null);
+        assertNotNull(simpleApiGatewayKafkaProxy.producer);
+
+        APIGatewayProxyRequestEvent event = EventLoader.loadApiGatewayRestEvent("src/test/resources/test_event.json");
+
+        APIGatewayProxyResponseEvent response = simpleApiGatewayKafkaProxy.handleRequest(event, contextMock);
+
+        // The priming does not write records to the topic
+        assertEquals(200, (int) response.getStatusCode());
+        KafkaConsumer<String, String> consumer = new KafkaConsumer<>(consumerProperties());
+        consumer.subscribe(Arrays.asList(TOPIC_NAME));
+        ConsumerRecords<String, String> records = consumer.poll(Duration.ofSeconds(5));
+
+        assertEquals(1, records.count());
+        consumer.close();
+    }
+
+    @Test
+    public void handleBatchRequestWithMessageKeys() throws Exception {
+
+        when(contextMock.getAwsRequestId()).thenReturn("1");
+        when(kafkaProducerPropertiesFactoryMock.getProducerProperties()).thenReturn(producerProps());
+
+        SimpleApiGatewayKafkaProxy simpleApiGatewayKafkaProxy= new SimpleApiGatewayKafkaProxy();
+        simpleApiGatewayKafkaProxy.kafkaProducerProperties = kafkaProducerPropertiesFactoryMock;
+        simpleApiGatewayKafkaProxy.keyStrategy = new RecordKeyStrategy(RecordKeyStrategy.JSON_POINTER, "/customerId");
+
+        APIGatewayProxyRequestEvent event = new APIGatewayProxyRequestEvent()
+                .withResource("/ProducerAPIResource/" + SimpleApiGatewayKafkaProxy.BATCH_RESOURCE)
+                .withIsBase64Encoded(false)
+                .withBody("{\"messages\": [{\"payload\": \"a\", \"customerId\": \"c-1\"}, {\"payload\": \"b\", \"customerId\": \"c-1\"}]}");
+
+        assertEquals(200, (int) simpleApiGatewayKafkaProxy.handleRequest(event, contextMock).getStatusCode());
+
+        // A batch with a message without key is rejected as a whole
+        APIGatewayProxyResponseEvent rejected = simpleApiGatewayKafkaProxy.handleRequest(event.withBody("{\"messages\": [{\"payload\": \"c\", \"customerId\": \"c-2\"}, {\"payload\": \"d\"}]}"), contextMock);
+        assertEquals(400, (int) rejected.getStatusCode());
+
+        KafkaConsumer<String, String> consumer = new KafkaConsumer<>(consumerProperties());
+        consumer.subscribe(Arrays.asList(TOPIC_NAME));
+        ConsumerRecords<String, String> records = consumer.poll(Duration.ofSeconds(5));
+
+        assertEquals(2, records.count());
+        for (ConsumerRecord<String, String> record : records) {
+            assertEquals("c-1", record.key());
+        }
+        consumer.close();
+    }
+
+    @Test
+    public void handleRequestToTopicResource() throws Exception {
+
+        when(contextMock.getAwsRequestId()).thenReturn("1");
+        when(kafkaProducerPropertiesFactoryMock.getProducerProperties()).thenReturn(producerProps());
+
+        SimpleApiGatewayKafkaProxy simpleApiGatewayKafkaProxy= new SimpleApiGatewayKafkaProxy();
+        simpleApiGatewayKafkaProxy.kafkaProducerProperties = kafkaProducerPropertiesFactoryMock;
+        simpleApiGatewayKafkaProxy.allowedTopics = SimpleApiGatewayKafkaProxy.parseTopics("orders, payments");
+
+        APIGatewayProxyRequestEvent event = new APIGatewayProxyRequestEvent()
+                .withResource("/{topic}")
+                .withPathParameters(Map.of(SimpleApiGatewayKafkaProxy.TOPIC_PATH_PARAMETER, "orders"))
+                .withIsBase64Encoded(false)
+                .withBody("{\"payload\": \"a\"}");
+
+        assertEquals(200, (int) simpleApiGatewayKafkaProxy.handleRequest(event, contextMock).getStatusCode());
+
+        // Topics that are not allowed are rejected
+        APIGatewayProxyResponseEvent rejected = simpleApiGatewayKafkaProxy.handleRequest(event.withPathParameters(Map.of(SimpleApiGatewayKafkaProxy.TOPIC_PATH_PARAMETER, "audit")), contextMock);
+        assertEquals(404, (int) rejected.getStatusCode());
+
+        KafkaConsumer<String, String> consumer = new KafkaConsumer<>(consumerProperties());
+        consumer.subscribe(Arrays.asList("orders"));
+        ConsumerRecords<String, String> records = consumer.poll(Duration.ofSeconds(5));
+
+        assertEquals(1, records.count());
+        consumer.close();
+    }
+
+    @Test
+    public void handleCompressedRequest() throws Exception {
+
+        when(contextMock.getAwsRequestId()).thenReturn("1");
+        when(kafkaProducerPropertiesFactoryMock.getProducerProperties()).thenReturn(producerProps());
+
+        SimpleApiGatewayKafkaProxy simpleApiGatewayKafkaProxy= new SimpleApiGatewayKafkaProxy();
+        simpleApiGatewayKafkaProxy.kafkaProducerProperties = kafkaProducerPropertiesFactoryMock;
+
+        APIGatewayProxyRequestEvent event = RequestBodyDecoderTest.compressedRequest("{\"payload\": \"compressed\"}")
+                .withResource("/ProducerAPIResource");
+
+        assertEquals(200, (int) simpleApiGatewayKafkaProxy.handleRequest(event, contextMock).getStatusCode());
+
+        // Compressed bodies are not validated by API Gateway, the function rejects invalid JSON
+        APIGatewayProxyRequestEvent invalid = RequestBodyDecoderTest.compressedRequest("payload").withResource("/ProducerAPIResource");
+        assertEquals(400, (int) simpleApiGatewayKafkaProxy.handleRequest(invalid, contextMock).getStatusCode());
+
+        KafkaConsumer<String, String> consumer = new KafkaConsumer<>(consumerProperties());
+        consumer.subscribe(Arrays.asList(TOPIC_NAME));
+        ConsumerRecords<String, String> records = consumer.poll(Duration.ofSeconds(5));
+
+        assertEquals(1, records.count());
+        assertEquals("{\"payload\": \"compressed\"}", records.iterator().next().value());
+        consumer.close();
+    }
+
+    @Test
+    public void handleInvalidRequestWithoutRequestModels() {
+        when(kafkaProducerPropertiesFactoryMock.getProducerProperties()).thenReturn(producerProps());
+
+        SimpleApiGatewayKafkaProxy simpleApiGatewayKafkaProxy = new SimpleApiGatewayKafkaProxy();
+        simpleApiGatewayKafkaProxy.kafkaProducerProperties = kafkaProducerPropertiesFactoryMock;
+        simpleApiGatewayKafkaProxy.validateRequests = true;
+
+        APIGatewayProxyRequestEvent event = new APIGatewayProxyRequestEvent()
+                .withResource("/ProducerAPIResource")
+                .withIsBase64Encoded(false)
+                .withBody("{\"payload\": 1}");
+        APIGatewayProxyRequestEvent batchEvent = new APIGatewayProxyRequestEvent()
+                .withResource("/ProducerAPIResource/batch")
+                .withIsBase64Encoded(false)
+                .withBody("{\"messages\": [{\"payload\": \"a\"}, {}]}");
+
+        assertEquals(400, (int) simpleApiGatewayKafkaProxy.handleRequest(event, contextMock).getStatusCode());
+        assertEquals(400, (int) simpleApiGatewayKafkaProxy.handleRequest(batchEvent, contextMock).getStatusCode());
+        assertEquals(400, (int) simpleApiGatewayKafkaProxy.handleRequest(event.withBody(null), contextMock).getStatusCode());
+    }
+
+    @Test
+    public void handleRetriedRequestWithIdempotencyKey() {
+        when(contextMock.getAwsRequestId()).thenReturn("1");
+        when(kafkaProducerPropertiesFactoryMock.getProducerProperties()).thenReturn(producerProps());
+
+        SimpleApiGatewayKafkaProxy simpleApiGatewayKafkaProxy = new SimpleApiGatewayKafkaProxy();
+        simpleApiGatewayKafkaProxy.kafkaProducerProperties = kafkaProducerPropertiesFactoryMock;
+
+        APIGatewayProxyRequestEvent event = new APIGatewayProxyRequestEvent()
+                .withResource("/ProducerAPIResource")
+                .withHeaders(Map.of("idempotency-key", "order-1"))
+                .withIsBase64Encoded(false)
+                .withBody("{\"payload\": \"Hello World\"}");
+
+        APIGatewayProxyResponseEvent response = simpleApiGatewayKafkaProxy.handleRequest(event, contextMock);
+        APIGatewayProxyResponseEvent retry = simpleApiGatewayKafkaProxy.handleRequest(event, contextMock);
+
+        assertEquals(200, (int) retry.getStatusCode());
+        assertEquals(response.getBody(), retry.getBody());
+        assertTrue(response.getBody().contains("\"offset\":0"));
+        assertEquals("true", retry.getHeaders().get(IdempotentRequests.REPLAYED_HEADER));
+
+        KafkaConsumer<String, String> consumer = new KafkaConsumer<>(consumerProperties());
+        consumer.subscribe(Arrays.asList(TOPIC_NAME));
+        ConsumerRecords<String, String> records = consumer.poll(Duration.ofSeconds(5));
+
+        assertEquals(1, records.count());
+        consumer.close();
+    }
+
     private Properties consumerProperties() {
 
         Properties props = new Properties();
@@ -0,0 +1,169 @@
+// Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+// SPDX-License-Identifier: MIT-0
+package software.amazon.samples.kafka.lambda;
+
+import com.amazonaws.services.lambda.runtime.Context;
+import com.amazonaws.services.lambda.runtime.events.SQSBatchResponse;
+import com.amazonaws.services.lambda.runtime.events.SQSEvent;
+import org.apache.kafka.clients.consumer.ConsumerRecord;
+import org.apache.kafka.clients.consumer.ConsumerRecords;
+import org.apache.kafka.clients.consumer.KafkaConsumer;
+import org.junit.After;
+import org.junit.Before;
+import org.junit.Rule;
+import org.junit.Test;
+import org.junit.rules.TemporaryFolder;
+import org.junit.runner.RunWith;
+import org.mockito.Mock;
+import org.mockito.junit.MockitoJUnitRunner;
+
+import java.time.Duration;
+import java.util.Arrays;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+import java.util.Properties;
+
+import static org.junit.Assert.assertEquals;
+import static org.mockito.Mockito.when;
+
+@RunWith(MockitoJUnitRunner.class)
+public class SqsBatchKafkaProducerTest {
+
+    private KafkaLocalServer server;
+    public final String TOPIC_NAME = System.getenv("TOPIC_NAME");
+
+    @Rule
+    public TemporaryFolder folder = new TemporaryFolder();
+
+    @Before
+    public void setup() throws Exception {
+        server = new KafkaLocalServer(folder.newFolder(), 2181);
+        server.start();
+    }
+
+    @After
+    public void teardown() throws Exception {
+        server.stop();
+    }
+
+    @Mock
+    private Context contextMock;
+
+    @Mock
+    private KafkaProducerPropertiesFactory kafkaProducerPropertiesFactoryMock;
+
+    @Test
+    public void handleBatchOfQueuedRequests() {
+        when(kafkaProducerPropertiesFactoryMock.getProducerProperties()).thenReturn(producerProps());
+
+        SimpleApiGatewayKafkaProxy proxy = new SimpleApiGatewayKafkaProxy();
+        proxy.kafkaProducerProperties = kafkaProducerPropertiesFactoryMock;
+        proxy.keyStrategy = new RecordKeyStrategy(RecordKeyStrategy.HEADER, "X-Customer-Id");
+        SqsBatchKafkaProducer producer = new SqsBatchKafkaProducer(proxy);
+
+        SQSEvent event = new SQSEvent();
+        event.setRecords(Arrays.asList(
+                message("1", "/ProducerAPIResource", "c-1", "{\"payload\": \"a\"}"),
+                message("2", "/ProducerAPIResource/" + SimpleApiGatewayKafkaProxy.BATCH_RESOURCE, "c-2", "{\"messages\": [{\"payload\": \"b\"}, {\"payload\": \"c\"}]}"),
+                // Without key, the message is reported as failed and the others are written
+                message("3", "/ProducerAPIResource", null, "{\"payload\": \"d\"}")));
+
+        SQSBatchResponse response = producer.handleRequest(event, contextMock);
+
+        List<SQSBatchResponse.BatchItemFailure> failures = response.getBatchItemFailures();
+        assertEquals(1, failures.size());
+        assertEquals("3", failures.get(0).getItemIdentifier());
+
+        KafkaConsumer<String, String> consumer = new KafkaConsumer<>(consumerProperties());
+        consumer.subscribe(Arrays.asList(TOPIC_NAME));
+        ConsumerRecords<String, String> records = consumer.poll(Duration.ofSeconds(5));
+
+        assertEquals(3, records.count());
+        Map<String, String> keys = new HashMap<>();
+        for (ConsumerRecord<String, String> record : records) {
+            keys.put(record.value(), record.key());
+        }
+        assertEquals("c-1", keys.get("{\"payload\": \"a\"}"));
+        assertEquals("c-2", keys.get("{\"payload\":\"c\"}"));
+        consumer.close();
+    }
+
+    @Test
+    public void writeRetriesOfQueuedRequestsOnce() {
+        when(kafkaProducerPropertiesFactoryMock.getProducerProperties()).thenReturn(producerProps());
+
+        SimpleApiGatewayKafkaProxy proxy = new SimpleApiGatewayKafkaProxy();
+        proxy.kafkaProducerProperties = kafkaProducerPropertiesFactoryMock;
+        proxy.keyStrategy = new RecordKeyStrategy(RecordKeyStrategy.HEADER, "X-Customer-Id");
+        SqsBatchKafkaProducer producer = new SqsBatchKafkaProducer(proxy);
+
+        // The client retried the first request before it was written, so both are in the batch
+        SQSEvent event = new SQSEvent();
+        event.setRecords(Arrays.asList(
+                message("1", "/ProducerAPIResource", "c-1", "{\"payload\": \"a\"}", "k-1"),
+                message("2", "/ProducerAPIResource", "c-1", "{\"payload\": \"a\"}", "k-1"),
+                message("3", "/ProducerAPIResource", "c-1", "{\"payload\": \"b\"}", "k-2")));
+        assertEquals(0, producer.handleRequest(event, contextMock).getBatchItemFailures().size());
+
+        // The client retried the first request after it was written
+        SQSEvent retry = new SQSEvent();
+        retry.setRecords(Arrays.asList(message("4", "/ProducerAPIResource", "c-1", "{\"payload\": \"a\"}", "k-1")));
+        assertEquals(0, producer.handleRequest(retry, contextMock).getBatchItemFailures().size());
+
+        KafkaConsumer<String, String> consumer = new KafkaConsumer<>(consumerProperties());
+        consumer.subscribe(Arrays.asList(TOPIC_NAME));
+        ConsumerRecords<String, String> records = consumer.poll(Duration.ofSeconds(5));
+
+        assertEquals(2, records.count());
+        consumer.close();
+    }
+
+    // Creates a message like the integration of the API sends it to the ingest queue
+    private SQSEvent.SQSMessage message(String messageId, String resource, String key, String body) {
+        return message(messageId, resource, key, body, null);
+    }
+
+    // Creates a message of a request with an Idempotency-Key (null for none)
+    private SQSEvent.SQSMessage message(String messageId, String resource, String key, String body, String idempotencyKey) {
+        Map<String, SQSEvent.MessageAttribute> attributes = new HashMap<>();
+        attributes.put(SqsBatchKafkaProducer.RESOURCE_ATTRIBUTE, attribute(resource));
+        attributes.put(SqsBatchKafkaProducer.REQUEST_ID_ATTRIBUTE, attribute("request-" + messageId));
+        if (key != null) {
+            attributes.put(SqsBatchKafkaProducer.KEY_ATTRIBUTE, attribute(key));
+        }
+        if (idempotencyKey != null) {
+            attributes.put(SqsBatchKafkaProducer.IDEMPOTENCY_KEY_ATTRIBUTE, attribute(idempotencyKey));
+        }
+        SQSEvent.SQSMessage message = new SQSEvent.SQSMessage();
+        message.setMessageId(messageId);
+        message.setMessageAttributes(attributes);
+        message.setBody(body);
+        return message;
+    }
+
+    private SQSEvent.MessageAttribute attribute(String value) {
+        SQSEvent.MessageAttribute attribute = new SQSEvent.MessageAttribute();
+        attribute.setDataType("String");
+        attribute.setStringValue(value);
+        return attribute;
+    }
+
+    private Properties consumerProperties() {
+        Properties props = new Properties();
+        props.put("bootstrap.servers", server.getZookeeperConnectionString());
+        props.put("group.id", "group1");
+        props.put("key.deserializer", "org.apache.kafka.common.serialization.StringDeserializer");
+        props.put("value.deserializer", "org.apache.kafka.common.serialization.StringDeserializer");
+        props.put("auto.offset.reset", "earliest");
+        return props;
+    }
+
+    private Properties producerProps() {
+        Properties props = new Properties();
+        props.put("bootstrap.servers", server.getZookeeperConnectionString());
+        props.put("key.serializer", "org.apache.kafka.common.serialization.StringSerializer");
+        props.put("value.serializer", "org.apache.kafka.common.serialization.StringSerializer");
+        return props;
+    }
+}
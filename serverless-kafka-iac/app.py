@@ -116,6 +116,7 @@ serverless_consumer = ServerlessKafkaConsumerStack(
     kafka_vpc=serverless_kafka_msk_stack.kafka_vpc, # Using Kafka VPC from MSK Stack
     kafka_security_group=serverless_kafka_msk_stack.kafka_security_group, # Using Security Group from MSK Stack
     msk_arn=serverless_kafka_msk_stack.msk_arn, # Using Amazon Resource Name from MSK Stack
+    kafka_bootstrap_server=serverless_handler.get_kafka_bootstrap_server, # Using Bootstrap Server from Handler Stack (output topic)
     env=cdk.Environment(
         account=os.getenv("CDK_DEFAULT_ACCOUNT"), region=os.getenv("CDK_DEFAULT_REGION")
     )
@@ -0,0 +1,103 @@
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import botocore
+import botocore.auth
+import botocore.awsrequest
+import requests
+
+# Load test of the producer endpoint of the stack: sends signed requests with a number of concurrent clients and
+# reports the client side latency percentiles. Deploy the stack with each apigateway_ingress_type and run it against
+# each deployment to compare the ingress types, e.g.
+#
+# cdk deploy ServerlessKafkaProducerStack && python load-test-api.py --requests 2000 --concurrency 20
+
+# Stack Name
+STACK_NAME = "ServerlessKafkaProducerStack"
+
+parser = argparse.ArgumentParser(description="Load test of the producer endpoint")
+parser.add_argument("--requests", type=int, default=1000, help="number of measured requests")
+parser.add_argument("--concurrency", type=int, default=10, help="number of concurrent clients")
+parser.add_argument("--warmup", type=int, default=50, help="number of requests before the measurement, they initialize the execution environments")
+parser.add_argument("--batch", type=int, default=0, help="send batch requests with this number of messages instead of single messages")
+args = parser.parse_args()
+
+# Get the endpoint from the CloudFormation stack outputs
+cloudformation = boto3.client('cloudformation')
+response = cloudformation.describe_stacks(StackName=STACK_NAME)
+REGION = response['Stacks'][0]['StackId'].split(':')[3]
+
+ENDPOINT_URL = None
+RESOURCE_PATH = None
+HTTP_METHOD = None
+INGRESS_TYPE = "rest"
+
+for output in response['Stacks'][0]['Outputs']:
+    if "ProducerAPIEndpoint" in output['OutputKey']:
+        ENDPOINT_URL = output['OutputValue']
+    elif output['OutputKey'] == ('ProducerAPIOutputBatchResourcePath' if args.batch else 'ProducerAPIOutputResourcePath'):
+        RESOURCE_PATH = output['OutputValue'].lstrip("/")
+    elif output['OutputKey'] == 'ProducerAPIOutputAPIMethod':
+        HTTP_METHOD = output['OutputValue']
+    elif output['OutputKey'] == 'ProducerAPIOutputIngressType':
+        INGRESS_TYPE = output['OutputValue']
+
+if not ENDPOINT_URL or not RESOURCE_PATH or not HTTP_METHOD:
+    print("Failed to retrieve the endpoint from the CDK Stack outputs")
+    sys.exit(1)
+
+FINAL_ENDPOINT_URL = f"{ENDPOINT_URL}{RESOURCE_PATH}"
+
+if args.batch:
+    payload = json.dumps({"messages": [{"payload": f"Hello World {i}"} for i in range(args.batch)]})
+else:
+    payload = json.dumps({"payload": "Hello World"})
+
+# Function URLs are signed for Lambda, the APIs for API Gateway
+credentials = botocore.session.get_session().get_credentials().get_frozen_credentials()
+signer = botocore.auth.SigV4Auth(credentials, 'lambda' if INGRESS_TYPE == "function_url" else 'execute-api', REGION)
+
+# One connection pool per client thread, so the latency does not include the TLS handshake of every request
+sessions = threading.local()
+
+
+# Sends a signed request and returns its latency in milliseconds and its status code
+def send(_):
+    if not hasattr(sessions, "session"):
+        sessions.session = requests.Session()
+    request = botocore.awsrequest.AWSRequest(method=HTTP_METHOD, url=FINAL_ENDPOINT_URL, data=payload,
+                                             headers={'Content-Type': 'application/json'})
+    signer.add_auth(request)
+    start = time.perf_counter()
+    result = sessions.session.request(method=HTTP_METHOD, url=FINAL_ENDPOINT_URL, data=payload, headers=dict(request.headers))
+    return (time.perf_counter() - start) * 1000, result.status_code
+
+
+with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+    list(executor.map(send, range(args.warmup)))
+    start = time.perf_counter()
+    results = list(executor.map(send, range(args.requests)))
+    duration = time.perf_counter() - start
+
+# Requests queued by the queue ingest mode are accepted with 202
+latencies = sorted(latency for latency, status_code in results if status_code in (200, 202))
+errors = len(results) - len(latencies)
+if not latencies:
+    print(f"All {errors} requests failed")
+    sys.exit(1)
+
+
+# Returns the percentile of the sorted latencies
+def percentile(p):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))]
+
+
+print(f"{'ingress':<13} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+print(f"{INGRESS_TYPE:<13} {len(results):>8} {errors:>6} {len(results) / duration:>8.1f} "
+      f"{statistics.median(latencies):>7.1f}ms {percentile(90):>7.1f}ms {percentile(99):>7.1f}ms {latencies[-1]:>7.1f}ms")
@@ -5,7 +5,8 @@ import logging as log
 from pathlib import Path
 import subprocess, shutil, os
 
-from aws_cdk import (Duration, Stack)
+from aws_cdk import (Duration, RemovalPolicy, Size, Stack)
+from aws_cdk import aws_dynamodb as dynamodb
 from aws_cdk import aws_ec2 as ec2
 from aws_cdk import aws_iam as iam
 from aws_cdk import aws_lambda as _lambda
@@ -17,6 +18,21 @@ from .helpers import get_group_name,  get_topic_name, add_permissions_to_policy,
 
 log.basicConfig(level=log.INFO)
 
+
+# Returns the topics the consumer function subscribes to. Per default this is "topic_name", with "topics" several
+# topics share one function, each with its own batch size, processor (see processor_registry.py) and consumer group.
+# The consumer group of an event source must be unique, so topics after the first one get the topic name appended.
+def get_topic_subscriptions(serverless_kafka_consumer_config) -> list:
+    consumer_group_id = serverless_kafka_consumer_config.get("function_event_source_consumer_group_id", "ServerlessKafkaConsumerGroup")
+    batch_size = serverless_kafka_consumer_config.get("function_event_source_batch_size", 100)
+    topics = serverless_kafka_consumer_config.get("topics") or [{"topic_name": serverless_kafka_consumer_config.get("topic_name", "ServerlessKafkaTopic")}]
+    return [{
+        "topic_name": topic["topic_name"],
+        "batch_size": topic.get("batch_size", batch_size),
+        "processor": topic.get("processor", "default"),
+        "consumer_group_id": topic.get("consumer_group_id", consumer_group_id if index == 0 else consumer_group_id + "-" + topic["topic_name"])
+    } for index, topic in enumerate(topics)]
+
 # Stack for a Kafka consumer Lambda function.
 class ServerlessKafkaConsumerStack(Stack):
     def __init__(
@@ -28,6 +44,7 @@ class ServerlessKafkaConsumerStack(Stack):
         kafka_vpc: ec2.IVpc,
         kafka_security_group: ec2.ISecurityGroup,
         msk_arn: str,
+        kafka_bootstrap_server: str = None,
         **kwargs,
     ):
         super().__init__(scope, construct_id, **kwargs)
@@ -41,18 +58,18 @@ class ServerlessKafkaConsumerStack(Stack):
         # Setting up a tag for the stack
         self.tags.set_tag("stack", serverless_kafka_consumer_config.get("stack_tag", "ServerlessKafkaConsumerStack"))
 
-        # Get the topic name from the stack config
-        topic_name = serverless_kafka_consumer_config.get("topic_name", "ServerlessKafkaTopic")
+        # Get the topics (with batch size, processor and consumer group) from the stack config
+        topics = get_topic_subscriptions(serverless_kafka_consumer_config)
 
         # Initialize the Kafka consumer Lambda function
         self.init_kafka_consumer_lambda(
             vpc=kafka_vpc,
             kafka_security_group=kafka_security_group,
             msk_arn=msk_arn,
-            topic_name=topic_name,
+            topics=topics,
             app_config=app_config,
-            serverless_kafka_consumer_config=serverless_kafka_consumer_config
-
+            serverless_kafka_consumer_config=serverless_kafka_consumer_config,
+            bootstrap_broker=kafka_bootstrap_server
         )
 
     # Create the Kafka consumer Lambda function
@@ -61,16 +78,12 @@ class ServerlessKafkaConsumerStack(Stack):
         vpc: ec2.IVpc,
         kafka_security_group: ec2.ISecurityGroup,
         msk_arn: str,
-        topic_name: str,
+        topics: list,
         app_config,
-        serverless_kafka_consumer_config
-
+        serverless_kafka_consumer_config,
+        bootstrap_broker: str = None
     ):
 
-        # Define consumer group ID
-        consumer_group_id = serverless_kafka_consumer_config.get("function_event_source_consumer_group_id", "ServerlessKafkaConsumerGroup",)
-
-
         # Create base policy to use for the Lambda function
         kafka_consumer_policy = iam.ManagedPolicy(self, 
                                                 serverless_kafka_consumer_config.get("function_id", "ConsumerLambda") + "Policy",
@@ -118,16 +131,60 @@ class ServerlessKafkaConsumerStack(Stack):
 
         
         # Add policies to base role to allow access to the MSK cluster
+        topic_arns = [get_topic_name(msk_arn, topic["topic_name"]) for topic in topics]
+        group_arns = [get_group_name(msk_arn, topic["consumer_group_id"]) for topic in topics]
         add_permissions_to_policy(role=kafka_consumer_role, permissions= {
             "kafka-cluster:Connect": [msk_arn],
-            "kafka-cluster:DescribeGroup": [get_group_name(msk_arn, consumer_group_id)],
-            "kafka-cluster:AlterGroup": [get_group_name(msk_arn, consumer_group_id)],
-            "kafka-cluster:DescribeTopic": [get_topic_name(msk_arn, topic_name)],
-            "kafka-cluster:ReadData": [get_topic_name(msk_arn, topic_name)],
-            "kafka-cluster:ReadGroup": [get_group_name(msk_arn, consumer_group_id)],
+            "kafka-cluster:DescribeGroup": group_arns,
+            "kafka-cluster:AlterGroup": group_arns,
+            "kafka-cluster:DescribeTopic": topic_arns,
+            "kafka-cluster:ReadData": topic_arns,
+            "kafka-cluster:ReadGroup": group_arns,
             "kafka-cluster:DescribeClusterDynamicConfiguration": [msk_arn]
         })
 
+        # Add policies to write to the output topic of the consume-transform-produce mode
+        output_topic_name = serverless_kafka_consumer_config.get("function_output_topic_name")
+        if output_topic_name and not bootstrap_broker:
+            raise ValueError("function_output_topic_name requires the bootstrap server of the cluster (kafka_bootstrap_server)")
+        if output_topic_name:
+            add_permissions_to_policy(role=kafka_consumer_role, permissions= {
+                "kafka-cluster:DescribeTopic": [get_topic_name(msk_arn, output_topic_name)],
+                "kafka-cluster:WriteData": [get_topic_name(msk_arn, output_topic_name)]
+            })
+
+        # Add policies to write to the key-value table
+        if serverless_kafka_consumer_config.get("function_kv_table_name"):
+            add_permissions_to_policy(role=kafka_consumer_role, permissions= {
+                "dynamodb:BatchWriteItem": [f"arn:aws:dynamodb:{self.region}:{self.account}:table/" + serverless_kafka_consumer_config.get("function_kv_table_name")]
+            })
+
+        # Create the table holding the token bucket shared by all instances of the rate limiter
+        rate_limit_table_name = None
+        if serverless_kafka_consumer_config.get("function_rate_limit_per_second"):
+            rate_limit_table = dynamodb.Table(self,
+                                              serverless_kafka_consumer_config.get("function_id", "ConsumerLambda") + "RateLimitTable",
+                                              partition_key=dynamodb.Attribute(name="bucket", type=dynamodb.AttributeType.STRING),
+                                              billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+                                              point_in_time_recovery=True,
+                                              removal_policy=RemovalPolicy.DESTROY)
+            rate_limit_table_name = rate_limit_table.table_name
+            add_permissions_to_policy(role=kafka_consumer_role, permissions= {
+                "dynamodb:GetItem": [rate_limit_table.table_arn],
+                "dynamodb:UpdateItem": [rate_limit_table.table_arn]
+            })
+
+        # Add policies for the reference data used by the enrichment stage (snapshot in S3 and remote lookups in DynamoDB)
+        enrichment_snapshot_uri = serverless_kafka_consumer_config.get("function_enrichment_snapshot_uri", "")
+        if enrichment_snapshot_uri.startswith("s3://"):
+            add_permissions_to_policy(role=kafka_consumer_role, permissions= {
+                "s3:GetObject": ["arn:aws:s3:::" + enrichment_snapshot_uri[len("s3://"):]]
+            })
+        if serverless_kafka_consumer_config.get("function_enrichment_table_name"):
+            add_permissions_to_policy(role=kafka_consumer_role, permissions= {
+                "dynamodb:BatchGetItem": [f"arn:aws:dynamodb:{self.region}:{self.account}:table/" + serverless_kafka_consumer_config.get("function_enrichment_table_name")]
+            })
+
         # Create base role to use for the Lambda function that performs log retention
         kafka_consumer_log_retention_role = iam.Role(scope=self, 
                                       id=serverless_kafka_consumer_config.get("function_id", "ConsumerLambda") + "LogRetentionRole",
@@ -145,46 +202,118 @@ class ServerlessKafkaConsumerStack(Stack):
         consumer_function_lambda_Layer= _lambda.LayerVersion.from_layer_version_arn(self, 
                                                                                     serverless_kafka_consumer_config.get("function_id", "ConsumerLambda") + "Layer", 
                                                                                      layer_version_arn=f"arn:aws:lambda:{self.region}:017000801446:layer:AWSLambdaPowertoolsPythonV2:40")
+        consumer_function_layers = [consumer_function_lambda_Layer]
+
+        # The columnar mode needs numpy (and optionally pyarrow), which are provided by an additional layer, e.g. AWS SDK for pandas
+        if serverless_kafka_consumer_config.get("function_columnar_layer_arn"):
+            consumer_function_layers.append(_lambda.LayerVersion.from_layer_version_arn(self,
+                                                                                         serverless_kafka_consumer_config.get("function_id", "ConsumerLambda") + "ColumnarLayer",
+                                                                                         layer_version_arn=serverless_kafka_consumer_config.get("function_columnar_layer_arn")))
+
+        # The consume-transform-produce mode needs kafka-python and the MSK IAM SASL signer, which are provided by an additional layer
+        if serverless_kafka_consumer_config.get("function_output_layer_arn"):
+            consumer_function_layers.append(_lambda.LayerVersion.from_layer_version_arn(self,
+                                                                                         serverless_kafka_consumer_config.get("function_id", "ConsumerLambda") + "OutputLayer",
+                                                                                         layer_version_arn=serverless_kafka_consumer_config.get("function_output_layer_arn")))
+
+        # Environment of the consumer function, optional settings are only added if they are configured
+        consumer_function_environment = {
+            "TOPIC_NAME": topics[0]["topic_name"],
+            "TOPIC_PROCESSORS": ",".join(topic["topic_name"] + "=" + topic["processor"] for topic in topics),
+            "POWERTOOLS_SERVICE_NAME": serverless_kafka_consumer_config.get("function_name", "ServerlessKafkaConsumer"),
+            "POWERTOOLS_METRICS_NAMESPACE": app_config.get('application_tag', "ServerlessKafka"),
+            "LOG_LEVEL": "INFO"
+        }
+        optional_environment = {
+            "COLUMNAR_FIELDS": serverless_kafka_consumer_config.get("function_columnar_fields"),
+            "COLUMNAR_FILTER": serverless_kafka_consumer_config.get("function_columnar_filter"),
+            "COLUMNAR_AGGREGATIONS": serverless_kafka_consumer_config.get("function_columnar_aggregations"),
+            "ENRICHMENT_KEY_FIELD": serverless_kafka_consumer_config.get("function_enrichment_key_field"),
+            "ENRICHMENT_TARGET_FIELD": serverless_kafka_consumer_config.get("function_enrichment_target_field"),
+            "ENRICHMENT_SNAPSHOT_URI": enrichment_snapshot_uri,
+            "ENRICHMENT_SNAPSHOT_KEY_FIELD": serverless_kafka_consumer_config.get("function_enrichment_snapshot_key_field"),
+            "ENRICHMENT_SNAPSHOT_TTL_SECONDS": serverless_kafka_consumer_config.get("function_enrichment_snapshot_ttl_seconds"),
+            "ENRICHMENT_TABLE_NAME": serverless_kafka_consumer_config.get("function_enrichment_table_name"),
+            "ENRICHMENT_TABLE_KEY": serverless_kafka_consumer_config.get("function_enrichment_table_key"),
+            "ENRICHMENT_CACHE_SIZE": serverless_kafka_consumer_config.get("function_enrichment_cache_size"),
+            "ENRICHMENT_CACHE_TTL_SECONDS": serverless_kafka_consumer_config.get("function_enrichment_cache_ttl_seconds"),
+            "OUTPUT_TOPIC_NAME": output_topic_name,
+            "OUTPUT_LINGER_MS": serverless_kafka_consumer_config.get("function_output_linger_ms"),
+            "OUTPUT_FLUSH_TIMEOUT_SECONDS": serverless_kafka_consumer_config.get("function_output_flush_timeout_seconds"),
+            "BOOTSTRAP_SERVER": bootstrap_broker if output_topic_name else None,
+            "KV_TABLE_NAME": serverless_kafka_consumer_config.get("function_kv_table_name"),
+            "KV_TABLE_KEY_ATTRIBUTES": serverless_kafka_consumer_config.get("function_kv_table_key_attributes"),
+            "KV_MAX_CONCURRENCY": serverless_kafka_consumer_config.get("function_kv_max_concurrency"),
+            "KV_DEADLINE_MARGIN_MS": serverless_kafka_consumer_config.get("function_kv_deadline_margin_ms"),
+            "RATE_LIMIT_PER_SECOND": serverless_kafka_consumer_config.get("function_rate_limit_per_second"),
+            "RATE_LIMIT_BURST": serverless_kafka_consumer_config.get("function_rate_limit_burst"),
+            "RATE_LIMIT_MODE": serverless_kafka_consumer_config.get("function_rate_limit_mode"),
+            "RATE_LIMIT_LEASE_SIZE": serverless_kafka_consumer_config.get("function_rate_limit_lease_size"),
+            "RATE_LIMIT_TABLE_NAME": rate_limit_table_name,
+            "VIEW_ENABLED": serverless_kafka_consumer_config.get("function_view_enabled"),
+            "VIEW_SNAPSHOT_INTERVAL_SECONDS": serverless_kafka_consumer_config.get("function_view_snapshot_interval_seconds"),
+            "TRACE_LINKING_ENABLED": serverless_kafka_consumer_config.get("function_trace_linking_enabled"),
+            "TRACE_LINKING_MAX_SEGMENTS": serverless_kafka_consumer_config.get("function_trace_linking_max_segments"),
+            "TELEMETRY_EXTENSION_ENABLED": serverless_kafka_consumer_config.get("function_telemetry_extension_enabled")
+        }
+        consumer_function_environment.update({key: str(value) for key, value in optional_environment.items() if value is not None})
+
+        # SnapStart is available for Python 3.12 and later and for up to 512 MB of ephemeral storage
+        snapstart_enabled = serverless_kafka_consumer_config.get("function_snapstart_enabled", "no") == "yes"
+        ephemeral_storage_size = serverless_kafka_consumer_config.get("function_ephemeral_storage_size", 512)
+        if snapstart_enabled and ephemeral_storage_size > 512:
+            raise ValueError("SnapStart supports at most 512 MB of ephemeral storage, reduce function_ephemeral_storage_size")
 
         # Create Lambda function and settings
         consumer_function = _lambda.Function(
             self,
             id=serverless_kafka_consumer_config.get("function_id", "ConsumerLambda"),
             function_name=serverless_kafka_consumer_config.get("function_name", "ServerlessKafkaConsumer"),
-            runtime=_lambda.Runtime.PYTHON_3_11,  # type: ignore
+            runtime=_lambda.Runtime.PYTHON_3_12 if snapstart_enabled else _lambda.Runtime.PYTHON_3_11,  # type: ignore
             handler="app.lambda_handler",
             timeout=Duration.seconds(serverless_kafka_consumer_config.get("function_timeout_seconds", 150)),
             log_retention=map_string_to_retention_days(serverless_kafka_consumer_config.get("function_log_retention_enum", "ONE_DAY")),
-            code=_lambda.Code.from_asset(path= '../serverless-kafka-iam-consumer'),
+            code=_lambda.Code.from_asset(path= '../serverless-kafka-iam-consumer', exclude=["tests", "benchmarks", "tools", "requirements-dev.txt"]),
             tracing=_lambda.Tracing.ACTIVE if serverless_kafka_consumer_config.get("function_tracing_enabled", "yes") else _lambda.Tracing.DISABLED,
             vpc=vpc,
-            layers=[consumer_function_lambda_Layer],
+            layers=consumer_function_layers,
             vpc_subnets=ec2.SubnetSelection(
                 subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
             ),
-            environment={
-                "TOPIC_NAME": topic_name,
-                "POWERTOOLS_SERVICE_NAME": serverless_kafka_consumer_config.get("function_name", "ServerlessKafkaConsumer"),
-                "POWERTOOLS_METRICS_NAMESPACE": app_config.get('application_tag', "ServerlessKafka"),
-                "LOG_LEVEL": "INFO"
-            },
+            environment=consumer_function_environment,
             role=kafka_consumer_role,
             log_retention_role=kafka_consumer_log_retention_role
             ,
             security_groups=[kafka_security_group],
             reserved_concurrent_executions=serverless_kafka_consumer_config.get("function_max_concurrency", 60),
-            memory_size=serverless_kafka_consumer_config.get("function_memory_size", 256)
+            memory_size=serverless_kafka_consumer_config.get("function_memory_size", 256),
+            ephemeral_storage_size=Size.mebibytes(ephemeral_storage_size)
         )
 
-        # Attach Kafka event source
-        consumer_function.add_event_source(
-            ManagedKafkaEventSource(
-                cluster_arn=msk_arn,
-                topic=topic_name,
+        # With SnapStart the event sources invoke an alias of the published version, the version is snapshotted when it is
+        # published and new execution environments are restored from the snapshot instead of running the init phase
+        event_source_target = consumer_function
+        if snapstart_enabled:
+            snap_start_property = _lambda.CfnFunction.SnapStartProperty(
+                apply_on="PublishedVersions"
+            )
+            l1_function:_lambda.CfnFunction = consumer_function.node.default_child
+            l1_function.snap_start = snap_start_property
+            event_source_target = _lambda.Alias(self,
+                                                serverless_kafka_consumer_config.get("function_id", "ConsumerLambda") + "Alias",
+                                                alias_name=serverless_kafka_consumer_config.get("function_alias_name", "live"),
+                                                version=consumer_function.current_version)
+
+        # Attach one Kafka event source per topic, all topics share the warm instances of the function
+        for topic in topics:
+            event_source_target.add_event_source(
+                ManagedKafkaEventSource(
+                    cluster_arn=msk_arn,
+                    topic=topic["topic_name"],
 
-                batch_size=serverless_kafka_consumer_config.get("function_event_source_batch_size", 100),
-                consumer_group_id=consumer_group_id,
-                starting_position=_lambda.StartingPosition.TRIM_HORIZON,
+                    batch_size=topic["batch_size"],
+                    consumer_group_id=topic["consumer_group_id"],
+                    starting_position=_lambda.StartingPosition.TRIM_HORIZON,
+                )
             )
-        )
 
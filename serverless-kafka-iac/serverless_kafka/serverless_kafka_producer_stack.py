@@ -1,15 +1,23 @@
 # Importing required libraries and modules
+import json
 import logging as log
 import os
 from pathlib import Path
 
 from aws_cdk import (BundlingOptions, BundlingOutput, DockerVolume, Duration,
-                     Stack, CfnOutput)
+                     RemovalPolicy, Stack, CfnOutput, TimeZone)
 from aws_cdk import aws_apigateway as apig
+from aws_cdk import aws_apigatewayv2 as apigv2
+from aws_cdk import aws_apigatewayv2_authorizers as apigv2_authorizers
+from aws_cdk import aws_apigatewayv2_integrations as apigv2_integrations
+from aws_cdk import aws_applicationautoscaling as appscaling
+from aws_cdk import aws_dynamodb as dynamodb
 from aws_cdk import aws_ec2 as ec2
 from aws_cdk import aws_iam as iam
 from aws_cdk import aws_logs as logs
 from aws_cdk import aws_lambda as _lambda
+from aws_cdk import aws_lambda_event_sources as lambda_event_sources
+from aws_cdk import aws_sqs as sqs
 from aws_cdk import aws_xray as xray
 from constructs import Construct
 
@@ -18,6 +26,12 @@ from .helpers import get_group_name, get_topic_name, add_permissions_to_role_pol
 # Setting the basic configuration for logging
 log.basicConfig(level=log.INFO)
 
+# Ingress types of the producer: API Gateway REST API, API Gateway HTTP API and Lambda function URL
+INGRESS_TYPES = ["rest", "http", "function_url"]
+
+# Ingest modes of the producer: the ingress invokes the function per request, or buffers the requests in a queue
+INGEST_MODES = ["direct", "queue"]
+
 
 class ServerlessKafkaProducerStack(Stack):
     def __init__(
@@ -48,6 +62,21 @@ class ServerlessKafkaProducerStack(Stack):
         # Get the topic name from the stack config
         topic_name = serverless_kafka_producer_config.get("topic_name", "ServerlessKafkaTopic")
 
+        # Get the ingress type from the stack config, all ingress types use IAM authorization
+        ingress_type = serverless_kafka_producer_config.get("apigateway_ingress_type", "rest")
+        if ingress_type not in INGRESS_TYPES:
+            raise ValueError(f"apigateway_ingress_type must be one of {INGRESS_TYPES}, but is '{ingress_type}'")
+
+        # Get the ingest mode from the stack config, the queue is written by a service integration of the REST API and
+        # the batch producer writes every batch it reads with a single flush
+        ingest_mode = serverless_kafka_producer_config.get("apigateway_ingest_mode", "direct")
+        if ingest_mode not in INGEST_MODES:
+            raise ValueError(f"apigateway_ingest_mode must be one of {INGEST_MODES}, but is '{ingest_mode}'")
+        if ingest_mode == "queue" and ingress_type != "rest":
+            raise ValueError("apigateway_ingest_mode queue requires apigateway_ingress_type rest")
+        if ingest_mode == "queue" and serverless_kafka_producer_config.get("function_ack_mode", "sync") != "sync":
+            raise ValueError("apigateway_ingest_mode queue requires function_ack_mode sync, the batch producer reports failed messages after the flush")
+
         # Initializing proxy lambda function
         function = self.init_proxy_lambda(
             vpc=kafka_vpc,
@@ -55,12 +84,25 @@ class ServerlessKafkaProducerStack(Stack):
             bootstrap_broker=kafka_bootstrap_server,
             msk_arn=msk_arn,
             topic_name=topic_name,
+            ingress_type=ingress_type,
+            ingest_mode=ingest_mode,
             app_config=app_config,
             serverless_kafka_producer_config=serverless_kafka_producer_config
         )
 
-        # Initializing the API Gateway
-        self.init_api_gateway(function, kafka_vpc, kafka_security_group, serverless_kafka_producer_config )  # type: ignore
+        # Publishing a version and creating the alias that the ingress invokes
+        function_alias = self.init_proxy_alias(function, serverless_kafka_producer_config)
+
+        # Initializing the ingress
+        if ingress_type == "http":
+            self.init_http_api(function_alias, serverless_kafka_producer_config)
+        elif ingress_type == "function_url":
+            self.init_function_url(function_alias, serverless_kafka_producer_config)
+        else:
+            queue = self.init_ingest_queue(function_alias, serverless_kafka_producer_config) if ingest_mode == "queue" else None
+            self.init_api_gateway(function_alias, kafka_vpc, kafka_security_group, serverless_kafka_producer_config, queue=queue)  # type: ignore
+        CfnOutput(scope=self, id="ProducerAPIOutputIngressType", value=ingress_type)
+        CfnOutput(scope=self, id="ProducerAPIOutputIngestMode", value=ingest_mode)
 
 
 
@@ -70,7 +112,8 @@ class ServerlessKafkaProducerStack(Stack):
         _function: _lambda.IFunction,
         vpc: ec2.IVpc,
         kafka_security_group: ec2.ISecurityGroup,
-        serverless_kafka_producer_config
+        serverless_kafka_producer_config,
+        queue: sqs.IQueue = None
     ):
 
         # Creating the REST API
@@ -79,6 +122,8 @@ class ServerlessKafkaProducerStack(Stack):
             serverless_kafka_producer_config.get("apigateway_api_id", "ProducerAPI"),
             rest_api_name=serverless_kafka_producer_config.get("apigateway_rest_api_name", "ServerlessKafkaProducerAPI"),
             cloud_watch_role=False,
+            # Bodies of the binary media types (gzip compressed requests) are passed base64 encoded to the function
+            binary_media_types=serverless_kafka_producer_config.get("apigateway_binary_media_types", ["application/gzip"]),
             deploy_options=apig.StageOptions(
                 logging_level=apig.MethodLoggingLevel.INFO if serverless_kafka_producer_config.get("apigateway_method_log_level", 'INFO') == "INFO" else apig.MethodLoggingLevel.ERROR if serverless_kafka_producer_config.get("apigateway_rest_api_name", 'INFO') == "ERROR" else apig.MethodLoggingLevel.OFF,
                 data_trace_enabled=True if serverless_kafka_producer_config.get("apigateway_data_trace_enabled", "yes") == "yes" else False,
@@ -95,6 +140,14 @@ class ServerlessKafkaProducerStack(Stack):
                 authorization_type=apig.AuthorizationType.IAM 
             ),
         )
+        # Define the integration of all methods: the function, or in the queue ingest mode the ingest queue
+        if queue is None:
+            integration = apig.LambdaIntegration(_function, request_templates={"application/json": '{"statusCode": 200}'})
+            method_responses = None
+        else:
+            integration = self.init_queue_integration(queue, serverless_kafka_producer_config)
+            method_responses = [apig.MethodResponse(status_code=status_code) for status_code in ["202", "400", "500"]]
+
         # Define a resource
         api_resource = rest_api.root.add_resource(serverless_kafka_producer_config.get("apigateway_api_id", "ProducerAPI") + "Resource")
 
@@ -122,14 +175,272 @@ class ServerlessKafkaProducerStack(Stack):
 
         # Define a method on the resource with request validation
         method = api_resource.add_method(serverless_kafka_producer_config.get("apigateway_api_method","POST"), 
-                            apig.LambdaIntegration(_function, request_templates={"application/json": '{"statusCode": 200}'}),
+                            integration,
+                            method_responses=method_responses,
                             request_validator=request_validator,
                             request_models={"application/json": request_model})
         
 
 
+        # Define the batch resource, it takes an array of messages that the function sends with a single flush
+        batch_resource = api_resource.add_resource("batch")
+
+        # Define request model for validation of batch requests, every message has the shape of a single request
+        batch_request_model = apig.Model(self, serverless_kafka_producer_config.get("apigateway_api_id", "ProducerAPI") + "BatchRequestModel",
+                                         rest_api=rest_api,
+                                         content_type="application/json",
+                                         schema=apig.JsonSchema(
+                                             type=apig.JsonSchemaType.OBJECT,
+                                             properties={
+                                                 "messages": apig.JsonSchema(
+                                                     type=apig.JsonSchemaType.ARRAY,
+                                                     min_items=1,
+                                                     max_items=serverless_kafka_producer_config.get("apigateway_batch_max_messages", 500),
+                                                     items=apig.JsonSchema(
+                                                         type=apig.JsonSchemaType.OBJECT,
+                                                         properties={
+                                                             "payload": apig.JsonSchema(
+                                                                 type=apig.JsonSchemaType.STRING
+                                                             )
+                                                         },
+                                                         required=["payload"]
+                                                     )
+                                                 )
+                                             },
+                                             required=["messages"]
+                                         ))
+
+        # Define a method on the batch resource with request validation
+        batch_resource.add_method(serverless_kafka_producer_config.get("apigateway_api_method","POST"),
+                            integration,
+                            method_responses=method_responses,
+                            request_validator=request_validator,
+                            request_models={"application/json": batch_request_model})
+
+        # With the path parameter key strategy the key is the last path segment, e.g. POST /ProducerAPIResource/customer-1
+        if serverless_kafka_producer_config.get("function_key_strategy", "request_id") == "path_parameter":
+            key_resource = api_resource.add_resource("{" + serverless_kafka_producer_config["function_key_source"] + "}")
+            key_resource.add_method(serverless_kafka_producer_config.get("apigateway_api_method","POST"),
+                            integration,
+                            method_responses=method_responses,
+                            request_validator=request_validator,
+                            request_models={"application/json": request_model})
+            CfnOutput(scope=self, id="ProducerAPIOutputKeyResourcePath", value=key_resource.path )
+
+        # Define the topic resources, they write to the topic of the path if it is one of the allowed topics,
+        # e.g. POST /orders and POST /orders/batch
+        if serverless_kafka_producer_config.get("allowed_topics"):
+            topic_resource = rest_api.root.add_resource("{topic}")
+            topic_resource.add_method(serverless_kafka_producer_config.get("apigateway_api_method","POST"),
+                            integration,
+                            method_responses=method_responses,
+                            request_validator=request_validator,
+                            request_models={"application/json": request_model})
+            topic_resource.add_resource("batch").add_method(serverless_kafka_producer_config.get("apigateway_api_method","POST"),
+                            integration,
+                            method_responses=method_responses,
+                            request_validator=request_validator,
+                            request_models={"application/json": batch_request_model})
+            CfnOutput(scope=self, id="ProducerAPIOutputTopicResourcePath", value=topic_resource.path )
+
         rest_full_path_output = CfnOutput(scope=self, id="ProducerAPIOutputResourcePath", value=api_resource.path )
         rest_method_output = CfnOutput(scope=self, id="ProducerAPIOutputAPIMethod", value=method.http_method )
+        rest_batch_path_output = CfnOutput(scope=self, id="ProducerAPIOutputBatchResourcePath", value=batch_resource.path )
+
+
+    # Function to create the queue of the queue ingest mode. The function reads it in large batches (up to
+    # queue_batch_size messages, collected for up to queue_max_batching_window_seconds), so many requests share a
+    # single flush, and reports the messages it could not write, which are delivered again and after
+    # queue_max_receive_count receives moved to the dead-letter queue.
+    def init_ingest_queue(
+        self,
+        _function: _lambda.IFunction,
+        serverless_kafka_producer_config
+    ) -> sqs.IQueue:
+
+        queue_id = serverless_kafka_producer_config.get("queue_id", "ProducerIngestQueue")
+        dead_letter_queue = sqs.Queue(self, queue_id + "DeadLetterQueue",
+                                      encryption=sqs.QueueEncryption.SQS_MANAGED,
+                                      enforce_ssl=True,
+                                      retention_period=Duration.days(14))
+
+        # The visibility timeout is six times the function timeout plus the batching window, the recommendation for
+        # event source mappings, so messages are not delivered again while a batch is still being written
+        batching_window_seconds = serverless_kafka_producer_config.get("queue_max_batching_window_seconds", 5)
+        queue = sqs.Queue(self, queue_id,
+                          encryption=sqs.QueueEncryption.SQS_MANAGED,
+                          enforce_ssl=True,
+                          visibility_timeout=Duration.seconds(6 * serverless_kafka_producer_config.get("function_timeout_seconds", 150) + batching_window_seconds),
+                          dead_letter_queue=sqs.DeadLetterQueue(
+                              queue=dead_letter_queue,
+                              max_receive_count=serverless_kafka_producer_config.get("queue_max_receive_count", 5)
+                          ))
+
+        # The function reports the failed messages of a batch, the others are deleted
+        _function.add_event_source(lambda_event_sources.SqsEventSource(queue,
+            batch_size=serverless_kafka_producer_config.get("queue_batch_size", 1000),
+            max_batching_window=Duration.seconds(batching_window_seconds),
+            max_concurrency=serverless_kafka_producer_config.get("queue_max_concurrency"),
+            report_batch_item_failures=True
+        ))
+
+        CfnOutput(scope=self, id="ProducerIngestQueueURL", value=queue.queue_url)
+        CfnOutput(scope=self, id="ProducerIngestDeadLetterQueueURL", value=dead_letter_queue.queue_url)
+        return queue
+
+
+    # Function to create the integration that sends requests to the ingest queue instead of invoking the function.
+    # The message body is the request body, the message attributes are the parts of the request the batch producer
+    # needs to handle it like the function handles a request: the resource, the request ID (the key of the request ID
+    # key strategy), the topic path parameter and the key of the header and path parameter key strategies.
+    # API Gateway responds with 202 and the message ID once the message is queued.
+    def init_queue_integration(
+        self,
+        queue: sqs.IQueue,
+        serverless_kafka_producer_config
+    ) -> apig.Integration:
+
+        # Role API Gateway sends the messages with
+        integration_role = iam.Role(self, serverless_kafka_producer_config.get("queue_id", "ProducerIngestQueue") + "IntegrationRole",
+                                    assumed_by=iam.ServicePrincipal("apigateway.amazonaws.com"))
+        queue.grant_send_messages(integration_role)
+
+        # Mapping template of the SendMessage request, on a single line because the form body must not contain line
+        # breaks. Attributes without value are omitted, SQS rejects empty attribute values.
+        attributes = [("resource", "$context.resourcePath"), ("requestId", "$context.requestId"), ("topic", "$input.params('topic')"),
+                      ("idempotencyKey", "$input.params('Idempotency-Key')")]
+        if serverless_kafka_producer_config.get("function_key_strategy", "request_id") in ["header", "path_parameter"]:
+            attributes.append(("key", "$input.params('" + serverless_kafka_producer_config["function_key_source"] + "')"))
+        request_template = "#set($n = 1)Action=SendMessage&MessageBody=$util.urlEncode($input.body)"
+        for name, value in attributes:
+            request_template += (f"#set($value = {value})#if($value != \"\")"
+                                 f"&MessageAttribute.${{n}}.Name={name}"
+                                 f"&MessageAttribute.${{n}}.Value.DataType=String"
+                                 f"&MessageAttribute.${{n}}.Value.StringValue=$util.urlEncode($value)"
+                                 f"#set($n = $n + 1)#end")
+
+        return apig.AwsIntegration(
+            service="sqs",
+            path=f"{self.account}/{queue.queue_name}",
+            integration_http_method="POST",
+            options=apig.IntegrationOptions(
+                credentials_role=integration_role,
+                # Requests of other content types than the ones of the request models are rejected with 415
+                passthrough_behavior=apig.PassthroughBehavior.NEVER,
+                request_parameters={
+                    "integration.request.header.Content-Type": "'application/x-www-form-urlencoded'",
+                    "integration.request.header.Accept": "'application/json'"
+                },
+                request_templates={"application/json": request_template},
+                integration_responses=[
+                    apig.IntegrationResponse(
+                        status_code="202",
+                        response_templates={"application/json": '{"messageId": "$input.path(\'$.SendMessageResponse.SendMessageResult.MessageId\')"}'}
+                    ),
+                    # SQS rejects messages larger than 256 KiB
+                    apig.IntegrationResponse(
+                        status_code="400",
+                        selection_pattern="4\\d{2}",
+                        response_templates={"application/json": '{"message": "The request was rejected by the queue"}'}
+                    ),
+                    apig.IntegrationResponse(
+                        status_code="500",
+                        selection_pattern="5\\d{2}",
+                        response_templates={"application/json": '{"message": "The request could not be queued"}'}
+                    )
+                ]
+            )
+        )
+
+
+    # Function to create the HTTP API endpoint. HTTP APIs have lower latency and cost than REST APIs, but no request
+    # models, the function validates the requests instead (VALIDATE_REQUESTS). The routes are the resources of the
+    # REST API, and the payload format 1.0 is the event of the REST API, so the handler is the same.
+    def init_http_api(
+        self,
+        _function: _lambda.IFunction,
+        serverless_kafka_producer_config
+    ):
+        api_id = serverless_kafka_producer_config.get("apigateway_api_id", "ProducerAPI")
+        api_method = apigv2.HttpMethod(serverless_kafka_producer_config.get("apigateway_api_method", "POST"))
+
+        # Creating the HTTP API, every route requires IAM authorization
+        http_api = apigv2.HttpApi(
+            self,
+            api_id,
+            api_name=serverless_kafka_producer_config.get("apigateway_rest_api_name", "ServerlessKafkaProducerAPI"),
+            create_default_stage=False,
+            default_authorizer=apigv2_authorizers.HttpIamAuthorizer(),
+        )
+        stage = http_api.add_stage(
+            api_id + "DefaultStage",
+            stage_name="$default",
+            auto_deploy=True,
+            detailed_metrics_enabled=True if serverless_kafka_producer_config.get("apigateway_metrics_enabled", "yes") == "yes" else False,
+        )
+        # Access logs with the latencies, to compare them with the other ingress types
+        access_logs = logs.LogGroup(self, "AccessLogs", retention=logs.RetentionDays.ONE_WEEK)
+        l1_stage: apigv2.CfnStage = stage.node.default_child
+        l1_stage.access_log_settings = apigv2.CfnStage.AccessLogSettingsProperty(
+            destination_arn=access_logs.log_group_arn,
+            format=json.dumps({
+                "requestId": "$context.requestId",
+                "ip": "$context.identity.sourceIp",
+                "caller": "$context.identity.caller",
+                "requestTime": "$context.requestTime",
+                "routeKey": "$context.routeKey",
+                "status": "$context.status",
+                "responseLength": "$context.responseLength",
+                "integrationLatency": "$context.integrationLatency",
+                "responseLatency": "$context.responseLatency"
+            })
+        )
+
+        integration = apigv2_integrations.HttpLambdaIntegration(
+            api_id + "Integration",
+            _function,
+            payload_format_version=apigv2.PayloadFormatVersion.VERSION_1_0,
+        )
+
+        # Define the routes of the resources of the REST API
+        resource_path = "/" + api_id + "Resource"
+        paths = [resource_path, resource_path + "/batch"]
+        if serverless_kafka_producer_config.get("function_key_strategy", "request_id") == "path_parameter":
+            paths.append(resource_path + "/{" + serverless_kafka_producer_config["function_key_source"] + "}")
+            CfnOutput(scope=self, id="ProducerAPIOutputKeyResourcePath", value=paths[-1] )
+        if serverless_kafka_producer_config.get("allowed_topics"):
+            paths.extend(["/{topic}", "/{topic}/batch"])
+            CfnOutput(scope=self, id="ProducerAPIOutputTopicResourcePath", value="/{topic}" )
+        for path in paths:
+            http_api.add_routes(path=path, methods=[api_method], integration=integration)
+
+        CfnOutput(scope=self, id="ProducerAPIEndpoint", value=stage.url )
+        CfnOutput(scope=self, id="ProducerAPIOutputResourcePath", value=resource_path )
+        CfnOutput(scope=self, id="ProducerAPIOutputAPIMethod", value=api_method.value )
+        CfnOutput(scope=self, id="ProducerAPIOutputBatchResourcePath", value=resource_path + "/batch" )
+
+
+    # Function to create the function URL endpoint. Requests go to the function without API Gateway in between, the
+    # function routes (FunctionUrlKafkaProxy) and validates (VALIDATE_REQUESTS) them. The URL requires IAM authorization,
+    # requests are signed for the service lambda.
+    def init_function_url(
+        self,
+        _function: _lambda.Alias,
+        serverless_kafka_producer_config
+    ):
+        resource_path = "/" + serverless_kafka_producer_config.get("apigateway_api_id", "ProducerAPI") + "Resource"
+
+        function_url = _function.add_function_url(auth_type=_lambda.FunctionUrlAuthType.AWS_IAM)
+
+        if serverless_kafka_producer_config.get("function_key_strategy", "request_id") == "path_parameter":
+            CfnOutput(scope=self, id="ProducerAPIOutputKeyResourcePath", value=resource_path + "/{" + serverless_kafka_producer_config["function_key_source"] + "}" )
+        if serverless_kafka_producer_config.get("allowed_topics"):
+            CfnOutput(scope=self, id="ProducerAPIOutputTopicResourcePath", value="/{topic}" )
+
+        CfnOutput(scope=self, id="ProducerAPIEndpoint", value=function_url.url )
+        CfnOutput(scope=self, id="ProducerAPIOutputResourcePath", value=resource_path )
+        CfnOutput(scope=self, id="ProducerAPIOutputAPIMethod", value=serverless_kafka_producer_config.get("apigateway_api_method", "POST") )
+        CfnOutput(scope=self, id="ProducerAPIOutputBatchResourcePath", value=resource_path + "/batch" )
 
 
     # Function to create the producer lambda and all necessary settings and authentications
@@ -140,6 +451,8 @@ class ServerlessKafkaProducerStack(Stack):
         bootstrap_broker: str,
         msk_arn: str,
         topic_name: str,
+        ingress_type: str,
+        ingest_mode: str,
         app_config,
         serverless_kafka_producer_config
     ):
@@ -190,13 +503,101 @@ class ServerlessKafkaProducerStack(Stack):
                 "logs:DeleteRetentionPolicy": ["arn:aws:logs:*:*:*"]
         })
 
+        # Topics requests can write to through the topic resources, in addition to the topic of the stack
+        allowed_topics = serverless_kafka_producer_config.get("allowed_topics", [])
+
+        # Create the table shared by all execution environments that stores the responses of requests with an
+        # Idempotency-Key, without it every execution environment only knows the responses in its own cache
+        idempotency_table_name = None
+        idempotency_store = serverless_kafka_producer_config.get("function_idempotency_store", "memory")
+        if idempotency_store not in ["memory", "dynamodb"]:
+            raise ValueError(f"function_idempotency_store must be memory or dynamodb, but is '{idempotency_store}'")
+        if idempotency_store == "dynamodb":
+            if serverless_kafka_producer_config.get("function_ack_mode", "sync") != "sync":
+                raise ValueError("function_idempotency_store dynamodb requires function_ack_mode sync, async responses are not replayed")
+            idempotency_table = dynamodb.Table(self,
+                                               serverless_kafka_producer_config.get("function_id", "ProducerLambda") + "IdempotencyTable",
+                                               partition_key=dynamodb.Attribute(name="id", type=dynamodb.AttributeType.STRING),
+                                               billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+                                               time_to_live_attribute="expiration",
+                                               point_in_time_recovery=True,
+                                               removal_policy=RemovalPolicy.DESTROY)
+            idempotency_table_name = idempotency_table.table_name
+            add_permissions_to_policy(role=kafka_producer_role, permissions= {
+                "dynamodb:GetItem": [idempotency_table.table_arn],
+                "dynamodb:PutItem": [idempotency_table.table_arn],
+                "dynamodb:DeleteItem": [idempotency_table.table_arn]
+            })
+            CfnOutput(scope=self, id="ProducerIdempotencyTable", value=idempotency_table.table_name)
+
+        # Hot keys are salted only if the keys are meaningful, request IDs are unique and never hot
+        if serverless_kafka_producer_config.get("function_hot_key_salts", 0) > 1 and serverless_kafka_producer_config.get("function_key_strategy", "request_id") == "request_id":
+            raise ValueError("function_hot_key_salts requires a function_key_strategy other than request_id")
+
+        # Environment of the function, the producer tuning settings are validated by the function during init
+        producer_function_environment = {
+            "BOOTSTRAP_SERVER": str(bootstrap_broker),
+            "TOPIC_NAME": topic_name,
+            "ACK_MODE": serverless_kafka_producer_config.get("function_ack_mode", "sync"),
+            "KEY_STRATEGY": serverless_kafka_producer_config.get("function_key_strategy", "request_id"),
+            "JAVA_TOOL_OPTIONS": serverless_kafka_producer_config.get("function_java_tool_options", "-XX:+TieredCompilation -XX:TieredStopAtLevel=1 -DLOG_LEVEL=INFO"),
+            "POWERTOOLS_LOG_LEVEL": serverless_kafka_producer_config.get("function_powertools_log_level", "INFO"),
+            "POWERTOOLS_METRICS_NAMESPACE": app_config.get('application_tag', "ServerlessKafka"),
+            "POWERTOOLS_SERVICE_NAME": serverless_kafka_producer_config.get("function_powertools_service_name", "ServerlessKafkaProducer")
+        }
+        optional_environment = {
+            "KEY_SOURCE": serverless_kafka_producer_config.get("function_key_source"),
+            "PARTITION_METRICS_WINDOW_SECONDS": serverless_kafka_producer_config.get("function_partition_metrics_window_seconds"),
+            "PRODUCER_ACKS": serverless_kafka_producer_config.get("function_producer_acks"),
+            "PRODUCER_ENABLE_IDEMPOTENCE": serverless_kafka_producer_config.get("function_producer_enable_idempotence"),
+            "PRODUCER_COMPRESSION_TYPE": serverless_kafka_producer_config.get("function_producer_compression_type"),
+            "PRODUCER_LINGER_MS": serverless_kafka_producer_config.get("function_producer_linger_ms"),
+            "PRODUCER_BATCH_SIZE": serverless_kafka_producer_config.get("function_producer_batch_size"),
+            "PRODUCER_MAX_IN_FLIGHT_REQUESTS": serverless_kafka_producer_config.get("function_producer_max_in_flight_requests"),
+            "PRODUCER_REQUEST_TIMEOUT_MS": serverless_kafka_producer_config.get("function_producer_request_timeout_ms"),
+            "PRODUCER_DELIVERY_TIMEOUT_MS": serverless_kafka_producer_config.get("function_producer_delivery_timeout_ms"),
+            "PRODUCER_MAX_BLOCK_MS": serverless_kafka_producer_config.get("function_producer_max_block_ms"),
+            "PRODUCER_CONNECTIONS_MAX_IDLE_MS": serverless_kafka_producer_config.get("function_producer_connections_max_idle_ms"),
+            "PRODUCER_RECONNECT_BACKOFF_MS": serverless_kafka_producer_config.get("function_producer_reconnect_backoff_ms"),
+            "PRODUCER_RECONNECT_BACKOFF_MAX_MS": serverless_kafka_producer_config.get("function_producer_reconnect_backoff_max_ms"),
+            "PRODUCER_METADATA_MAX_AGE_MS": serverless_kafka_producer_config.get("function_producer_metadata_max_age_ms"),
+            "PRODUCER_METADATA_MAX_IDLE_MS": serverless_kafka_producer_config.get("function_producer_metadata_max_idle_ms"),
+            "ALLOWED_TOPICS": ",".join(allowed_topics),
+            "MAX_DECOMPRESSED_BODY_BYTES": serverless_kafka_producer_config.get("function_max_decompressed_body_bytes"),
+            # The HTTP API and the function URL have no request models, the function validates the requests
+            "VALIDATE_REQUESTS": ingress_type != "rest",
+            "BATCH_MAX_MESSAGES": serverless_kafka_producer_config.get("apigateway_batch_max_messages"),
+            # The function URL has no resources, the function maps the path to them
+            "API_RESOURCE": serverless_kafka_producer_config.get("apigateway_api_id", "ProducerAPI") + "Resource" if ingress_type == "function_url" else None,
+            "API_METHOD": serverless_kafka_producer_config.get("apigateway_api_method", "POST") if ingress_type == "function_url" else None,
+            "IDEMPOTENCY_TABLE": idempotency_table_name,
+            "IDEMPOTENCY_CACHE_SIZE": serverless_kafka_producer_config.get("function_idempotency_cache_size"),
+            "IDEMPOTENCY_TTL_SECONDS": serverless_kafka_producer_config.get("function_idempotency_ttl_seconds"),
+            "HOT_KEY_SALTS": serverless_kafka_producer_config.get("function_hot_key_salts"),
+            "HOT_KEY_THRESHOLD": serverless_kafka_producer_config.get("function_hot_key_threshold"),
+            "HOT_KEY_WINDOW_SECONDS": serverless_kafka_producer_config.get("function_hot_key_window_seconds"),
+            "HOT_KEY_CAPACITY": serverless_kafka_producer_config.get("function_hot_key_capacity")
+        }
+        # Booleans of the context are passed in the lower case form the producer expects
+        producer_function_environment.update({key: str(value).lower() if isinstance(value, bool) else str(value)
+                                              for key, value in optional_environment.items() if value is not None and value != ""})
+
+        # Handler of the function: the function URL has its own event, in the queue ingest mode the function receives
+        # batches of queued requests
+        if ingest_mode == "queue":
+            handler = "software.amazon.samples.kafka.lambda.SqsBatchKafkaProducer::handleRequest"
+        elif ingress_type == "function_url":
+            handler = "software.amazon.samples.kafka.lambda.FunctionUrlKafkaProxy::handleRequest"
+        else:
+            handler = "software.amazon.samples.kafka.lambda.SimpleApiGatewayKafkaProxy::handleRequest"
+
         # Define the AWS Lambda function
         kafka_producer_lambda = _lambda.Function(
             self,
             serverless_kafka_producer_config.get("function_id", "ProducerLambda"),
             function_name=serverless_kafka_producer_config.get("function_name", "ServerlessKafkaProducer"),
             runtime=_lambda.Runtime.JAVA_17,
-            handler="software.amazon.samples.kafka.lambda.SimpleApiGatewayKafkaProxy::handleRequest",
+            handler=handler,
             timeout=Duration.seconds(serverless_kafka_producer_config.get("function_timeout_seconds", 150)),
             log_retention=map_string_to_retention_days(serverless_kafka_producer_config.get("function_log_retention_enum", "ONE_DAY")),
             code=self.build_mvn_package(),
@@ -210,22 +611,16 @@ class ServerlessKafkaProducerStack(Stack):
             ),
             security_groups=[kafka_security_group],
             reserved_concurrent_executions=serverless_kafka_producer_config.get("function_max_concurrency", 60),
-            environment={
-                "BOOTSTRAP_SERVER": str(bootstrap_broker),
-                "TOPIC_NAME": topic_name,
-                "JAVA_TOOL_OPTIONS": serverless_kafka_producer_config.get("function_java_tool_options", "-XX:+TieredCompilation -XX:TieredStopAtLevel=1 -DLOG_LEVEL=INFO"),
-                "POWERTOOLS_LOG_LEVEL": serverless_kafka_producer_config.get("function_powertools_log_level", "INFO"),
-                "POWERTOOLS_METRICS_NAMESPACE": app_config.get('application_tag', "ServerlessKafka"),                
-                "POWERTOOLS_SERVICE_NAME": serverless_kafka_producer_config.get("function_powertools_service_name", "ServerlessKafkaProducer")
-            },
+            environment=producer_function_environment,
             memory_size=serverless_kafka_producer_config.get("function_memory_size", 256)
         )
-        # Configuring SnapStart properties
-        snap_start_property = _lambda.CfnFunction.SnapStartProperty(
-            apply_on="PublishedVersions"
-        )
-        l1_function:_lambda.CfnFunction = kafka_producer_lambda.node.default_child
-        l1_function.snap_start = snap_start_property
+        # Configuring SnapStart properties, SnapStart applies to the published version the alias points to
+        if serverless_kafka_producer_config.get("function_snapstart_enabled", "yes") == "yes":
+            snap_start_property = _lambda.CfnFunction.SnapStartProperty(
+                apply_on="PublishedVersions"
+            )
+            l1_function:_lambda.CfnFunction = kafka_producer_lambda.node.default_child
+            l1_function.snap_start = snap_start_property
 
 
 
@@ -247,16 +642,17 @@ class ServerlessKafkaProducerStack(Stack):
         # )
 
 
-        # Defining the permissions for the Lambda function
+        # Defining the permissions for the Lambda function, it writes to the topic of the stack and the allowed topics
+        topics = [topic_name] + [topic for topic in allowed_topics if topic != topic_name]
         permissions = {
             "kafka-cluster:Connect": [msk_arn],
             "kafka-cluster:DescribeCluster": [msk_arn],
             "kafka-cluster:DescribeClusterDynamicConfiguration": [msk_arn],
             "kafka-cluster:DescribeGroup": [get_group_name(msk_arn, '*')],
-            "kafka-cluster:DescribeTopic": [get_topic_name(msk_arn, topic_name)],
+            "kafka-cluster:DescribeTopic": [get_topic_name(msk_arn, topic) for topic in topics],
             "kafka-cluster:DescribeTopicDynamicConfiguration": [get_topic_name(msk_arn, topic_name)],
             "kafka-cluster:ReadData": [get_topic_name(msk_arn, topic_name)],
-            "kafka-cluster:WriteData": [get_topic_name(msk_arn, topic_name)],
+            "kafka-cluster:WriteData": [get_topic_name(msk_arn, topic) for topic in topics],
             "kafka-cluster:WriteDataIdempotently": [msk_arn]
         }
 
@@ -265,6 +661,58 @@ class ServerlessKafkaProducerStack(Stack):
 
         return kafka_producer_lambda
 
+    # Function to publish a version of the producer lambda and create the alias API Gateway invokes. A new version is
+    # published on every deploy that changes the function. Optionally the alias gets provisioned concurrency, which is
+    # scaled on schedules and on its utilization.
+    def init_proxy_alias(
+        self,
+        function: _lambda.Function,
+        serverless_kafka_producer_config
+    ) -> _lambda.Alias:
+
+        snapstart_enabled = serverless_kafka_producer_config.get("function_snapstart_enabled", "yes") == "yes"
+        reserved_concurrency = serverless_kafka_producer_config.get("function_max_concurrency", 60)
+        provisioned_concurrency = serverless_kafka_producer_config.get("function_provisioned_concurrency", 0)
+        provisioned_concurrency_max = serverless_kafka_producer_config.get("function_provisioned_concurrency_max", provisioned_concurrency)
+        provisioned_concurrency_schedules = serverless_kafka_producer_config.get("function_provisioned_concurrency_schedules", [])
+
+        # Lambda rejects these combinations only during the deployment
+        if provisioned_concurrency and snapstart_enabled:
+            raise ValueError("SnapStart does not support provisioned concurrency, set function_snapstart_enabled to no")
+        if provisioned_concurrency_max < provisioned_concurrency:
+            raise ValueError("function_provisioned_concurrency_max must be at least function_provisioned_concurrency")
+        if provisioned_concurrency_max > reserved_concurrency:
+            raise ValueError("function_provisioned_concurrency_max must be at most function_max_concurrency")
+        if provisioned_concurrency_schedules and not provisioned_concurrency:
+            raise ValueError("function_provisioned_concurrency_schedules requires function_provisioned_concurrency")
+
+        function_alias = _lambda.Alias(self,
+                                       serverless_kafka_producer_config.get("function_id", "ProducerLambda") + "Alias",
+                                       alias_name=serverless_kafka_producer_config.get("function_alias_name", "live"),
+                                       version=function.current_version,
+                                       provisioned_concurrent_executions=provisioned_concurrency or None)
+
+        # Scale the provisioned concurrency between its minimum and maximum on its utilization, and on schedules
+        # that change the minimum and maximum, e.g. for business hours
+        if provisioned_concurrency and (provisioned_concurrency_max > provisioned_concurrency or provisioned_concurrency_schedules):
+            scaling = function_alias.add_auto_scaling(min_capacity=provisioned_concurrency, max_capacity=provisioned_concurrency_max)
+            if provisioned_concurrency_max > provisioned_concurrency:
+                scaling.scale_on_utilization(
+                    utilization_target=serverless_kafka_producer_config.get("function_provisioned_concurrency_utilization_target", 0.7)
+                )
+            for schedule in provisioned_concurrency_schedules:
+                if schedule.get("max_capacity", provisioned_concurrency_max) > reserved_concurrency:
+                    raise ValueError(f"The max_capacity of the schedule {schedule['name']} must be at most function_max_concurrency")
+                scaling.scale_on_schedule(schedule["name"],
+                                          schedule=appscaling.Schedule.expression(schedule["expression"]),
+                                          min_capacity=schedule.get("min_capacity"),
+                                          max_capacity=schedule.get("max_capacity"),
+                                          time_zone=TimeZone.of(schedule["time_zone"]) if schedule.get("time_zone") else None)
+
+        CfnOutput(scope=self, id="ProducerFunctionAlias", value=function_alias.function_arn)
+
+        return function_alias
+
     # Function to build the Maven package
     def build_mvn_package(self):
         
@@ -28,6 +28,7 @@ outputs = response['Stacks'][0]['Outputs']
 ENDPOINT_URL = None
 RESOURCE_PATH = None
 HTTP_METHOD = None
+INGRESS_TYPE = "rest"
 
 for output in outputs:
     if "ProducerAPIEndpoint" in output['OutputKey']:
@@ -36,6 +37,8 @@ for output in outputs:
         RESOURCE_PATH = output['OutputValue'].replace("/","")
     elif output['OutputKey'] == 'ProducerAPIOutputAPIMethod':
         HTTP_METHOD = output['OutputValue']
+    elif output['OutputKey'] == 'ProducerAPIOutputIngressType':
+        INGRESS_TYPE = output['OutputValue']
 
 
 if not RESOURCE_PATH:
@@ -65,9 +68,9 @@ payload = json.dumps({"payload": "Hello World"})
 session = botocore.session.get_session()
 credentials = session.get_credentials().get_frozen_credentials()
 
-# Sign the request using Signature Version 4
+# Sign the request using Signature Version 4, function URLs are signed for Lambda
 awsauth = botocore.auth.SigV4Auth(
-    credentials, 'execute-api', REGION
+    credentials, 'lambda' if INGRESS_TYPE == "function_url" else 'execute-api', REGION
 )
 
 # Sign the request
@@ -120,3 +120,165 @@ def test_serverless_consumer_stack_errors(demo_stack):
 
     # Assert that there is no error
     assert not error
+
+
+# Creates a consumer stack from the given stack context and returns its synthesized template
+def create_consumer_template(serverless_kafka_consumer_config: dict, kafka_bootstrap_server: str = None) -> assertions.Template:
+    app = core.App(context={"serverless_kafka_consumer_config": serverless_kafka_consumer_config})
+    vpc_stack = ServerlessKafkaVPCStack(app, construct_id="ServerlessKafkaVPCStack", app_config_id="app_config", stack_config_id="vpc_config")
+    serverless_kafka_msk_stack = ServerlessKafkaMSKStack(app, construct_id="ServerlessKafkaMSKStack", app_config_id="app_config",
+                                                         stack_config_id="msk_serverless_config", vpcStack=vpc_stack)
+    kafka_consumer = ServerlessKafkaConsumerStack(app, construct_id="ServerlessKafkaConsumerStack", app_config_id="app_config",
+                                                  stack_config_id="serverless_kafka_consumer_config",
+                                                  kafka_vpc=serverless_kafka_msk_stack.kafka_vpc,
+                                                  kafka_security_group=serverless_kafka_msk_stack.kafka_security_group,
+                                                  msk_arn=serverless_kafka_msk_stack.msk_arn,
+                                                  kafka_bootstrap_server=kafka_bootstrap_server)
+    return assertions.Template.from_stack(kafka_consumer)
+
+
+# Test that the columnar settings are passed to the consumer function together with the additional layer
+def test_serverless_consumer_columnar_settings():
+    template = create_consumer_template({
+        "function_columnar_fields": "amount,quantity",
+        "function_columnar_aggregations": "amount:sum",
+        "function_columnar_layer_arn": "arn:aws:lambda:eu-central-1:336392948345:layer:AWSSDKPandas-Python311:4"
+    })
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({
+            "COLUMNAR_FIELDS": "amount,quantity",
+            "COLUMNAR_AGGREGATIONS": "amount:sum"
+        })},
+        "Layers": assertions.Match.array_with(["arn:aws:lambda:eu-central-1:336392948345:layer:AWSSDKPandas-Python311:4"])
+    })
+
+
+# Test that the enrichment stage gets its settings and read access to the snapshot and the lookup table
+def test_serverless_consumer_enrichment_settings():
+    template = create_consumer_template({
+        "function_enrichment_key_field": "customer",
+        "function_enrichment_snapshot_uri": "s3://reference-bucket/customers.ndjson",
+        "function_enrichment_table_name": "Customers"
+    })
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({
+            "ENRICHMENT_KEY_FIELD": "customer",
+            "ENRICHMENT_SNAPSHOT_URI": "s3://reference-bucket/customers.ndjson",
+            "ENRICHMENT_TABLE_NAME": "Customers"
+        })}
+    })
+    template.has_resource_properties("AWS::IAM::Policy", {
+        "PolicyDocument": {"Statement": assertions.Match.array_with([assertions.Match.object_like({
+            "Action": "s3:GetObject",
+            "Resource": "arn:aws:s3:::reference-bucket/customers.ndjson"
+        })])}
+    })
+
+
+# Test that the consume-transform-produce mode gets the output topic settings and WriteData permissions on the output topic
+def test_serverless_consumer_output_topic_settings():
+    template = create_consumer_template({"function_output_topic_name": "ServerlessKafkaOutputTopic"}, kafka_bootstrap_server="broker:9098")
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({"OUTPUT_TOPIC_NAME": "ServerlessKafkaOutputTopic", "BOOTSTRAP_SERVER": "broker:9098"})}
+    })
+    template.has_resource_properties("AWS::IAM::Policy", {
+        "PolicyDocument": {"Statement": assertions.Match.array_with([assertions.Match.object_like({
+            "Action": "kafka-cluster:WriteData",
+            "Resource": {"Fn::Join": ["", assertions.Match.array_with(["/ServerlessKafkaOutputTopic"])]}
+        })])}
+    })
+
+    # Without the bootstrap server the function could not connect to the output topic
+    with pytest.raises(ValueError):
+        create_consumer_template({"function_output_topic_name": "ServerlessKafkaOutputTopic"})
+
+
+# Test that the key-value sink gets its table settings and BatchWriteItem permissions
+def test_serverless_consumer_key_value_settings():
+    template = create_consumer_template({"function_kv_table_name": "Orders", "function_kv_table_key_attributes": "pk,sk"})
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({"KV_TABLE_NAME": "Orders", "KV_TABLE_KEY_ATTRIBUTES": "pk,sk"})}
+    })
+    template.has_resource_properties("AWS::IAM::Policy", {
+        "PolicyDocument": {"Statement": assertions.Match.array_with([assertions.Match.object_like({"Action": "dynamodb:BatchWriteItem"})])}
+    })
+
+
+# Test that the rate limiter gets a table for the shared token bucket
+def test_serverless_consumer_rate_limit_settings():
+    template = create_consumer_template({"function_rate_limit_per_second": 100, "function_rate_limit_mode": "shrink"})
+
+    template.resource_count_is("AWS::DynamoDB::Table", 1)
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({
+            "RATE_LIMIT_PER_SECOND": "100",
+            "RATE_LIMIT_MODE": "shrink",
+            "RATE_LIMIT_TABLE_NAME": {"Ref": assertions.Match.any_value()}
+        })}
+    })
+
+
+# Test that falsy settings like 0 are passed to the function instead of being dropped
+def test_serverless_consumer_falsy_settings():
+    template = create_consumer_template({"function_enrichment_key_field": "customer", "function_enrichment_cache_size": 0})
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({"ENRICHMENT_CACHE_SIZE": "0"})}
+    })
+
+
+# Test that the latest value view gets its settings
+def test_serverless_consumer_latest_value_view_settings():
+    template = create_consumer_template({"function_view_enabled": "yes", "function_view_snapshot_interval_seconds": 30})
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({"VIEW_ENABLED": "yes", "VIEW_SNAPSHOT_INTERVAL_SECONDS": "30"})}
+    })
+
+
+# Test that every topic gets its own event source with its batch size and consumer group and is mapped to its processor
+def test_serverless_consumer_multiple_topics():
+    template = create_consumer_template({"topics": [
+        {"topic_name": "Orders", "batch_size": 500},
+        {"topic_name": "Audit", "batch_size": 10, "processor": "records"}
+    ]})
+
+    template.resource_count_is("AWS::Lambda::EventSourceMapping", 2)
+    template.has_resource_properties("AWS::Lambda::EventSourceMapping", {
+        "Topics": ["Orders"], "BatchSize": 500,
+        "AmazonManagedKafkaEventSourceConfig": {"ConsumerGroupId": "ServerlessKafkaConsumerGroup"}
+    })
+    template.has_resource_properties("AWS::Lambda::EventSourceMapping", {
+        "Topics": ["Audit"], "BatchSize": 10,
+        "AmazonManagedKafkaEventSourceConfig": {"ConsumerGroupId": "ServerlessKafkaConsumerGroup-Audit"}
+    })
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({"TOPIC_NAME": "Orders", "TOPIC_PROCESSORS": "Orders=default,Audit=records"})}
+    })
+    template.has_resource_properties("AWS::IAM::Policy", {
+        "PolicyDocument": {"Statement": assertions.Match.array_with([assertions.Match.object_like({
+            "Action": "kafka-cluster:ReadData",
+            "Resource": {"Fn::Join": ["", assertions.Match.array_with(["/Audit"])]}
+        })])}
+    })
+
+
+# Test that SnapStart is enabled on the published versions and the event source invokes the alias of the version
+def test_serverless_consumer_snapstart_settings():
+    template = create_consumer_template({"function_snapstart_enabled": "yes"})
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Runtime": "python3.12",
+        "SnapStart": {"ApplyOn": "PublishedVersions"}
+    })
+    template.resource_count_is("AWS::Lambda::Version", 1)
+    template.has_resource_properties("AWS::Lambda::EventSourceMapping", {
+        "FunctionName": {"Fn::Join": ["", assertions.Match.array_with([":live"])]}
+    })
+
+    with pytest.raises(ValueError):
+        create_consumer_template({"function_snapstart_enabled": "yes", "function_ephemeral_storage_size": 1024})
@@ -127,3 +127,231 @@ def test_serverless_producer_stack_errors(demo_stack):
 
     # Assert that there is no error
     assert not error
+
+
+# Creates a producer stack from the given stack context and returns its synthesized template
+def create_producer_template(serverless_kafka_producer_config: dict) -> assertions.Template:
+    app = core.App(context={"serverless_kafka_producer_config": serverless_kafka_producer_config})
+    vpc_stack = ServerlessKafkaVPCStack(app, construct_id="ServerlessKafkaVPCStack", app_config_id="app_config", stack_config_id="vpc_config")
+    serverless_kafka_msk_stack = ServerlessKafkaMSKStack(app, construct_id="ServerlessKafkaMSKStack", app_config_id="app_config",
+                                                         stack_config_id="msk_serverless_config", vpcStack=vpc_stack)
+    kafka_handler = ServerlessKafkaHandlerStack(app, construct_id="ServerlessKafkaHandlerStack", app_config_id="app_config",
+                                                stack_config_id="serverless_kafka_handler_config",
+                                                kafka_vpc=serverless_kafka_msk_stack.kafka_vpc,
+                                                kafka_security_group=serverless_kafka_msk_stack.kafka_security_group,
+                                                msk_arn=serverless_kafka_msk_stack.msk_arn)
+    kafka_producer = ServerlessKafkaProducerStack(app, construct_id="ServerlessKafkaProducerStack", app_config_id="app_config",
+                                                  stack_config_id="serverless_kafka_producer_config",
+                                                  kafka_vpc=serverless_kafka_msk_stack.kafka_vpc,
+                                                  kafka_security_group=serverless_kafka_msk_stack.kafka_security_group,
+                                                  msk_arn=serverless_kafka_msk_stack.msk_arn,
+                                                  kafka_bootstrap_server=kafka_handler.get_kafka_bootstrap_server)
+    return assertions.Template.from_stack(kafka_producer)
+
+
+# Test that the batch resource validates an array of messages
+def test_serverless_producer_batch_resource():
+    template = create_producer_template({"apigateway_batch_max_messages": 100})
+
+    template.has_resource_properties("AWS::ApiGateway::Resource", {"PathPart": "batch"})
+    template.has_resource_properties("AWS::ApiGateway::Model", {
+        "Schema": assertions.Match.object_like({
+            "required": ["messages"],
+            "properties": {"messages": assertions.Match.object_like({"type": "array", "minItems": 1, "maxItems": 100})}
+        })
+    })
+
+
+# Test that the acknowledgement mode is passed to the producer function
+def test_serverless_producer_ack_mode():
+    template = create_producer_template({"function_ack_mode": "async"})
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({"ACK_MODE": "async"})}
+    })
+
+
+# Test that the producer tuning settings are passed to the producer function
+def test_serverless_producer_tuning_settings():
+    template = create_producer_template({
+        "function_producer_compression_type": "zstd",
+        "function_producer_linger_ms": 0,
+        "function_producer_enable_idempotence": False
+    })
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({
+            "PRODUCER_COMPRESSION_TYPE": "zstd",
+            "PRODUCER_LINGER_MS": "0",
+            "PRODUCER_ENABLE_IDEMPOTENCE": "false"
+        })}
+    })
+
+
+# Test that API Gateway invokes the alias of the published version with SnapStart
+def test_serverless_producer_alias():
+    template = create_producer_template({})
+
+    template.has_resource_properties("AWS::Lambda::Function", {"SnapStart": {"ApplyOn": "PublishedVersions"}})
+    template.resource_count_is("AWS::Lambda::Version", 1)
+    template.has_resource_properties("AWS::Lambda::Alias", {"Name": "live"})
+    template.has_resource_properties("AWS::Lambda::Permission", {
+        "Principal": "apigateway.amazonaws.com",
+        "FunctionName": {"Ref": assertions.Match.string_like_regexp("ProducerLambdaAlias.*")}
+    })
+
+
+# Test that the provisioned concurrency of the alias is scaled on its utilization and on schedules
+def test_serverless_producer_provisioned_concurrency():
+    template = create_producer_template({
+        "function_snapstart_enabled": "no",
+        "function_provisioned_concurrency": 2,
+        "function_provisioned_concurrency_max": 10,
+        "function_provisioned_concurrency_schedules": [
+            {"name": "BusinessHours", "expression": "cron(0 8 ? * MON-FRI *)", "min_capacity": 5}
+        ]
+    })
+
+    template.has_resource_properties("AWS::Lambda::Alias", {"ProvisionedConcurrencyConfig": {"ProvisionedConcurrentExecutions": 2}})
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalableTarget", {
+        "MinCapacity": 2,
+        "MaxCapacity": 10,
+        "ScheduledActions": [assertions.Match.object_like({"Schedule": "cron(0 8 ? * MON-FRI *)", "ScalableTargetAction": {"MinCapacity": 5}})]
+    })
+    template.has_resource_properties("AWS::ApplicationAutoScaling::ScalingPolicy", {
+        "TargetTrackingScalingPolicyConfiguration": assertions.Match.object_like({"TargetValue": 0.7})
+    })
+
+
+# Test that provisioned concurrency is rejected together with SnapStart
+def test_serverless_producer_provisioned_concurrency_with_snapstart():
+    with pytest.raises(ValueError):
+        create_producer_template({"function_provisioned_concurrency": 2})
+
+
+# Test that the key strategy is passed to the producer function and the path parameter gets its resource
+def test_serverless_producer_key_strategy():
+    template = create_producer_template({"function_key_strategy": "path_parameter", "function_key_source": "customerId",
+                                         "function_partition_metrics_window_seconds": 300})
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({"KEY_STRATEGY": "path_parameter", "KEY_SOURCE": "customerId",
+                                                                   "PARTITION_METRICS_WINDOW_SECONDS": "300"})}
+    })
+    template.has_resource_properties("AWS::ApiGateway::Resource", {"PathPart": "{customerId}"})
+
+
+# Test that the allowed topics get the topic resources and write permissions
+def test_serverless_producer_topic_resources():
+    template = create_producer_template({"allowed_topics": ["orders", "payments"]})
+
+    template.has_resource_properties("AWS::ApiGateway::Resource", {"PathPart": "{topic}"})
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({"ALLOWED_TOPICS": "orders,payments"})}
+    })
+    for topic in ["ServerlessKafkaTopic", "orders", "payments"]:
+        template.has_resource_properties("AWS::IAM::Policy", {
+            "PolicyDocument": {"Statement": assertions.Match.array_with([assertions.Match.object_like({
+                "Action": "kafka-cluster:WriteData",
+                "Resource": {"Fn::Join": ["", assertions.Match.array_with(["/" + topic])]}
+            })])}
+        })
+
+
+# Test that the API accepts gzip compressed bodies and the function gets the decompression cap
+def test_serverless_producer_compressed_bodies():
+    template = create_producer_template({"function_max_decompressed_body_bytes": 524288})
+
+    template.has_resource_properties("AWS::ApiGateway::RestApi", {"BinaryMediaTypes": ["application/gzip"]})
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({"MAX_DECOMPRESSED_BODY_BYTES": "524288"})}
+    })
+
+
+# Test that the HTTP API ingress has the routes of the REST API with IAM authorization and the function validates requests
+def test_serverless_producer_http_api_ingress():
+    template = create_producer_template({"apigateway_ingress_type": "http", "apigateway_batch_max_messages": 100})
+
+    template.resource_count_is("AWS::ApiGateway::RestApi", 0)
+    template.has_resource_properties("AWS::ApiGatewayV2::Api", {"ProtocolType": "HTTP"})
+    template.has_resource_properties("AWS::ApiGatewayV2::Integration", {"PayloadFormatVersion": "1.0"})
+    for route_key in ["POST /ProducerAPIResource", "POST /ProducerAPIResource/batch"]:
+        template.has_resource_properties("AWS::ApiGatewayV2::Route", {"RouteKey": route_key, "AuthorizationType": "AWS_IAM"})
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({"VALIDATE_REQUESTS": "true", "BATCH_MAX_MESSAGES": "100"})}
+    })
+
+
+# Test that the function URL ingress requires IAM authorization and uses the handler that maps paths to resources
+def test_serverless_producer_function_url_ingress():
+    template = create_producer_template({"apigateway_ingress_type": "function_url"})
+
+    template.resource_count_is("AWS::ApiGateway::RestApi", 0)
+    template.has_resource_properties("AWS::Lambda::Url", {"AuthType": "AWS_IAM", "Qualifier": "live"})
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "software.amazon.samples.kafka.lambda.FunctionUrlKafkaProxy::handleRequest",
+        "Environment": {"Variables": assertions.Match.object_like({"VALIDATE_REQUESTS": "true", "API_RESOURCE": "ProducerAPIResource"})}
+    })
+
+
+# Test that unknown ingress types fail the synthesis
+def test_serverless_producer_unknown_ingress_type():
+    with pytest.raises(ValueError):
+        create_producer_template({"apigateway_ingress_type": "alb"})
+
+
+# Test that the shared idempotency store is a table with TTL the function can read and write
+def test_serverless_producer_idempotency_store():
+    template = create_producer_template({"function_idempotency_store": "dynamodb", "function_idempotency_ttl_seconds": 600})
+
+    template.has_resource_properties("AWS::DynamoDB::Table", {
+        "KeySchema": [{"AttributeName": "id", "KeyType": "HASH"}],
+        "TimeToLiveSpecification": {"AttributeName": "expiration", "Enabled": True}
+    })
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({
+            "IDEMPOTENCY_TABLE": assertions.Match.any_value(),
+            "IDEMPOTENCY_TTL_SECONDS": "600"
+        })}
+    })
+
+
+# Test that hot key salting is passed to the function and requires meaningful keys
+def test_serverless_producer_hot_key_salting():
+    template = create_producer_template({"function_key_strategy": "header", "function_key_source": "X-Customer-Id",
+                                         "function_hot_key_salts": 4, "function_hot_key_threshold": 500})
+
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Environment": {"Variables": assertions.Match.object_like({"HOT_KEY_SALTS": "4", "HOT_KEY_THRESHOLD": "500"})}
+    })
+
+    with pytest.raises(ValueError):
+        create_producer_template({"function_hot_key_salts": 4})
+
+
+# Test that the queue ingest mode sends requests to the queue the batch producer reads with partial batch responses
+def test_serverless_producer_queue_ingest_mode():
+    template = create_producer_template({"apigateway_ingest_mode": "queue", "queue_batch_size": 500,
+                                         "function_key_strategy": "header", "function_key_source": "X-Customer-Id"})
+
+    template.resource_count_is("AWS::SQS::Queue", 2)
+    template.has_resource_properties("AWS::SQS::Queue", {
+        "RedrivePolicy": {"deadLetterTargetArn": assertions.Match.any_value(), "maxReceiveCount": 5}
+    })
+    template.has_resource_properties("AWS::Lambda::EventSourceMapping", {
+        "BatchSize": 500,
+        "MaximumBatchingWindowInSeconds": 5,
+        "FunctionResponseTypes": ["ReportBatchItemFailures"]
+    })
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "Handler": "software.amazon.samples.kafka.lambda.SqsBatchKafkaProducer::handleRequest"
+    })
+    template.has_resource_properties("AWS::ApiGateway::Method", {
+        "Integration": assertions.Match.object_like({
+            "Type": "AWS",
+            "RequestTemplates": {"application/json": assertions.Match.string_like_regexp("Action=SendMessage.*Idempotency-Key.*X-Customer-Id")}
+        })
+    })
+
+    with pytest.raises(ValueError):
+        create_producer_template({"apigateway_ingest_mode": "queue", "apigateway_ingress_type": "http"})
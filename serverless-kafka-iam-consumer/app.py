@@ -3,54 +3,310 @@
 import json
 import base64
 import os
+import random
+import time
 from aws_lambda_powertools import Logger
 from aws_lambda_powertools import Tracer
 from aws_lambda_powertools import Metrics
 from aws_lambda_powertools.metrics import MetricUnit
 from aws_lambda_powertools.utilities.typing import LambdaContext
 
+import columnar
+import dynamodb_sink
+import enrichment
+import kafka_sink
+import materialized_view
+import offset_tracker
+import processor_registry
+import rate_limiter
+import record_keys
+import snapstart
+import telemetry
+import telemetry_extension
+import trace_context
+
 
 # Define the TOPIC_NAME variable from environment variable or set default as "ServerlessKafkaTopic"
 TOPIC_NAME = os.environ.get('TOPIC_NAME', "ServerlessKafkaTopic")
 
+# Processors the topic partition batches of an event are dispatched to. The topics are mapped to the registered
+# processors through TOPIC_PROCESSORS (e.g. "orders=records,metrics=columnar"), other topics use the "default" processor.
+PROCESSORS = processor_registry.ProcessorRegistry()
+
+# Comma separated list of numeric JSON fields. If set, batches are processed in columnar form instead of record by record
+COLUMNAR_FIELDS = [field.strip() for field in os.environ.get('COLUMNAR_FIELDS', "").split(",") if field.strip()]
+# Optional filter expression applied to the columnar batch, e.g. "amount>=10"
+COLUMNAR_FILTER = os.environ.get('COLUMNAR_FILTER', "")
+# Comma separated list of aggregations computed over the columnar batch, e.g. "amount:sum,amount:max"
+COLUMNAR_AGGREGATIONS = columnar.parse_aggregations(os.environ.get('COLUMNAR_AGGREGATIONS', ""))
+
+# Logs and metrics are written through the telemetry channel. With the telemetry extension (TELEMETRY_EXTENSION_ENABLED)
+# they are buffered and shipped after the response was returned, otherwise they are written directly.
+TELEMETRY = telemetry.TelemetryChannel()
+
 tracer = Tracer() 
-logger = Logger()
+logger = Logger(logger_handler=telemetry.TelemetryLogHandler(TELEMETRY))
 metrics = Metrics()
 
+TELEMETRY_EXTENSION = telemetry_extension.start_extension_from_environment(TELEMETRY)
+
+# Reference data enrichment (configured through the ENRICHMENT_* variables). It is created once per container, so the
+# memory-mapped snapshot and the lookup cache are reused by warm invocations. The initial snapshot is loaded during init.
+ENRICHER = enrichment.create_enricher_from_environment()
+if ENRICHER is not None:
+    ENRICHER.ensure_snapshot()
+
+# Output topic of the consume-transform-produce mode (configured through OUTPUT_TOPIC_NAME). The IAM authenticated
+# producer is created on first use and reused by all warm invocations of the container.
+OUTPUT_SINK = kafka_sink.create_sink_from_environment()
+
+# Key-value table the decoded records are written to (configured through the KV_* variables)
+KV_SINK = dynamodb_sink.create_sink_from_environment()
+# Time reserved at the end of the invocation, retries of unprocessed items stop once it is reached
+KV_DEADLINE_MARGIN_MS = int(os.environ.get('KV_DEADLINE_MARGIN_MS', 5000))
+
+# Rate limit for the writes to the downstream systems, shared by all concurrent instances (configured through the RATE_LIMIT_* variables)
+RATE_LIMITER = rate_limiter.create_rate_limiter_from_environment()
+# "wait" slows down until the tokens for the whole batch are available, "shrink" writes smaller chunks as tokens become available
+RATE_LIMIT_MODE = os.environ.get('RATE_LIMIT_MODE', "wait")
+
+# Latest value per key of the consumed partitions, kept across warm invocations and restored from its snapshot during init
+# (configured through the VIEW_* variables)
+LATEST_VALUE_VIEW = materialized_view.create_view_from_environment()
+if LATEST_VALUE_VIEW is not None:
+    LATEST_VALUE_VIEW.restore()
+
+# Last offset seen per partition by this execution environment, used to detect gaps and redeliveries
+OFFSET_TRACKER = offset_tracker.PartitionOffsetTracker()
+
+# Links the consumer batches to the traces of the requests that produced the records (trace header in the record headers)
+TRACE_LINKER = trace_context.create_linker_from_environment()
+
+
+# Lookup API of the latest value view for the other stages of the function, returns the decoded JSON value or None
+def lookup_latest_value(key):
+    if LATEST_VALUE_VIEW is None:
+        raise RuntimeError("The latest value view is not enabled, set VIEW_ENABLED to 'yes'")
+    return LATEST_VALUE_VIEW.view.get_json(key)
+
 
 @tracer.capture_method
-def log_record(record) -> None:
+def log_record(record, decoded_value=None) -> None:
         uuid = ""
         value = ""
-        # The key is extracted from the event object using the partition key
+        # The key is extracted from the event object using the partition key, salted hot keys are merged
         if 'key' in record:
-            uuid = base64.b64decode(record["key"]).decode('utf-8')
+            uuid = (record_keys.record_key(record) or b"").decode('utf-8')
+        # An already decoded (and enriched) value takes precedence over the raw value of the record
+        if decoded_value is not None:
+            value = json.dumps(decoded_value)
         #The value is extracted from the event object using the partition key
-        if 'value' in record:
+        elif 'value' in record:
             value = base64.b64decode(record["value"]).decode('utf-8')
         
         logger.info("Received a message from MSK with uuid: " + uuid + " and value: " + value )
 
 
+# Transforms a consumed record into the record written to the output topic, returning None drops the record.
+# Per default the (enriched) JSON value or, if it was not decoded, the raw value is forwarded with the original key
+# (the key without the salt of a salted hot key).
+def transform_record(record, decoded_value=None):
+    key = record_keys.record_key(record)
+    value = json.dumps(decoded_value).encode('utf-8') if decoded_value is not None else base64.b64decode(record.get("value", ""))
+    return kafka_sink.OutputRecord(value=value, key=key, source_topic=record.get("topic"),
+                                   source_partition=record.get("partition"), source_offset=record.get("offset"))
+
+
+# Writes the transformed records of the batch to the output topic with a single flush
+@tracer.capture_method
+def produce_outputs(outputs: list) -> None:
+    OUTPUT_SINK.write_batch(outputs)
+    metrics.add_metric(name="ProducedMessages", unit=MetricUnit.Count, value=len(outputs))
+
+
+# Writes the decoded records of the batch to the key-value table with batched, concurrent writes
+@tracer.capture_method
+def write_key_values(values: list, context: LambdaContext) -> None:
+    deadline = time.monotonic() + (context.get_remaining_time_in_millis() - KV_DEADLINE_MARGIN_MS) / 1000
+    statistics = KV_SINK.write(values, deadline)
+    metrics.add_metric(name="KeyValueWrittenItems", unit=MetricUnit.Count, value=statistics["written"])
+    metrics.add_metric(name="KeyValueMergedItems", unit=MetricUnit.Count, value=statistics["merged"])
+    metrics.add_metric(name="KeyValueSkippedItems", unit=MetricUnit.Count, value=statistics["skipped"])
+    metrics.add_metric(name="KeyValueRetries", unit=MetricUnit.Count, value=statistics["retries"])
+
+
+# Splits the batch into the (start, end) ranges that can be written downstream within the rate limit
+def rate_limited_ranges(count: int, context: LambdaContext):
+    if RATE_LIMITER is None:
+        yield 0, count
+        return
+    deadline = time.monotonic() + (context.get_remaining_time_in_millis() - KV_DEADLINE_MARGIN_MS) / 1000
+    waited_seconds = RATE_LIMITER.waited_seconds
+    start = 0
+    try:
+        while start < count:
+            granted = RATE_LIMITER.acquire(count - start, deadline, partial=RATE_LIMIT_MODE == "shrink")
+            yield start, start + granted
+            start += granted
+    finally:
+        metrics.add_metric(name="RateLimitWaitTime", unit=MetricUnit.Milliseconds, value=(RATE_LIMITER.waited_seconds - waited_seconds) * 1000)
+        metrics.add_metric(name="RateLimitedRecords", unit=MetricUnit.Count, value=count - start)
+
+
+# Writes the batch to the configured downstream systems (output topic, key-value table) within the rate limit
+def write_downstream(values: list, outputs: list, context: LambdaContext) -> None:
+    if OUTPUT_SINK is None and KV_SINK is None:
+        return
+    for start, end in rate_limited_ranges(len(values), context):
+        chunk_outputs = [output for output in outputs[start:end] if output is not None]
+        # The batch is only acknowledged once all output records are written
+        if chunk_outputs:
+            produce_outputs(chunk_outputs)
+        if KV_SINK is not None:
+            write_key_values(values[start:end], context)
+
+
+# Classifies the batches as contiguous, gapped or overlapping (redelivered) and publishes the counts
+@tracer.capture_method
+def track_offsets(event: dict) -> None:
+    statistics = OFFSET_TRACKER.track_event(event)
+    metrics.add_metric(name="ContiguousBatches", unit=MetricUnit.Count, value=statistics[offset_tracker.CONTIGUOUS])
+    metrics.add_metric(name="GappedBatches", unit=MetricUnit.Count, value=statistics[offset_tracker.GAPPED])
+    metrics.add_metric(name="OverlappingBatches", unit=MetricUnit.Count, value=statistics[offset_tracker.OVERLAPPING])
+    metrics.add_metric(name="SkippedOffsets", unit=MetricUnit.Count, value=statistics["skipped_offsets"])
+    metrics.add_metric(name="RedeliveredRecords", unit=MetricUnit.Count, value=statistics["redelivered_records"])
+
+
+# Applies the batch to the latest value view and publishes the number of applied records
+@tracer.capture_method
+def update_latest_value_view(event: dict) -> None:
+    applied = LATEST_VALUE_VIEW.apply_event(event)
+    metrics.add_metric(name="ViewAppliedRecords", unit=MetricUnit.Count, value=applied)
+
+
+# Adds segments for the batch to the traces of the producing requests and records the linked traces in the invocation trace
+@tracer.capture_method
+def link_source_traces(event: dict, started_at: float) -> None:
+    linked = TRACE_LINKER.link(event, started_at, consumer_trace_id=trace_context.current_trace_id())
+    metrics.add_metric(name="LinkedTraces", unit=MetricUnit.Count, value=len(linked))
+    if linked:
+        tracer.put_metadata("linked_traces", linked)
+
+
+# Enriches the decoded values of a batch with reference data and publishes the lookup statistics
+@tracer.capture_method
+def enrich_values(values: list) -> list:
+    statistics = ENRICHER.enrich_all(values)
+    metrics.add_metric(name="EnrichmentSnapshotHits", unit=MetricUnit.Count, value=statistics["snapshot_hits"])
+    metrics.add_metric(name="EnrichmentCacheHits", unit=MetricUnit.Count, value=statistics["cache_hits"])
+    metrics.add_metric(name="EnrichmentRemoteLookups", unit=MetricUnit.Count, value=statistics["remote_lookups"])
+    metrics.add_metric(name="EnrichmentCacheHitRate", unit=MetricUnit.Percent, value=ENRICHER.cache.hit_rate * 100)
+    return values
+
+
+# Processes the whole batch vectorized: decode once, build columns, filter and aggregate
+@tracer.capture_method
+def process_columnar(records: list) -> dict:
+    values = columnar.decode_json_values(records)
+    if ENRICHER is not None:
+        enrich_values(values)
+    batch = columnar.ColumnarBatch.from_values(values, COLUMNAR_FIELDS)
+    if COLUMNAR_FILTER:
+        batch = batch.filter(COLUMNAR_FILTER)
+    aggregates = batch.aggregate(COLUMNAR_AGGREGATIONS)
+
+    metrics.add_metric(name="TransferredMessages", unit=MetricUnit.Count, value=len(records))
+    metrics.add_metric(name="SelectedMessages", unit=MetricUnit.Count, value=len(batch))
+    logger.info("Processed columnar batch", extra={"records": len(records), "selected": len(batch), "aggregates": aggregates})
+    return aggregates
+
+
+# Processes a batch record by record: decode, enrich, log, transform and write downstream
+@PROCESSORS.register("records")
+def process_records(records: list, context: LambdaContext) -> int:
+    values = columnar.decode_json_values(records) if ENRICHER is not None or KV_SINK is not None else [None] * len(records)
+    if ENRICHER is not None:
+        enrich_values(values)
+    outputs = []
+    for record, value in zip(records, values):
+        metrics.add_metric(name="TransferredMessages", unit=MetricUnit.Count, value=1)
+        log_record(record, value)
+        outputs.append(transform_record(record, value) if OUTPUT_SINK is not None else None)
+    write_downstream(values, outputs, context)
+    return len(records)
+
+
+@PROCESSORS.register("columnar")
+def process_columnar_records(records: list, context: LambdaContext) -> int:
+    process_columnar(records)
+    return len(records)
+
+
+# The default processor uses the columnar mode if columnar fields are configured
+@PROCESSORS.register(processor_registry.DEFAULT_PROCESSOR)
+def process_default(records: list, context: LambdaContext) -> int:
+    if COLUMNAR_FIELDS:
+        return process_columnar_records(records, context)
+    return process_records(records, context)
+
+
+PROCESSORS.assign(processor_registry.topic_processors_from_environment())
+
+
+# Runs before the SnapStart snapshot is taken: decodes a sample batch and creates the AWS clients, so that the modules,
+# decoders and service models loaded on the first use are part of the snapshot instead of the first invocation
+def prime_before_snapshot() -> None:
+    sample = {"id": "snapstart", "amount": 1.0}
+    records = [{"key": base64.b64encode(b"snapstart").decode("utf-8"), "value": base64.b64encode(json.dumps(sample).encode("utf-8")).decode("utf-8")}]
+    values = columnar.decode_json_values(records)
+    json.dumps(values)
+    if COLUMNAR_FIELDS:
+        columnar.ColumnarBatch.from_values(values, COLUMNAR_FIELDS).aggregate(COLUMNAR_AGGREGATIONS)
+    # Creating the clients loads the service models, the clients themselves are replaced after the restore
+    if KV_SINK is not None:
+        KV_SINK.warm_up(sample)
+    if RATE_LIMITER is not None and hasattr(RATE_LIMITER.store, "client"):
+        RATE_LIMITER.store.client
+    if OUTPUT_SINK is not None:
+        import kafka  # noqa: F401 (the producer connects after the restore)
+
+
+# Runs after an execution environment was restored from the snapshot. Connections, credentials, leased tokens and the
+# state of the random generator of the snapshot are shared by all restored environments, they are reset.
+def reset_after_restore() -> None:
+    random.seed()
+    if OUTPUT_SINK is not None:
+        OUTPUT_SINK.close()
+    if KV_SINK is not None:
+        KV_SINK.reset()
+    if RATE_LIMITER is not None:
+        RATE_LIMITER.reset()
+    if ENRICHER is not None:
+        ENRICHER.reset()
+
+
+snapstart.register_hooks(prime_before_snapshot, reset_after_restore)
+
 
 # The lambda_handler is the default AWS Lambda function entry point.
+# emits the metrics (and the ColdStart metric) upon request completion/failure through the telemetry channel and signals
+# the end of the invocation to the telemetry extension, so it ships the buffered telemetry
+@TELEMETRY.flush_after_invocation(metrics=metrics, capture_cold_start_metric=True)
 @tracer.capture_lambda_handler
-# ensures metrics are flushed upon request completion/failure and capturing ColdStart metric
-@metrics.log_metrics(capture_cold_start_metric=True)
 def lambda_handler(event: dict, context: LambdaContext):
-    # Create a partition key string by appending "-0" to the TOPIC_NAME
-    str_partition_key = TOPIC_NAME + "-0"
-    # Decode the value from base64 format to a string format.
-    records = event["records"][str_partition_key]
-    nrofrecords = 0
-    for record in records:
-        metrics.add_metric(name="TransferredMessages", unit=MetricUnit.Count, value=1)
-        log_record(record)
-        nrofrecords += 1
+    started_at = time.time()
+    track_offsets(event)
+
+    # Update the latest value view first, so that the following stages can look up the values of this batch
+    if LATEST_VALUE_VIEW is not None:
+        update_latest_value_view(event)
 
+    # Dispatch the batch of every topic partition to the processor registered for its topic
+    nrofrecords = PROCESSORS.dispatch(event, context)
 
+    if TRACE_LINKER is not None:
+        link_source_traces(event, started_at)
 
-    metrics.flush_metrics()
     tracer.put_annotation("nrofrecords", nrofrecords)
     tracer.put_metadata("test", "test") 
  
@@ -0,0 +1,57 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# Compares the per-record processing path with the columnar path for a filter + aggregation workload.
+# Run from the "serverless-kafka-iam-consumer" directory:
+#
+#   python benchmarks/benchmark_columnar.py
+import base64
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import columnar
+
+BATCH_SIZES = [100, 1000, 10000]
+REPETITIONS = 20
+
+
+# Creates a batch of records with base64 encoded JSON values like the MSK event source mapping delivers them
+def create_records(batch_size: int) -> list:
+    random.seed(batch_size)
+    return [
+        {"value": base64.b64encode(json.dumps({"amount": random.uniform(0, 100), "quantity": random.randint(1, 10), "customer": f"customer-{i}"}).encode("utf-8")).decode("utf-8")}
+        for i in range(batch_size)
+    ]
+
+
+# Per-record path: decode every record on its own and filter/aggregate in a Python loop
+def per_record(records: list) -> tuple:
+    total, maximum = 0.0, float("-inf")
+    for record in records:
+        value = json.loads(base64.b64decode(record["value"]).decode("utf-8"))
+        if value["amount"] >= 50:
+            total += value["amount"]
+            maximum = max(maximum, value["quantity"])
+    return total, maximum
+
+
+# Columnar path: decode the batch at once, build the columns and filter/aggregate vectorized
+def vectorized(records: list) -> tuple:
+    batch = columnar.ColumnarBatch.from_values(columnar.decode_json_values(records), ["amount", "quantity"])
+    aggregates = batch.filter("amount>=50").aggregate([("amount", "sum"), ("quantity", "max")])
+    return aggregates["amount_sum"], aggregates["quantity_max"]
+
+
+if __name__ == "__main__":
+    print(f"{'batch size':>10} | {'per-record (ms)':>15} | {'columnar (ms)':>13} | {'speedup':>7}")
+    for batch_size in BATCH_SIZES:
+        records = create_records(batch_size)
+        assert abs(per_record(records)[0] - vectorized(records)[0]) < 1e-6
+        per_record_ms = min(timeit.repeat(lambda: per_record(records), number=1, repeat=REPETITIONS)) * 1000
+        vectorized_ms = min(timeit.repeat(lambda: vectorized(records), number=1, repeat=REPETITIONS)) * 1000
+        print(f"{batch_size:>10} | {per_record_ms:>15.3f} | {vectorized_ms:>13.3f} | {per_record_ms / vectorized_ms:>6.2f}x")
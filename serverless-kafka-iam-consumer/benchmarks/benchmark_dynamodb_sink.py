@@ -0,0 +1,56 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# Measures the throughput of the key-value sink against the local stand-in table with a simulated service
+# latency per call, compared with writing one item per call. Run from the "serverless-kafka-iam-consumer" directory:
+#
+#   python benchmarks/benchmark_dynamodb_sink.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tests")))
+
+import dynamodb_sink
+from local_table import LocalTable
+
+ITEMS = 1000
+LATENCY_SECONDS = 0.005
+CONCURRENCY = [1, 4, 8]
+
+
+def create_items() -> list:
+    # Every tenth item repeats a key, those writes are merged by the sink
+    return [{"id": str(i - 1 if i % 10 == 0 else i), "amount": i * 0.5} for i in range(1, ITEMS + 1)]
+
+
+# One PutItem call per record
+def single_item_writes(items: list) -> float:
+    table = LocalTable("Orders", ["id"], latency_seconds=LATENCY_SECONDS)
+    sink = dynamodb_sink.DynamoDBBatchSink("Orders", ["id"], client=table)
+    start = time.perf_counter()
+    for item in items:
+        table.put_item(TableName="Orders", Item=sink._serialize(item))
+    return time.perf_counter() - start
+
+
+# Batched writes with the given number of concurrent batches, optionally the first calls are throttled
+def batched_writes(items: list, concurrency: int, throttled_calls: int = 0) -> float:
+    table = LocalTable("Orders", ["id"], latency_seconds=LATENCY_SECONDS, throttled_calls=throttled_calls)
+    sink = dynamodb_sink.DynamoDBBatchSink("Orders", ["id"], client=table, max_concurrency=concurrency)
+    start = time.perf_counter()
+    sink.write(items, time.monotonic() + 60)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    items = create_items()
+    print(f"{'mode':>24} | {'duration (ms)':>13} | {'items/s':>9}")
+    duration = single_item_writes(items)
+    print(f"{'single item writes':>24} | {duration * 1000:>13.1f} | {ITEMS / duration:>9.0f}")
+    for concurrency in CONCURRENCY:
+        duration = batched_writes(items, concurrency)
+        print(f"{f'batched, concurrency {concurrency}':>24} | {duration * 1000:>13.1f} | {ITEMS / duration:>9.0f}")
+    duration = batched_writes(items, 4, throttled_calls=4)
+    print(f"{'batched, 4 throttled':>24} | {duration * 1000:>13.1f} | {ITEMS / duration:>9.0f}")
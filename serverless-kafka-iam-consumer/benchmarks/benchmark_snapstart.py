@@ -0,0 +1,86 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# Compares the start of a new execution environment with and without SnapStart. Locally, a cold start (init and first
+# invocation) is measured in a fresh interpreter and compared with the part that remains after a restore (after-restore
+# hook and first invocation of a primed interpreter). Run from the "serverless-kafka-iam-consumer" directory:
+#
+#   python benchmarks/benchmark_snapstart.py
+#
+# The restore itself can only be measured in Lambda. With a log export of the function (e.g. from CloudWatch Logs
+# Insights) the "Init Duration" of cold starts and the "Restore Duration" of restored environments are compared:
+#
+#   python benchmarks/benchmark_snapstart.py --report-log consumer-logs.txt
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+CONSUMER_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RUNS = 5
+
+# Executed in a fresh interpreter, prints the durations (ms) as JSON on the last line
+MEASUREMENT = """
+import contextlib, io, json, sys, time
+sys.path.insert(0, "tests")
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import app
+    from conftest import LambdaContextStub, make_event, make_record
+    init = time.perf_counter() - start
+    if {snapstart}:
+        app.prime_before_snapshot()
+        start = time.perf_counter()
+        app.reset_after_restore()
+        init = time.perf_counter() - start
+    start = time.perf_counter()
+    app.lambda_handler(make_event([make_record({{"id": str(i), "amount": i}}, offset=i) for i in range(100)]), LambdaContextStub())
+    invocation = time.perf_counter() - start
+print(json.dumps({{"init": init * 1000, "invocation": invocation * 1000}}))
+"""
+
+
+def measure(snapstart: bool) -> dict:
+    environment = dict(os.environ, POWERTOOLS_TRACE_DISABLED="1", POWERTOOLS_METRICS_NAMESPACE="ServerlessKafka",
+                       POWERTOOLS_SERVICE_NAME="ServerlessKafkaConsumer")
+    runs = []
+    for _ in range(RUNS):
+        output = subprocess.run([sys.executable, "-c", MEASUREMENT.format(snapstart=snapstart)], cwd=CONSUMER_DIRECTORY, env=environment,
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: statistics.median(run[key] for run in runs) for key in ("init", "invocation")}
+
+
+# Returns the "Init Duration" and "Restore Duration" values (ms) of the REPORT lines in a log export
+def parse_report_log(path: str) -> dict:
+    durations = {"Init Duration": [], "Restore Duration": []}
+    with open(path, encoding="utf-8") as log:
+        for line in log:
+            for name, values in durations.items():
+                match = re.search(name + r": ([0-9.]+) ms", line)
+                if match:
+                    values.append(float(match.group(1)))
+    return durations
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--report-log", help="log export with the REPORT lines of the function")
+    arguments = parser.parse_args()
+
+    if arguments.report_log:
+        durations = parse_report_log(arguments.report_log)
+        print(f"{'start':>16} | {'count':>5} | {'p50 (ms)':>9} | {'max (ms)':>9}")
+        for name, values in durations.items():
+            if values:
+                print(f"{name:>16} | {len(values):>5} | {statistics.median(values):>9.1f} | {max(values):>9.1f}")
+        sys.exit(0)
+
+    cold, restored = measure(False), measure(True)
+    print(f"median of {RUNS} runs, 100 records in the first invocation")
+    print(f"{'start':>24} | {'init (ms)':>9} | {'first invocation (ms)':>21} | {'total (ms)':>10}")
+    print(f"{'cold start':>24} | {cold['init']:>9.1f} | {cold['invocation']:>21.1f} | {cold['init'] + cold['invocation']:>10.1f}")
+    print(f"{'after restore (hooks)':>24} | {restored['init']:>9.1f} | {restored['invocation']:>21.1f} | {restored['init'] + restored['invocation']:>10.1f}")
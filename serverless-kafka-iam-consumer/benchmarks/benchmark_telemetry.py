@@ -0,0 +1,67 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# Measures the handler duration with telemetry written directly compared with telemetry buffered for the telemetry
+# extension, which ships it after the response. The extension runs against the local stand-in of the Extensions API
+# and the telemetry is written to /dev/null. Run from the "serverless-kafka-iam-consumer" directory:
+#
+#   python benchmarks/benchmark_telemetry.py
+import contextlib
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tests")))
+
+os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "1")
+os.environ.setdefault("POWERTOOLS_METRICS_NAMESPACE", "ServerlessKafka")
+os.environ.setdefault("POWERTOOLS_SERVICE_NAME", "ServerlessKafkaConsumer")
+
+import app
+import telemetry
+import telemetry_extension
+from conftest import LambdaContextStub, make_event, make_record
+from local_runtime_api import LocalRuntimeApi
+
+RECORDS = 100
+INVOCATIONS = 50
+
+
+# Returns the handler durations (ms) and the time until the extension finished the invocations (ms)
+def run(runtime_api: LocalRuntimeApi = None) -> tuple:
+    event = make_event([make_record({"id": str(i), "amount": i * 0.5}, offset=i) for i in range(RECORDS)])
+    context = LambdaContextStub()
+    durations, completions = [], []
+    for _ in range(INVOCATIONS):
+        if runtime_api is not None:
+            runtime_api.invoke()
+        start = time.perf_counter()
+        app.lambda_handler(event, context)
+        durations.append((time.perf_counter() - start) * 1000)
+        if runtime_api is not None:
+            runtime_api.wait_for_extension()
+        completions.append((time.perf_counter() - start) * 1000)
+    return durations, completions
+
+
+if __name__ == "__main__":
+    # Powertools writes metrics with 100 values directly, they are discarded as well
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        app.TELEMETRY.write = telemetry.StdoutWriter(devnull)
+        app.lambda_handler(make_event([make_record({"id": "warm-up"})]), LambdaContextStub())
+
+        direct, _ = run()
+
+        runtime_api = LocalRuntimeApi()
+        extension = telemetry_extension.TelemetryExtension(app.TELEMETRY, telemetry_extension.ExtensionsApiClient(runtime_api.address))
+        extension.start()
+        runtime_api.wait_for_extension()
+        buffered, completed = run(runtime_api)
+        runtime_api.shutdown()
+
+    print(f"{RECORDS} records per invocation, median of {INVOCATIONS} invocations")
+    print(f"{'mode':>24} | {'handler (ms)':>12} | {'until frozen (ms)':>17}")
+    print(f"{'direct writes':>24} | {statistics.median(direct):>12.2f} | {statistics.median(direct):>17.2f}")
+    print(f"{'telemetry extension':>24} | {statistics.median(buffered):>12.2f} | {statistics.median(completed):>17.2f}")
@@ -0,0 +1,158 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import base64
+import json
+import operator
+
+# NumPy and PyArrow are optional. They are not part of the Powertools layer and have to be added
+# to the consumer function through an additional layer (see "function_columnar_layer_arn").
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+# Comparison operators supported in filter expressions. Two character operators come first so that
+# "amount>=10" is not split at ">".
+FILTER_OPERATORS = [
+    (">=", operator.ge),
+    ("<=", operator.le),
+    ("!=", operator.ne),
+    ("==", operator.eq),
+    (">", operator.gt),
+    ("<", operator.lt),
+]
+
+# Supported aggregations, mapped to their NaN-aware NumPy implementation
+AGGREGATIONS = {
+    "sum": "nansum",
+    "mean": "nanmean",
+    "min": "nanmin",
+    "max": "nanmax",
+    "count": None,
+}
+
+
+# Raises a meaningful error if the columnar mode is used without NumPy being available
+def require_numpy() -> None:
+    if np is None:
+        raise ImportError("The columnar mode requires numpy. Add a layer providing numpy to the consumer function.")
+
+
+# Decodes the base64 encoded JSON values of a batch of records in a single json.loads call.
+# Falls back to decoding record by record if one of the values is not valid JSON, in that case
+# the value of the invalid record is returned as None. A value that is not exactly one JSON document
+# (e.g. "1, 2") still parses as part of the joined array but shifts the later values, so the joined
+# result is only used if it has one value per record.
+def decode_json_values(records: list) -> list:
+    raw_values = [base64.b64decode(record["value"]).decode("utf-8") if "value" in record else "null" for record in records]
+    try:
+        values = json.loads("[" + ",".join(raw_values) + "]")
+        if len(values) == len(raw_values):
+            return values
+    except ValueError:
+        pass
+    values = []
+    for raw_value in raw_values:
+        try:
+            values.append(json.loads(raw_value))
+        except ValueError:
+            values.append(None)
+    return values
+
+
+# Parses a filter expression like "amount>=10" into a (field, operator, value) tuple
+def parse_filter(expression: str) -> tuple:
+    for symbol, function in FILTER_OPERATORS:
+        field, separator, value = expression.partition(symbol)
+        if separator:
+            if not field.strip() or not value.strip():
+                raise ValueError(f"Invalid filter expression: {expression}")
+            return field.strip(), function, float(value)
+    raise ValueError(f"Invalid filter expression: {expression}")
+
+
+# Parses an aggregation list like "amount:sum,amount:max" into a list of (field, aggregation) tuples
+def parse_aggregations(aggregations: str) -> list:
+    parsed = []
+    for aggregation in filter(None, (a.strip() for a in aggregations.split(","))):
+        field, _, function = aggregation.partition(":")
+        if function not in AGGREGATIONS:
+            raise ValueError(f"Unsupported aggregation '{function}', use one of {', '.join(AGGREGATIONS)}")
+        parsed.append((field, function))
+    return parsed
+
+
+# Returns the value of a dotted field path ("order.amount") as float or NaN if it is missing or not numeric
+def _extract_number(document, path: list) -> float:
+    for part in path:
+        if not isinstance(document, dict) or part not in document:
+            return float("nan")
+        document = document[part]
+    try:
+        return float(document)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+# Columnar representation of a decoded batch. Every selected field becomes a float64 NumPy array
+# (missing or non-numeric values are NaN), "index" holds the position of each row in the original
+# batch so that filtered rows can be mapped back to their records.
+class ColumnarBatch:
+    def __init__(self, columns: dict, index):
+        self.columns = columns
+        self.index = index
+
+    # Builds the columns for the given fields from a list of decoded JSON documents
+    @classmethod
+    def from_values(cls, values: list, fields: list) -> "ColumnarBatch":
+        require_numpy()
+        columns = {}
+        for field in fields:
+            path = field.split(".")
+            columns[field] = np.fromiter((_extract_number(value, path) for value in values), dtype=np.float64, count=len(values))
+        return cls(columns, np.arange(len(values)))
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, field: str):
+        return self.columns[field]
+
+    # Returns a boolean mask for a filter expression or an already parsed (field, operator, value) tuple
+    def mask(self, expression):
+        field, function, value = parse_filter(expression) if isinstance(expression, str) else expression
+        return function(self.columns[field], value)
+
+    # Returns a new batch containing only the rows selected by the mask or filter expression
+    def filter(self, expression) -> "ColumnarBatch":
+        mask = expression if np is not None and isinstance(expression, np.ndarray) else self.mask(expression)
+        return ColumnarBatch({field: column[mask] for field, column in self.columns.items()}, self.index[mask])
+
+    # Returns a new batch containing only the given fields
+    def project(self, fields: list) -> "ColumnarBatch":
+        return ColumnarBatch({field: self.columns[field] for field in fields}, self.index)
+
+    # Computes the given (field, aggregation) tuples, results are keyed by "<field>_<aggregation>"
+    def aggregate(self, aggregations: list) -> dict:
+        results = {}
+        for field, function in aggregations:
+            column = self.columns[field]
+            if function == "count":
+                results[f"{field}_count"] = int(np.count_nonzero(~np.isnan(column)))
+            elif np.isnan(column).all():
+                results[f"{field}_{function}"] = None
+            else:
+                results[f"{field}_{function}"] = float(getattr(np, AGGREGATIONS[function])(column))
+        return results
+
+    # Converts the batch into an Arrow record batch. The float64 columns are handed over without a copy.
+    def to_arrow(self):
+        if pa is None:
+            raise ImportError("Converting to Arrow requires pyarrow. Add a layer providing pyarrow to the consumer function.")
+        return pa.RecordBatch.from_arrays(list(self.columns.values()), names=list(self.columns.keys()))
@@ -0,0 +1,149 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from aws_lambda_powertools import Logger
+
+logger = Logger(child=True)
+
+# DynamoDB accepts at most 25 put requests per BatchWriteItem call
+BATCH_WRITE_LIMIT = 25
+
+
+# Raised if items are still unprocessed when the invocation deadline is reached. Failing the invocation
+# lets the event source mapping retry the batch, which is safe because puts are idempotent.
+class UnprocessedItemsError(Exception):
+    def __init__(self, unprocessed: int):
+        super().__init__(f"{unprocessed} items were not written before the deadline")
+        self.unprocessed = unprocessed
+
+
+# DynamoDB does not accept floats, they are converted to Decimal (recursively for maps and lists)
+def to_dynamodb_value(value):
+    if isinstance(value, float):
+        return Decimal(str(value))
+    if isinstance(value, dict):
+        return {k: to_dynamodb_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [to_dynamodb_value(v) for v in value]
+    return value
+
+
+# Writes items to a DynamoDB table with BatchWriteItem. Items are deduplicated by key (the last write wins, which
+# also avoids the validation error DynamoDB raises for duplicate keys in one request), split into batches of 25
+# and written by a thread pool that is reused by warm invocations. Unprocessed items are retried with full
+# jitter exponential backoff until the deadline.
+class DynamoDBBatchSink:
+    def __init__(
+        self,
+        table_name: str,
+        key_attributes: list,
+        client=None,
+        max_concurrency: int = 4,
+        base_backoff_seconds: float = 0.05,
+        max_backoff_seconds: float = 2.0,
+    ):
+        self.table_name = table_name
+        self.key_attributes = key_attributes
+        self.max_concurrency = max_concurrency
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._client = client
+        self._serializer = None
+        self._executor = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("dynamodb")
+        return self._client
+
+    # Drops the client, e.g. after a SnapStart restore, the next write creates a new one with fresh connections and credentials
+    def reset(self) -> None:
+        self._client = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="dynamodb-sink")
+        return self._executor
+
+    # Creates the client and serializes the item without writing it, so that the service model and the serializer are
+    # loaded before the first write, e.g. before the SnapStart snapshot
+    def warm_up(self, item: dict) -> None:
+        self.client
+        self._serialize(item)
+
+    def _serialize(self, item: dict) -> dict:
+        if self._serializer is None:
+            from boto3.dynamodb.types import TypeSerializer
+            self._serializer = TypeSerializer()
+        return {name: self._serializer.serialize(to_dynamodb_value(value)) for name, value in item.items()}
+
+    # Returns the items with unique keys, keeping the last item written for every key. Items without
+    # the key attributes are returned separately.
+    def deduplicate(self, items: list) -> tuple:
+        unique, skipped = {}, []
+        for item in items:
+            if not isinstance(item, dict) or any(attribute not in item for attribute in self.key_attributes):
+                skipped.append(item)
+                continue
+            key = tuple(str(item[attribute]) for attribute in self.key_attributes)
+            unique.pop(key, None)
+            unique[key] = item
+        return list(unique.values()), skipped
+
+    def _backoff(self, attempt: int, deadline: float) -> bool:
+        delay = random.uniform(0, min(self.max_backoff_seconds, self.base_backoff_seconds * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return False
+        time.sleep(delay)
+        return True
+
+    # Writes one batch of at most 25 requests, returns (attempts, requests still unprocessed at the deadline)
+    def _write_batch(self, requests: list, deadline: float) -> tuple:
+        attempt = 0
+        while requests:
+            response = self.client.batch_write_item(RequestItems={self.table_name: requests})
+            requests = response.get("UnprocessedItems", {}).get(self.table_name, [])
+            attempt += 1
+            if requests and not self._backoff(attempt, deadline):
+                break
+        return attempt, len(requests)
+
+    # Writes the items before the deadline (time.monotonic() based) and returns the write statistics
+    def write(self, items: list, deadline: float) -> dict:
+        unique, skipped = self.deduplicate(items)
+        requests = [{"PutRequest": {"Item": self._serialize(item)}} for item in unique]
+        batches = [requests[start:start + BATCH_WRITE_LIMIT] for start in range(0, len(requests), BATCH_WRITE_LIMIT)]
+        results = list(self.executor.map(lambda batch: self._write_batch(batch, deadline), batches))
+
+        statistics = {
+            "written": len(unique) - sum(unprocessed for _, unprocessed in results),
+            "merged": len(items) - len(unique) - len(skipped),
+            "skipped": len(skipped),
+            "batches": len(batches),
+            "retries": sum(attempts - 1 for attempts, _ in results),
+        }
+        unprocessed = sum(unprocessed for _, unprocessed in results)
+        if unprocessed:
+            logger.error("Items were not written before the deadline", extra=statistics)
+            raise UnprocessedItemsError(unprocessed)
+        return statistics
+
+
+# Creates the key-value sink from the KV_* environment variables or returns None if no table is configured
+def create_sink_from_environment(environment=os.environ):
+    table_name = environment.get("KV_TABLE_NAME")
+    if not table_name:
+        return None
+    return DynamoDBBatchSink(
+        table_name=table_name,
+        key_attributes=[attribute.strip() for attribute in environment.get("KV_TABLE_KEY_ATTRIBUTES", "id").split(",") if attribute.strip()],
+        max_concurrency=int(environment.get("KV_MAX_CONCURRENCY", 4)),
+    )
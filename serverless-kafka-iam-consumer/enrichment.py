@@ -0,0 +1,300 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from urllib.parse import urlparse
+
+from aws_lambda_powertools import Logger
+
+logger = Logger(child=True)
+
+# Location of the reference snapshot in the Lambda's ephemeral storage. It survives warm invocations.
+SNAPSHOT_PATH = "/tmp/enrichment-snapshot.ndjson"
+
+# DynamoDB accepts at most 100 keys per BatchGetItem request
+DYNAMODB_BATCH_GET_LIMIT = 100
+
+
+# Least recently used cache with a time to live for remote lookups. Negative results (None) are
+# cached as well so that unknown keys do not cause a remote call for every record.
+class LRUCache:
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 300):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # Returns a (found, value) tuple and updates the hit/miss counters
+    def get(self, key) -> tuple:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+        if entry is not None:
+            del self._entries[key]
+        self.misses += 1
+        return False, None
+
+    def put(self, key, value) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+# Reference data snapshot stored as newline delimited JSON and memory-mapped from /tmp. Only an index of
+# key -> (offset, length) is kept on the Python heap, the documents are parsed from the mapping on lookup.
+class ReferenceSnapshot:
+    def __init__(self, path: str, key_field: str):
+        self.path = path
+        self.loaded_at = time.monotonic()
+        self._index = {}
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(self._file.fileno()).st_size else None
+        self._build_index(key_field)
+
+    def _build_index(self, key_field: str) -> None:
+        if self._mmap is None:
+            return
+        offset = 0
+        for line in iter(self._mmap.readline, b""):
+            stripped = line.strip()
+            if stripped:
+                document = json.loads(stripped)
+                if key_field in document:
+                    self._index[str(document[key_field])] = (offset, len(line))
+            offset += len(line)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key) -> bool:
+        return str(key) in self._index
+
+    # Returns the reference document for the key or None if the key is not part of the snapshot
+    def get(self, key):
+        position = self._index.get(str(key))
+        if position is None:
+            return None
+        offset, length = position
+        return json.loads(self._mmap[offset:offset + length])
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+
+# Downloads the snapshot from S3 ("s3://bucket/key") or copies it from a local path
+def download_snapshot(source: str, destination: str) -> None:
+    parsed = urlparse(source)
+    if parsed.scheme == "s3":
+        import boto3
+        boto3.client("s3").download_file(parsed.netloc, parsed.path.lstrip("/"), destination)
+    else:
+        shutil.copyfile(parsed.path if parsed.scheme == "file" else source, destination)
+
+
+# DynamoDB returns numbers as Decimal and sets as set, neither can be serialized to JSON. Numbers are converted to
+# int or float and sets to lists (recursively for maps and lists).
+def from_dynamodb_value(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, dict):
+        return {k: from_dynamodb_value(v) for k, v in value.items()}
+    if isinstance(value, (list, set)):
+        return [from_dynamodb_value(v) for v in value]
+    return value
+
+
+# Remote lookup of reference documents in a DynamoDB table, keys are fetched with BatchGetItem
+class DynamoDBReferenceLookup:
+    def __init__(self, table_name: str, key_attribute: str, max_attempts: int = 3, client=None):
+        from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+        self.table_name = table_name
+        self.key_attribute = key_attribute
+        self.max_attempts = max_attempts
+        self._client = client
+        self._serializer = TypeSerializer()
+        self._deserializer = TypeDeserializer()
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("dynamodb")
+        return self._client
+
+    # Drops the client, e.g. after a SnapStart restore, the next lookup creates a new one with fresh connections
+    def reset(self) -> None:
+        self._client = None
+
+    def _deserialize(self, item: dict) -> dict:
+        return {name: from_dynamodb_value(self._deserializer.deserialize(value)) for name, value in item.items()}
+
+    # Returns (documents, unprocessed): a dict of key -> document for all keys found in the table, and the keys that
+    # were still unprocessed (throttled) after max_attempts. Unprocessed keys are unknown, not absent from the table.
+    def lookup_many(self, keys: list) -> tuple:
+        found, unprocessed = {}, []
+        for start in range(0, len(keys), DYNAMODB_BATCH_GET_LIMIT):
+            request = {self.table_name: {"Keys": [{self.key_attribute: self._serializer.serialize(key)} for key in keys[start:start + DYNAMODB_BATCH_GET_LIMIT]]}}
+            for attempt in range(self.max_attempts):
+                response = self.client.batch_get_item(RequestItems=request)
+                for item in response.get("Responses", {}).get(self.table_name, []):
+                    document = self._deserialize(item)
+                    found[str(document[self.key_attribute])] = document
+                request = response.get("UnprocessedKeys") or {}
+                if not request:
+                    break
+                if attempt < self.max_attempts - 1:
+                    time.sleep(0.05 * 2 ** attempt)
+            if request:
+                unprocessed.extend(str(self._deserialize(key)[self.key_attribute]) for key in request[self.table_name]["Keys"])
+        if unprocessed:
+            logger.warning("Reference keys were not processed by DynamoDB", extra={"unprocessed_keys": len(unprocessed)})
+        return found, unprocessed
+
+
+# Enriches decoded records with reference data. Keys are resolved from the memory-mapped snapshot first,
+# then from the LRU cache and finally from the remote lookup, which is called once per batch for all
+# remaining keys. Instances are meant to be created at module level so that they survive warm invocations.
+class ReferenceDataEnricher:
+    def __init__(
+        self,
+        key_field: str,
+        target_field: str = "reference",
+        snapshot_source: str = None,
+        snapshot_key_field: str = "id",
+        snapshot_ttl_seconds: float = 300,
+        snapshot_path: str = SNAPSHOT_PATH,
+        remote_lookup=None,
+        cache: LRUCache = None,
+    ):
+        self.key_field = key_field
+        self.target_field = target_field
+        self.snapshot_source = snapshot_source
+        self.snapshot_key_field = snapshot_key_field
+        self.snapshot_ttl_seconds = snapshot_ttl_seconds
+        self.snapshot_path = snapshot_path
+        self.remote_lookup = remote_lookup
+        self.cache = cache if cache is not None else LRUCache()
+        self.snapshot = None
+        self._refresh_thread = None
+        self._refresh_lock = threading.Lock()
+
+    # Downloads the snapshot into a temporary file, maps it and swaps it in. The previous mapping is not closed
+    # explicitly, it stays valid for readers still holding it and is released once it is garbage collected.
+    def load_snapshot(self) -> None:
+        temporary_path = f"{self.snapshot_path}.{os.getpid()}.{threading.get_ident()}"
+        download_snapshot(self.snapshot_source, temporary_path)
+        os.replace(temporary_path, self.snapshot_path)
+        self.snapshot = ReferenceSnapshot(self.snapshot_path, self.snapshot_key_field)
+        logger.info("Loaded reference snapshot", extra={"source": self.snapshot_source, "keys": len(self.snapshot)})
+
+    def _refresh(self) -> None:
+        try:
+            self.load_snapshot()
+        except Exception:
+            logger.exception("Failed to refresh reference snapshot, keeping the previous one")
+            # Back off for another TTL instead of retrying on every invocation
+            self.snapshot.loaded_at = time.monotonic()
+        finally:
+            self._refresh_thread = None
+
+    # Loads the snapshot synchronously if there is none yet, otherwise refreshes it in a background thread once the TTL expired
+    def ensure_snapshot(self) -> None:
+        if not self.snapshot_source:
+            return
+        if self.snapshot is None:
+            self.load_snapshot()
+        elif time.monotonic() - self.snapshot.loaded_at > self.snapshot_ttl_seconds:
+            with self._refresh_lock:
+                if self._refresh_thread is None:
+                    self._refresh_thread = threading.Thread(target=self._refresh, daemon=True)
+                    self._refresh_thread.start()
+
+    # Resets the enricher after a SnapStart restore: the snapshot loaded before the SnapStart snapshot may be old, it is
+    # refreshed in the background by the next batch, and the remote lookup gets new connections
+    def reset(self) -> None:
+        if self.snapshot is not None:
+            self.snapshot.loaded_at = time.monotonic() - self.snapshot_ttl_seconds - 1
+        if self.remote_lookup is not None and hasattr(self.remote_lookup, "reset"):
+            self.remote_lookup.reset()
+
+    # Resolves the reference documents for the given keys, returns (documents, statistics)
+    def resolve(self, keys: set) -> tuple:
+        documents = {}
+        statistics = {"snapshot_hits": 0, "cache_hits": 0, "remote_lookups": 0}
+        missing = []
+        # A background refresh may swap the snapshot, so the whole batch is resolved against the same one
+        snapshot = self.snapshot
+        for key in keys:
+            if snapshot is not None and key in snapshot:
+                documents[key] = snapshot.get(key)
+                statistics["snapshot_hits"] += 1
+                continue
+            found, document = self.cache.get(key)
+            if found:
+                documents[key] = document
+                statistics["cache_hits"] += 1
+            else:
+                missing.append(key)
+
+        if missing and self.remote_lookup is not None:
+            remote_documents, unprocessed = self.remote_lookup.lookup_many(missing)
+            unprocessed = set(unprocessed)
+            statistics["remote_lookups"] = len(missing)
+            for key in missing:
+                documents[key] = remote_documents.get(key)
+                # Keys the lookup could not process are not cached, the next batch looks them up again
+                if key not in unprocessed:
+                    self.cache.put(key, documents[key])
+        return documents, statistics
+
+    # Adds the reference document under the target field to every decoded value that contains the key field
+    def enrich_all(self, values: list) -> dict:
+        self.ensure_snapshot()
+        keys = {str(value[self.key_field]) for value in values if isinstance(value, dict) and self.key_field in value}
+        documents, statistics = self.resolve(keys)
+        for value in values:
+            if isinstance(value, dict) and self.key_field in value:
+                value[self.target_field] = documents.get(str(value[self.key_field]))
+        return statistics
+
+
+# Creates the enricher from the ENRICHMENT_* environment variables or returns None if enrichment is not configured
+def create_enricher_from_environment(environment=os.environ):
+    key_field = environment.get("ENRICHMENT_KEY_FIELD")
+    if not key_field:
+        return None
+    remote_lookup = None
+    if environment.get("ENRICHMENT_TABLE_NAME"):
+        remote_lookup = DynamoDBReferenceLookup(environment["ENRICHMENT_TABLE_NAME"], environment.get("ENRICHMENT_TABLE_KEY", "id"))
+    return ReferenceDataEnricher(
+        key_field=key_field,
+        target_field=environment.get("ENRICHMENT_TARGET_FIELD", "reference"),
+        snapshot_source=environment.get("ENRICHMENT_SNAPSHOT_URI"),
+        snapshot_key_field=environment.get("ENRICHMENT_SNAPSHOT_KEY_FIELD", "id"),
+        snapshot_ttl_seconds=float(environment.get("ENRICHMENT_SNAPSHOT_TTL_SECONDS", 300)),
+        remote_lookup=remote_lookup,
+        cache=LRUCache(
+            max_size=int(environment.get("ENRICHMENT_CACHE_SIZE", 10000)),
+            ttl_seconds=float(environment.get("ENRICHMENT_CACHE_TTL_SECONDS", 300)),
+        ),
+    )
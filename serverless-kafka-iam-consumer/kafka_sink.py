@@ -0,0 +1,127 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import os
+
+from aws_lambda_powertools import Logger
+
+logger = Logger(child=True)
+
+# Headers added to every output record so that downstream consumers can trace it back to its source record
+SOURCE_TOPIC_HEADER = "source-topic"
+SOURCE_PARTITION_HEADER = "source-partition"
+SOURCE_OFFSET_HEADER = "source-offset"
+
+
+# Returns the kafka-python settings to authenticate against MSK with IAM through SASL/OAUTHBEARER.
+# kafka-python and aws-msk-iam-sasl-signer-python are provided by an additional layer (see "function_output_layer_arn").
+def iam_client_config(region: str) -> dict:
+    from aws_msk_iam_sasl_signer import MSKAuthTokenProvider
+    try:
+        from kafka.sasl.oauth import AbstractTokenProvider
+    except ImportError:
+        from kafka.oauth.abstract import AbstractTokenProvider
+
+    class MSKTokenProvider(AbstractTokenProvider):
+        def token(self):
+            token, _ = MSKAuthTokenProvider.generate_auth_token(region)
+            return token
+
+    return {
+        "security_protocol": "SASL_SSL",
+        "sasl_mechanism": "OAUTHBEARER",
+        "sasl_oauth_token_provider": MSKTokenProvider(),
+    }
+
+
+# Creates a KafkaProducer (kafka-python) that authenticates against MSK with IAM
+def create_iam_producer(bootstrap_servers: str, region: str, **producer_config):
+    from kafka import KafkaProducer
+
+    config = {
+        "acks": "all",
+        # A single in-flight request per connection keeps the order of the records of a source partition
+        "max_in_flight_requests_per_connection": 1,
+        "linger_ms": 5,
+        "retries": 5,
+        "client_id": os.environ.get("AWS_LAMBDA_FUNCTION_NAME", "ServerlessKafkaConsumer"),
+    }
+    config.update(producer_config)
+    return KafkaProducer(bootstrap_servers=bootstrap_servers.split(","), **iam_client_config(region), **config)
+
+
+# Creates a KafkaConsumer (kafka-python) that authenticates against MSK with IAM, e.g. to read offset ranges for a replay.
+# It does not join a consumer group and does not commit offsets, so the event source mapping is not affected.
+def create_iam_consumer(bootstrap_servers: str, region: str, **consumer_config):
+    from kafka import KafkaConsumer
+
+    config = {"group_id": None, "enable_auto_commit": False}
+    config.update(consumer_config)
+    return KafkaConsumer(bootstrap_servers=bootstrap_servers.split(","), **iam_client_config(region), **config)
+
+
+# Output record of the consume-transform-produce mode. The source coordinates are kept so the output
+# can be produced in source order and traced back to the record it was derived from.
+class OutputRecord:
+    def __init__(self, value: bytes, key: bytes = None, source_topic: str = None, source_partition: int = None, source_offset: int = None):
+        self.value = value
+        self.key = key
+        self.source_topic = source_topic
+        self.source_partition = source_partition
+        self.source_offset = source_offset
+
+    def headers(self) -> list:
+        if self.source_topic is None:
+            return []
+        return [
+            (SOURCE_TOPIC_HEADER, self.source_topic.encode("utf-8")),
+            (SOURCE_PARTITION_HEADER, str(self.source_partition).encode("utf-8")),
+            (SOURCE_OFFSET_HEADER, str(self.source_offset).encode("utf-8")),
+        ]
+
+
+# Writes the output records of an invocation to the output topic. The producer is created on first use and
+# reused by all warm invocations of the container. All records of a batch are sent before a single flush;
+# if any of them fails the exception is raised, so the invocation fails and the event source mapping
+# retries the batch instead of moving the source partition past records that were not written.
+class KafkaOutputSink:
+    def __init__(self, topic: str, producer_factory, flush_timeout_seconds: float = 30):
+        self.topic = topic
+        self.producer_factory = producer_factory
+        self.flush_timeout_seconds = flush_timeout_seconds
+        self._producer = None
+
+    @property
+    def producer(self):
+        if self._producer is None:
+            logger.info("Connecting output producer to kafka cluster", extra={"topic": self.topic})
+            self._producer = self.producer_factory()
+        return self._producer
+
+    # Sends the records in source order, flushes once and returns the metadata of the written records
+    def write_batch(self, records: list) -> list:
+        ordered = sorted(records, key=lambda r: (r.source_topic or "", r.source_partition or 0, r.source_offset or 0))
+        futures = [self.producer.send(self.topic, value=record.value, key=record.key, headers=record.headers()) for record in ordered]
+        self.producer.flush(timeout=self.flush_timeout_seconds)
+        return [future.get(timeout=self.flush_timeout_seconds) for future in futures]
+
+    # Closes the producer, e.g. when the runtime shuts down
+    def close(self) -> None:
+        if self._producer is not None:
+            self._producer.close(timeout=self.flush_timeout_seconds)
+            self._producer = None
+
+
+# Creates the output sink from the OUTPUT_* environment variables or returns None if no output topic is configured
+def create_sink_from_environment(environment=os.environ):
+    topic = environment.get("OUTPUT_TOPIC_NAME")
+    if not topic:
+        return None
+    bootstrap_servers = environment.get("BOOTSTRAP_SERVER")
+    if not bootstrap_servers:
+        raise ValueError("OUTPUT_TOPIC_NAME requires BOOTSTRAP_SERVER, the bootstrap server of the cluster")
+    region = environment.get("AWS_REGION", "eu-central-1")
+    return KafkaOutputSink(
+        topic=topic,
+        producer_factory=lambda: create_iam_producer(bootstrap_servers, region, linger_ms=int(environment.get("OUTPUT_LINGER_MS", 5))),
+        flush_timeout_seconds=float(environment.get("OUTPUT_FLUSH_TIMEOUT_SECONDS", 30)),
+    )
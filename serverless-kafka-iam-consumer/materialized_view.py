@@ -0,0 +1,203 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import base64
+import json
+import mmap
+import os
+import struct
+import time
+
+from aws_lambda_powertools import Logger
+
+from record_keys import record_key
+
+logger = Logger(child=True)
+
+# Location of the view snapshot in the Lambda's ephemeral storage
+SNAPSHOT_PATH = "/tmp/latest-value-view.bin"
+
+# Snapshot layout: magic, length of the JSON header (applied offsets), header, then one entry per key:
+# key length, value length, key bytes, value bytes. All integers are unsigned 32 bit little endian.
+SNAPSHOT_MAGIC = b"LVV1"
+LENGTH = struct.Struct("<I")
+ENTRY_HEADER = struct.Struct("<II")
+
+# Marks a key deleted by a tombstone since the snapshot was loaded
+_DELETED = object()
+
+
+# Keeps the latest value of every key of the consumed partitions. Values loaded from a snapshot stay in the
+# memory-mapped file, only an index and the updates applied since then are held on the Python heap.
+# The view only sees the batches delivered to this execution environment, partitions where offsets were
+# skipped (processed by another environment) are reported as gaps.
+class LatestValueView:
+    def __init__(self, snapshot_path: str = SNAPSHOT_PATH):
+        self.snapshot_path = snapshot_path
+        self.offsets = {}
+        self.gaps = 0
+        self._index = {}
+        self._overlay = {}
+        self._mmap = None
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def keys(self) -> set:
+        keys = set(self._index)
+        for key, value in self._overlay.items():
+            if value is _DELETED:
+                keys.discard(key)
+            else:
+                keys.add(key)
+        return keys
+
+    # Returns the latest value (bytes) of the key or None if the key is unknown or was deleted
+    def get(self, key):
+        key = key.encode("utf-8") if isinstance(key, str) else key
+        value = self._overlay.get(key)
+        if value is _DELETED:
+            return None
+        if value is not None:
+            return value
+        position = self._index.get(key)
+        if position is None:
+            return None
+        return self._mmap[position[0]:position[0] + position[1]]
+
+    # Returns the latest value decoded as JSON
+    def get_json(self, key):
+        value = self.get(key)
+        return json.loads(value) if value is not None else None
+
+    # Applies the records of one topic partition. Offsets that were already applied (redeliveries or records
+    # covered by the snapshot) are skipped, records without value are tombstones and delete the key. Salted hot keys
+    # are applied to their key.
+    def apply(self, topic_partition: str, records: list) -> int:
+        applied = 0
+        last_offset = self.offsets.get(topic_partition)
+        for record in records:
+            if last_offset is not None and record["offset"] <= last_offset:
+                continue
+            if last_offset is not None and record["offset"] > last_offset + 1:
+                self.gaps += 1
+                logger.warning("Offset gap in latest value view", extra={"partition": topic_partition, "expected": last_offset + 1, "received": record["offset"]})
+            key = record_key(record)
+            if key:
+                self._overlay[key] = base64.b64decode(record["value"]) if record.get("value") else _DELETED
+                applied += 1
+            last_offset = record["offset"]
+        if last_offset is not None:
+            self.offsets[topic_partition] = last_offset
+        return applied
+
+    # Writes the view to the snapshot file (atomically through a temporary file)
+    def write_snapshot(self) -> None:
+        temporary_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        header = json.dumps({"offsets": self.offsets}).encode("utf-8")
+        with open(temporary_path, "wb") as snapshot:
+            snapshot.write(SNAPSHOT_MAGIC + LENGTH.pack(len(header)) + header)
+            for key in sorted(self.keys()):
+                value = self.get(key)
+                snapshot.write(ENTRY_HEADER.pack(len(key), len(value)) + key + value)
+        os.replace(temporary_path, self.snapshot_path)
+        # Map the new snapshot so that the updates no longer need to be kept on the heap
+        self.load_snapshot()
+
+    # Maps the snapshot file and indexes its entries, returns False if there is no snapshot. Raises ValueError if the
+    # file is not a complete snapshot, the view is then unchanged.
+    def load_snapshot(self) -> bool:
+        if not os.path.exists(self.snapshot_path):
+            return False
+        # The mapping stays valid after the file is closed (an empty file cannot be mapped)
+        with open(self.snapshot_path, "rb") as snapshot_file:
+            if os.fstat(snapshot_file.fileno()).st_size < len(SNAPSHOT_MAGIC) + LENGTH.size:
+                raise ValueError(f"{self.snapshot_path} is not a latest value view snapshot")
+            snapshot = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            offsets, index = self._read_snapshot(snapshot)
+        except Exception:
+            snapshot.close()
+            raise
+
+        # Values returned from the previous mapping are copies, it can be closed
+        self.close()
+        self._mmap, self._index, self._overlay = snapshot, index, {}
+        self.offsets = offsets
+        return True
+
+    # Returns the applied offsets and the key index of a mapped snapshot
+    def _read_snapshot(self, snapshot: mmap.mmap):
+        if snapshot[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{self.snapshot_path} is not a latest value view snapshot")
+        try:
+            position = len(SNAPSHOT_MAGIC)
+            (header_length,) = LENGTH.unpack_from(snapshot, position)
+            position += LENGTH.size
+            header = json.loads(snapshot[position:position + header_length])
+            position += header_length
+
+            index = {}
+            while position < len(snapshot):
+                key_length, value_length = ENTRY_HEADER.unpack_from(snapshot, position)
+                position += ENTRY_HEADER.size
+                if position + key_length + value_length > len(snapshot):
+                    raise ValueError("entry exceeds the end of the file")
+                key = snapshot[position:position + key_length]
+                index[key] = (position + key_length, value_length)
+                position += key_length + value_length
+            return header["offsets"], index
+        except (struct.error, KeyError, ValueError) as e:
+            raise ValueError(f"{self.snapshot_path} is a truncated latest value view snapshot: {e}") from e
+
+    # Releases the mapping of the snapshot, values loaded from it are no longer available
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._index = {}
+
+
+# Keeps a view up to date and snapshots it periodically to /tmp, so that the view of the execution environment is
+# restored after a cold start of the function (e.g. a crash) and only the offsets after the snapshot are applied.
+# Snapshots are not shared between execution environments, each one holds only the partitions its batches covered.
+class SnapshottingView:
+    def __init__(self, view: LatestValueView, interval_seconds: float = 60):
+        self.view = view
+        self.interval_seconds = interval_seconds
+        self.last_snapshot_at = time.monotonic()
+
+    # Loads the snapshot from /tmp, a snapshot that cannot be read (e.g. truncated by a crash) is ignored
+    def restore(self) -> bool:
+        try:
+            restored = self.view.load_snapshot()
+        except ValueError:
+            logger.exception("The latest value view snapshot could not be read, starting empty")
+            return False
+        if restored:
+            logger.info("Restored latest value view", extra={"keys": len(self.view), "offsets": self.view.offsets})
+        return restored
+
+    # Applies the batches of an event and writes a snapshot once the interval has passed
+    def apply_event(self, event: dict) -> int:
+        applied = sum(self.view.apply(topic_partition, records) for topic_partition, records in event.get("records", {}).items())
+        if time.monotonic() - self.last_snapshot_at >= self.interval_seconds:
+            self.snapshot()
+        return applied
+
+    def snapshot(self) -> None:
+        self.view.write_snapshot()
+        self.last_snapshot_at = time.monotonic()
+        logger.info("Wrote latest value view snapshot", extra={"keys": len(self.view), "offsets": self.view.offsets})
+
+
+# Creates the view from the VIEW_* environment variables or returns None if the view is not enabled
+def create_view_from_environment(environment=os.environ):
+    if environment.get("VIEW_ENABLED", "no") != "yes":
+        return None
+    return SnapshottingView(
+        LatestValueView(),
+        interval_seconds=float(environment.get("VIEW_SNAPSHOT_INTERVAL_SECONDS", 60)),
+    )
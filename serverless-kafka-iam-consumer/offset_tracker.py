@@ -0,0 +1,55 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import bisect
+
+from aws_lambda_powertools import Logger
+
+logger = Logger(child=True)
+
+# Classifications of a batch relative to the last offset seen for its partition
+FIRST = "first"
+CONTIGUOUS = "contiguous"
+GAPPED = "gapped"
+OVERLAPPING = "overlapping"
+
+
+# Tracks the last offset seen per topic partition in the memory of the execution environment and classifies every
+# batch: contiguous (starts right after the last offset), gapped (offsets were skipped) or overlapping (records that
+# were already seen are delivered again, e.g. because a failed batch is retried). Batches of a partition can be
+# delivered to several execution environments, so gaps only mean that this environment did not see the offsets,
+# and compacted topics or transaction markers cause gaps as well. Overlaps are redeliveries.
+class PartitionOffsetTracker:
+    def __init__(self):
+        self.last_offsets = {}
+
+    # Classifies the batch of a topic partition and returns (classification, size). The size is the number of skipped
+    # offsets for gapped batches and the number of redelivered records for overlapping batches.
+    def track(self, topic_partition: str, records: list) -> tuple:
+        if not records:
+            return CONTIGUOUS, 0
+        offsets = [record["offset"] for record in records]
+        first, last = offsets[0], offsets[-1]
+        previous = self.last_offsets.get(topic_partition)
+        self.last_offsets[topic_partition] = max(last, previous) if previous is not None else last
+        if previous is None:
+            return FIRST, 0
+        if first <= previous:
+            # The records of a batch are ordered by offset, the redelivered ones are those up to the last offset seen
+            return OVERLAPPING, bisect.bisect_right(offsets, previous)
+        if first > previous + 1:
+            return GAPPED, first - previous - 1
+        return CONTIGUOUS, 0
+
+    # Tracks all batches of an event and returns the counts per classification and the skipped and redelivered records
+    def track_event(self, event: dict) -> dict:
+        statistics = {FIRST: 0, CONTIGUOUS: 0, GAPPED: 0, OVERLAPPING: 0, "skipped_offsets": 0, "redelivered_records": 0}
+        for topic_partition, records in event.get("records", {}).items():
+            classification, size = self.track(topic_partition, records)
+            statistics[classification] += 1
+            if classification == GAPPED:
+                statistics["skipped_offsets"] += size
+                logger.info("Offsets skipped since the last batch", extra={"partition": topic_partition, "skipped": size, "first_offset": records[0]["offset"]})
+            elif classification == OVERLAPPING:
+                statistics["redelivered_records"] += size
+                logger.warning("Batch redelivers records", extra={"partition": topic_partition, "redelivered": size, "first_offset": records[0]["offset"]})
+        return statistics
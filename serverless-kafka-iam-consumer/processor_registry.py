@@ -0,0 +1,72 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import os
+
+from aws_lambda_powertools import Logger
+
+logger = Logger(child=True)
+
+# Name of the processor used for topics without an explicit mapping
+DEFAULT_PROCESSOR = "default"
+
+
+# Parses the topic to processor mapping, e.g. "orders=records,metrics=columnar"
+def parse_topic_processors(value: str) -> dict:
+    topic_processors = {}
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        topic, separator, processor = entry.partition("=")
+        if not separator or not topic.strip() or not processor.strip():
+            raise ValueError(f"Invalid topic processor mapping '{entry}', expected <topic>=<processor>")
+        topic_processors[topic.strip()] = processor.strip()
+    return topic_processors
+
+
+# Splits the "<topic>-<partition>" key of a batch in the event, topic names may contain dashes themselves
+def split_topic_partition(topic_partition: str) -> tuple:
+    topic, _, partition = topic_partition.rpartition("-")
+    return topic, int(partition)
+
+
+# Registry of the processors the batches of an event are dispatched to. Processors are functions taking the records
+# of one topic partition and the Lambda context and returning the number of processed records. They are registered
+# by name, topics are mapped to processor names and topics without a mapping use the default processor.
+class ProcessorRegistry:
+    def __init__(self, default_processor: str = DEFAULT_PROCESSOR):
+        self.default_processor = default_processor
+        self.topic_processors = {}
+        self._processors = {}
+
+    # Decorator registering a processor under the given name
+    def register(self, name: str):
+        def decorator(function):
+            self._processors[name] = function
+            return function
+        return decorator
+
+    def names(self) -> list:
+        return sorted(self._processors)
+
+    # Maps topics to processors. Unknown processor names fail the initialization instead of the first invocation.
+    def assign(self, topic_processors: dict) -> None:
+        unknown = {processor for processor in topic_processors.values() if processor not in self._processors}
+        if unknown:
+            raise ValueError(f"Unknown processors {sorted(unknown)}, registered processors are {self.names()}")
+        self.topic_processors = dict(topic_processors)
+
+    def processor_for(self, topic: str):
+        return self._processors[self.topic_processors.get(topic, self.default_processor)]
+
+    # Dispatches every topic partition batch of the event to the processor of its topic, returns the number of processed records
+    def dispatch(self, event: dict, context) -> int:
+        processed = 0
+        for topic_partition, records in event.get("records", {}).items():
+            topic = records[0]["topic"] if records else split_topic_partition(topic_partition)[0]
+            processed += self.processor_for(topic)(records, context)
+        return processed
+
+
+# Creates the topic mapping from the TOPIC_PROCESSORS environment variable
+def topic_processors_from_environment(environment=os.environ) -> dict:
+    return parse_topic_processors(environment.get("TOPIC_PROCESSORS", ""))
@@ -0,0 +1,176 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import math
+import os
+import threading
+import time
+
+from aws_lambda_powertools import Logger
+
+logger = Logger(child=True)
+
+
+# Raised if the tokens for a batch cannot be acquired before the deadline. Failing the invocation makes
+# the event source mapping retry the batch later, which applies backpressure to the consumer.
+class RateLimitExceededError(Exception):
+    pass
+
+
+# Token bucket state kept in memory. Shared by all threads of one process, used for local tests and
+# for functions that only need to limit a single execution environment.
+class InMemoryTokenStore:
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.calls = 0
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    # Atomically refills the bucket and takes up to "requested" tokens, returns the number of tokens taken
+    def take(self, bucket: str, requested: int, rate: float, capacity: float) -> int:
+        with self._lock:
+            self.calls += 1
+            now = self.clock()
+            tokens, updated_at = self._buckets.get(bucket, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            granted = min(requested, math.floor(tokens))
+            self._buckets[bucket] = (tokens - granted, now)
+            return granted
+
+
+# Token bucket state kept in a DynamoDB table (partition key "bucket") and shared by all concurrent
+# instances of the function. Updates use optimistic locking on a version attribute.
+class DynamoDBTokenStore:
+    def __init__(self, table_name: str, client=None, max_attempts: int = 5):
+        self.table_name = table_name
+        self.max_attempts = max_attempts
+        self.calls = 0
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client("dynamodb")
+        return self._client
+
+    # Drops the client, the next call creates a new one with fresh connections and credentials
+    def reset(self) -> None:
+        self._client = None
+
+    def take(self, bucket: str, requested: int, rate: float, capacity: float) -> int:
+        for _ in range(self.max_attempts):
+            self.calls += 1
+            item = self.client.get_item(TableName=self.table_name, Key={"bucket": {"S": bucket}}, ConsistentRead=True).get("Item")
+            now = time.time()
+            if item:
+                version = int(item["version"]["N"])
+                tokens = min(capacity, float(item["tokens"]["N"]) + (now - float(item["updated_at"]["N"])) * rate)
+            else:
+                version, tokens = 0, capacity
+            granted = min(requested, math.floor(tokens))
+            try:
+                self.client.update_item(
+                    TableName=self.table_name,
+                    Key={"bucket": {"S": bucket}},
+                    # "bucket" is a reserved word, all attribute names are aliased
+                    UpdateExpression="SET #tokens = :tokens, #updated_at = :now, #version = :next",
+                    ConditionExpression="attribute_not_exists(#bucket) OR #version = :version",
+                    ExpressionAttributeNames={"#bucket": "bucket", "#tokens": "tokens", "#updated_at": "updated_at", "#version": "version"},
+                    ExpressionAttributeValues={
+                        ":tokens": {"N": str(tokens - granted)},
+                        ":now": {"N": str(now)},
+                        ":next": {"N": str(version + 1)},
+                        ":version": {"N": str(version)},
+                    },
+                )
+                return granted
+            except self.client.exceptions.ConditionalCheckFailedException:
+                continue
+        return 0
+
+
+# Token bucket rate limiter shared through a store. Tokens are leased from the store in chunks of at least
+# "lease_size" and cached locally, so a batch does not need one store call per record. Leased tokens that
+# are not used within "lease_ttl_seconds" are dropped, so idle instances cannot hoard a burst.
+class TokenBucketRateLimiter:
+    def __init__(
+        self,
+        store,
+        bucket: str,
+        rate_per_second: float,
+        capacity: float = None,
+        lease_size: int = 50,
+        lease_ttl_seconds: float = 1.0,
+        sleep=time.sleep,
+        clock=time.monotonic,
+    ):
+        self.store = store
+        self.bucket = bucket
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity if capacity is not None else rate_per_second
+        self.lease_size = lease_size
+        self.lease_ttl_seconds = lease_ttl_seconds
+        self.sleep = sleep
+        self.clock = clock
+        self.waited_seconds = 0.0
+        self._local_tokens = 0
+        self._lease_expires_at = 0.0
+
+    # Drops the leased tokens and resets the store, e.g. after a SnapStart restore where the lease of the snapshot is stale
+    def reset(self) -> None:
+        self._local_tokens = 0
+        self._lease_expires_at = 0.0
+        self.store.reset()
+
+    def _take_local(self, requested: int) -> int:
+        if self.clock() >= self._lease_expires_at:
+            self._local_tokens = 0
+        granted = min(requested, self._local_tokens)
+        self._local_tokens -= granted
+        return granted
+
+    def _lease(self, needed: int) -> None:
+        leased = self.store.take(self.bucket, max(needed, self.lease_size), self.rate_per_second, self.capacity)
+        if leased:
+            self._local_tokens += leased
+            self._lease_expires_at = self.clock() + self.lease_ttl_seconds
+
+    # Acquires tokens for "requested" records before the deadline (time.monotonic() based). With partial=False
+    # all tokens are acquired (slowing down until they are available), with partial=True the call returns as
+    # soon as at least one token is available and the caller shrinks its batch to the returned number.
+    def acquire(self, requested: int, deadline: float, partial: bool = False) -> int:
+        granted = self._take_local(requested)
+        while granted < requested:
+            self._lease(requested - granted)
+            granted += self._take_local(requested - granted)
+            if granted >= requested or (partial and granted):
+                break
+            # Wait for the bucket to refill the missing tokens, at most until the deadline
+            wait = min((requested - granted) / self.rate_per_second, max(self.lease_ttl_seconds, 0.01))
+            if self.clock() + wait >= deadline:
+                # Tokens that were acquired but cannot be used are given up, they expire with the lease
+                self._local_tokens += granted
+                raise RateLimitExceededError(f"Could not acquire {requested} tokens for bucket {self.bucket} before the deadline")
+            self.sleep(wait)
+            self.waited_seconds += wait
+        return granted
+
+
+# Creates the rate limiter from the RATE_LIMIT_* environment variables or returns None if no rate is configured.
+# A rate of 0 disables the rate limiter and a burst of 0 uses the default burst.
+def create_rate_limiter_from_environment(environment=os.environ):
+    rate = environment.get("RATE_LIMIT_PER_SECOND")
+    if not rate or float(rate) <= 0:
+        return None
+    store = DynamoDBTokenStore(environment["RATE_LIMIT_TABLE_NAME"]) if environment.get("RATE_LIMIT_TABLE_NAME") else InMemoryTokenStore()
+    return TokenBucketRateLimiter(
+        store=store,
+        bucket=environment.get("RATE_LIMIT_BUCKET", environment.get("AWS_LAMBDA_FUNCTION_NAME", "ServerlessKafkaConsumer")),
+        rate_per_second=float(rate),
+        capacity=float(environment["RATE_LIMIT_BURST"]) if environment.get("RATE_LIMIT_BURST") and float(environment["RATE_LIMIT_BURST"]) > 0 else None,
+        lease_size=int(environment.get("RATE_LIMIT_LEASE_SIZE", 50)),
+    )
@@ -0,0 +1,24 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import base64
+
+from trace_context import record_header
+
+# Record header written by the producer (HotKeyDetector.SALT_HEADER) with the salt of a salted hot key
+SALT_HEADER = "X-Key-Salt"
+
+# Separator between the key and the salt of a salted key (HotKeyDetector.SALT_SEPARATOR)
+SALT_SEPARATOR = b"#"
+
+
+# Returns the key of a record as the producer received it, or None for records without key. The producer spreads the
+# records of hot keys over several partitions with salted keys ("<key>#<salt>" and the salt in a header), the salt is
+# removed so all records of a key are merged again, e.g. in the latest value view and in the output topic.
+def record_key(record: dict):
+    if not record.get("key"):
+        return None
+    key = base64.b64decode(record["key"])
+    salt = record_header(record, SALT_HEADER)
+    if salt is not None and key.endswith(SALT_SEPARATOR + salt):
+        return key[:-len(SALT_SEPARATOR + salt)]
+    return key
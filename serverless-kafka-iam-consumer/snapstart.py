@@ -0,0 +1,30 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import os
+
+from aws_lambda_powertools import Logger
+
+logger = Logger(child=True)
+
+# The runtime hooks are provided by the Python runtimes that support SnapStart (3.12 and later)
+try:
+    from snapshot_restore_py import register_after_restore, register_before_snapshot
+except ImportError:
+    register_after_restore = register_before_snapshot = None
+
+
+# True if the function runs with SnapStart, Lambda sets AWS_LAMBDA_INITIALIZATION_TYPE to "snap-start" during the
+# initialization that is snapshotted
+def enabled(environment=os.environ) -> bool:
+    return register_before_snapshot is not None and environment.get("AWS_LAMBDA_INITIALIZATION_TYPE") == "snap-start"
+
+
+# Registers the hooks that run before the snapshot is taken and after an execution environment was restored from it.
+# Returns False (and registers nothing) if the function does not run with SnapStart.
+def register_hooks(before_snapshot, after_restore, environment=os.environ) -> bool:
+    if not enabled(environment):
+        return False
+    register_before_snapshot(before_snapshot)
+    register_after_restore(after_restore)
+    logger.info("Registered SnapStart runtime hooks")
+    return True
@@ -0,0 +1,120 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import functools
+import json
+import logging
+import queue
+import sys
+
+from aws_lambda_powertools.metrics import EphemeralMetrics, MetricUnit, SchemaValidationError
+
+
+# Writes telemetry documents (EMF metric documents) and formatted log lines to stdout, from where Lambda ships them
+# to CloudWatch Logs. Several lines are written with a single call.
+class StdoutWriter:
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def __call__(self, lines: list) -> None:
+        stream = self.stream or sys.stdout
+        stream.write("".join(line + "\n" for line in lines))
+        stream.flush()
+
+
+# Handler-side API for telemetry. Without an attached extension every document and log record is written directly,
+# during the invocation. Once the telemetry extension is attached, documents and log records are only put on an
+# in-memory queue, and the extension serializes and writes them after the response was returned.
+class TelemetryChannel:
+    def __init__(self, write=None):
+        self.write = write or StdoutWriter()
+        self.extension = None
+        self.queue = queue.SimpleQueue()
+        self.cold_start = True
+
+    @property
+    def buffered(self) -> bool:
+        return self.extension is not None and self.extension.running
+
+    def emit(self, document: dict) -> None:
+        if self.buffered:
+            self.queue.put(document)
+        else:
+            self.write([json.dumps(document, separators=(",", ":"))])
+
+    # Takes the metrics of the invocation from Powertools and emits them as one EMF document
+    def emit_metrics(self, metrics) -> None:
+        try:
+            document = metrics.serialize_metric_set()
+        except SchemaValidationError:
+            # No metrics were added during the invocation
+            return
+        metrics.clear_metrics()
+        self.emit(document)
+
+    # Emits the ColdStart metric like Powertools does, as its own document with the function_name dimension
+    def emit_cold_start_metric(self, metrics, context) -> None:
+        cold_start = EphemeralMetrics(namespace=metrics.namespace, service=metrics.service)
+        cold_start.add_dimension(name="function_name", value=context.function_name)
+        cold_start.add_metric(name="ColdStart", unit=MetricUnit.Count, value=1)
+        self.emit_metrics(cold_start)
+
+    # Returns all documents and log lines queued so far, log records are formatted here (by the draining thread)
+    def drain(self) -> list:
+        lines = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return lines
+            if isinstance(item, tuple):
+                handler, record = item
+                lines.append(handler.format(record))
+            else:
+                lines.append(json.dumps(item, separators=(",", ":")))
+
+    def flush(self) -> int:
+        lines = self.drain()
+        if lines:
+            self.write(lines)
+        return len(lines)
+
+    # Decorator for the handler that signals the end of the invocation to the extension, which then flushes the
+    # telemetry while the runtime returns the response. With metrics, the metrics of the invocation are emitted through
+    # the channel (also if the handler failed), replacing the log_metrics decorator of Powertools, which would write
+    # them directly and warn about the emptied metric set.
+    def flush_after_invocation(self, handler=None, metrics=None, capture_cold_start_metric: bool = False):
+        if handler is None:
+            return functools.partial(self.flush_after_invocation, metrics=metrics, capture_cold_start_metric=capture_cold_start_metric)
+
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            if metrics is not None and capture_cold_start_metric and self.cold_start:
+                self.emit_cold_start_metric(metrics, context)
+            self.cold_start = False
+            try:
+                return handler(event, context)
+            finally:
+                if metrics is not None:
+                    self.emit_metrics(metrics)
+                if self.buffered:
+                    self.extension.invocation_finished()
+        return wrapper
+
+
+# Logging handler routing the log records through the channel. Records are queued unformatted, so formatting and
+# serializing them does not happen during the invocation.
+class TelemetryLogHandler(logging.Handler):
+    def __init__(self, channel: TelemetryChannel):
+        super().__init__()
+        self.channel = channel
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.channel.buffered:
+                # The message is resolved now, arguments may change until the record is formatted
+                record.msg, record.args = record.getMessage(), None
+                self.channel.queue.put((self, record))
+            else:
+                self.channel.write([self.format(record)])
+        except Exception:
+            self.handleError(record)
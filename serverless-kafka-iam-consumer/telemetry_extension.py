@@ -0,0 +1,103 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import atexit
+import json
+import os
+import threading
+import time
+import urllib.request
+
+from aws_lambda_powertools import Logger
+
+logger = Logger(child=True)
+
+EXTENSION_NAME = "serverless-kafka-telemetry"
+
+
+# Client of the Lambda Extensions API (https://docs.aws.amazon.com/lambda/latest/dg/runtimes-extensions-api.html)
+class ExtensionsApiClient:
+    def __init__(self, runtime_api: str, timeout_seconds: float = None):
+        self.base_url = f"http://{runtime_api}/2020-01-01/extension"
+        self.timeout_seconds = timeout_seconds
+        self.identifier = None
+
+    # Registers an internal extension for INVOKE events (internal extensions do not receive SHUTDOWN events)
+    def register(self, name: str) -> str:
+        request = urllib.request.Request(f"{self.base_url}/register", method="POST", data=json.dumps({"events": ["INVOKE"]}).encode("utf-8"),
+                                         headers={"Lambda-Extension-Name": name, "Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            self.identifier = response.headers["Lambda-Extension-Identifier"]
+        return self.identifier
+
+    # Blocks until the next event. Calling it also tells Lambda that the extension finished the previous invocation.
+    def next_event(self) -> dict:
+        request = urllib.request.Request(f"{self.base_url}/event/next", headers={"Lambda-Extension-Identifier": self.identifier})
+        with urllib.request.urlopen(request, timeout=self.timeout_seconds) as response:
+            return json.loads(response.read())
+
+
+# Internal extension (a thread of the runtime process) that ships the telemetry of the channel after the response.
+# Lambda only freezes the execution environment once the runtime and all extensions are done with an invocation. On
+# an INVOKE event the extension waits until the handler signals the end of the invocation, flushes the channel while
+# the runtime returns the response, and only then asks for the next event. The remaining telemetry is flushed when the
+# process exits. If the extension cannot be registered, the channel keeps writing directly.
+class TelemetryExtension:
+    def __init__(self, channel, api_client: ExtensionsApiClient, name: str = EXTENSION_NAME):
+        self.channel = channel
+        self.api_client = api_client
+        self.name = name
+        self.running = False
+        self.flushes = 0
+        self._finished = threading.Event()
+        self._thread = None
+
+    # Registers the extension (during init, before the runtime asks for the first invocation) and starts its thread
+    def start(self) -> bool:
+        try:
+            self.api_client.register(self.name)
+        except Exception:
+            logger.exception("Could not register the telemetry extension, telemetry is written directly")
+            return False
+        self.channel.extension = self
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return True
+
+    def invocation_finished(self) -> None:
+        self._finished.set()
+
+    def _run(self) -> None:
+        try:
+            while self.running:
+                event = self.api_client.next_event()
+                if event.get("eventType") == "SHUTDOWN":
+                    break
+                # Wait for the handler, at most until the deadline of the invocation
+                timeout = max(0.0, event["deadlineMs"] / 1000 - time.time()) if event.get("deadlineMs") else None
+                self._finished.wait(timeout)
+                self._finished.clear()
+                self.flush()
+        except Exception:
+            logger.exception("Telemetry extension stopped, telemetry is written directly")
+        finally:
+            self.running = False
+            self.flush()
+
+    def flush(self) -> None:
+        if self.channel.flush():
+            self.flushes += 1
+
+    def stop(self) -> None:
+        self.running = False
+        self.flush()
+
+
+# Starts the extension for the channel if TELEMETRY_EXTENSION_ENABLED is "yes" and the function runs in Lambda,
+# returns None otherwise (the channel writes directly)
+def start_extension_from_environment(channel, environment=os.environ):
+    if environment.get("TELEMETRY_EXTENSION_ENABLED", "no") != "yes" or not environment.get("AWS_LAMBDA_RUNTIME_API"):
+        return None
+    extension = TelemetryExtension(channel, ExtensionsApiClient(environment["AWS_LAMBDA_RUNTIME_API"]))
+    return extension if extension.start() else None
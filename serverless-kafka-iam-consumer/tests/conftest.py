@@ -0,0 +1,58 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import base64
+import json
+import os
+import sys
+
+import pytest
+
+# Make the consumer modules (app.py and its stages) importable the same way the Lambda runtime does
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# Make the command line tools importable
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "tools")))
+
+# Powertools settings for running the handler outside of Lambda
+os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "1")
+os.environ.setdefault("POWERTOOLS_METRICS_NAMESPACE", "ServerlessKafka")
+os.environ.setdefault("POWERTOOLS_SERVICE_NAME", "ServerlessKafkaConsumer")
+
+
+# Builds a record in the format delivered by the MSK event source mapping
+def make_record(value, key="key", topic="ServerlessKafkaTopic", partition=0, offset=0) -> dict:
+    raw_value = value if isinstance(value, str) else json.dumps(value)
+    return {
+        "topic": topic,
+        "partition": partition,
+        "offset": offset,
+        "timestamp": 1690000000000,
+        "timestampType": "CREATE_TIME",
+        "key": base64.b64encode(key.encode("utf-8")).decode("utf-8"),
+        "value": base64.b64encode(raw_value.encode("utf-8")).decode("utf-8"),
+        "headers": [],
+    }
+
+
+# Builds an MSK event with one batch of records per topic partition
+def make_event(records: list) -> dict:
+    batches = {}
+    for record in records:
+        batches.setdefault(f"{record['topic']}-{record['partition']}", []).append(record)
+    return {"eventSource": "aws:kafka", "records": batches}
+
+
+# Minimal Lambda context for invoking the handler locally
+class LambdaContextStub:
+    function_name = "ServerlessKafkaConsumerLambda"
+    function_version = "$LATEST"
+    memory_limit_in_mb = 256
+    invoked_function_arn = "arn:aws:lambda:eu-central-1:123456789012:function:ServerlessKafkaConsumerLambda"
+    aws_request_id = "test-request-id"
+
+    def get_remaining_time_in_millis(self) -> int:
+        return 150000
+
+
+@pytest.fixture
+def lambda_context() -> LambdaContextStub:
+    return LambdaContextStub()
@@ -0,0 +1,75 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import zlib
+from collections import namedtuple
+
+# Metadata returned for a written record, mirrors kafka-python's RecordMetadata
+RecordMetadata = namedtuple("RecordMetadata", ["topic", "partition", "offset"])
+# Record stored in the local broker
+StoredRecord = namedtuple("StoredRecord", ["key", "value", "headers", "offset"])
+
+
+# In-memory stand-in for a Kafka cluster: topics with a fixed number of partitions holding their records
+class LocalBroker:
+    def __init__(self, partitions: int = 3):
+        self.partitions = partitions
+        self.topics = {}
+
+    def partition_for(self, key) -> int:
+        return zlib.crc32(key) % self.partitions if key else 0
+
+    def append(self, topic: str, key, value, headers) -> RecordMetadata:
+        partitions = self.topics.setdefault(topic, [[] for _ in range(self.partitions)])
+        partition = self.partition_for(key)
+        offset = len(partitions[partition])
+        partitions[partition].append(StoredRecord(key, value, headers, offset))
+        return RecordMetadata(topic, partition, offset)
+
+    def records(self, topic: str, partition: int = None) -> list:
+        partitions = self.topics.get(topic, [])
+        if partition is not None:
+            return list(partitions[partition]) if partitions else []
+        return [record for records in partitions for record in records]
+
+
+# Future returned by LocalProducer.send, resolved on flush
+class LocalFuture:
+    def __init__(self):
+        self.metadata = None
+        self.exception = None
+
+    def get(self, timeout=None) -> RecordMetadata:
+        if self.exception is not None:
+            raise self.exception
+        if self.metadata is None:
+            raise TimeoutError("Record was not flushed")
+        return self.metadata
+
+
+# Stand-in for kafka-python's KafkaProducer. Records are buffered until flush, "failing_values" lets
+# tests simulate records the broker rejects.
+class LocalProducer:
+    def __init__(self, broker: LocalBroker, failing_values=()):
+        self.broker = broker
+        self.failing_values = set(failing_values)
+        self.buffer = []
+        self.flushes = 0
+        self.closed = False
+
+    def send(self, topic, value=None, key=None, headers=None) -> LocalFuture:
+        future = LocalFuture()
+        self.buffer.append((topic, key, value, headers or [], future))
+        return future
+
+    def flush(self, timeout=None) -> None:
+        self.flushes += 1
+        for topic, key, value, headers, future in self.buffer:
+            if value in self.failing_values:
+                future.exception = RuntimeError("Broker rejected record")
+            else:
+                future.metadata = self.broker.append(topic, key, value, headers)
+        self.buffer = []
+
+    def close(self, timeout=None) -> None:
+        self.flush()
+        self.closed = True
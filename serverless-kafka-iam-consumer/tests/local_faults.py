@@ -0,0 +1,225 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import functools
+import random
+import threading
+from collections import namedtuple
+
+from conftest import LambdaContextStub
+
+
+# Raised for errors injected by a scenario
+class InjectedError(Exception):
+    pass
+
+
+# Latency distributions of a fault, called with the random generator of the target and returning seconds
+class Constant:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+
+    def __call__(self, rng: random.Random) -> float:
+        return self.seconds
+
+
+class Uniform:
+    def __init__(self, low: float, high: float):
+        self.low = low
+        self.high = high
+
+    def __call__(self, rng: random.Random) -> float:
+        return rng.uniform(self.low, self.high)
+
+
+# Exponentially distributed latency with a long tail, capped at "cap" seconds if set
+class Exponential:
+    def __init__(self, mean: float, cap: float = None):
+        self.mean = mean
+        self.cap = cap
+
+    def __call__(self, rng: random.Random) -> float:
+        latency = rng.expovariate(1 / self.mean)
+        return min(latency, self.cap) if self.cap is not None else latency
+
+
+# Faults of one target (a sink or a decoder). Random faults are drawn per call with the given rates, scripted faults
+# apply to fixed call numbers (counted from 1): "stalls" maps call numbers to the seconds the call hangs, "errors"
+# and "throttles" are the calls that fail or are throttled. A throttled call also takes "throttle_seconds" longer.
+class Fault:
+    def __init__(
+        self,
+        latency=None,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        throttle_seconds: float = 0.0,
+        stalls: dict = None,
+        errors=(),
+        throttles=(),
+        error=InjectedError,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.throttle_seconds = throttle_seconds
+        self.stalls = stalls or {}
+        self.errors = set(errors)
+        self.throttles = set(throttles)
+        self.error = error
+
+
+# Clock that only advances when something sleeps, so latencies and stalls of a scenario cost no wall clock time.
+# It replaces the time module of the consumer modules (see FaultScenario.patch), the stages then compute their
+# deadlines with it.
+class VirtualClock:
+    def __init__(self, start: float = 1690000000.0):
+        self.start = start
+        self.now = 0.0
+        self._lock = threading.Lock()
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def perf_counter(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.start + self.now
+
+    def sleep(self, seconds: float) -> None:
+        with self._lock:
+            self.now += max(0.0, seconds)
+
+
+# Scripted faults per target. Every target draws from its own random generator seeded with the scenario name and
+# seed, so the same scenario injects the same faults on every run, independent of the other targets. Calls of one
+# target have to be sequential for that (e.g. a key-value sink with max_concurrency=1).
+class FaultScenario:
+    def __init__(self, name: str, seed: int = 0, clock: VirtualClock = None, **faults):
+        self.name = name
+        self.seed = seed
+        self.clock = clock or VirtualClock()
+        self.faults = faults
+        self.calls = {}
+        self.injected = {}
+        self._random = {target: random.Random(f"{name}:{seed}:{target}") for target in faults}
+
+    def _count(self, target: str, kind: str) -> None:
+        self.injected[(target, kind)] = self.injected.get((target, kind), 0) + 1
+
+    # Applies the faults of the next call to the target: stall, latency and injected error. Returns True if the call
+    # is throttled, the wrapper then answers like the throttled service would.
+    def inject(self, target: str) -> bool:
+        call = self.calls[target] = self.calls.get(target, 0) + 1
+        fault = self.faults.get(target)
+        if fault is None:
+            return False
+        rng = self._random[target]
+        # All random values of a call are drawn, so the sequence of faults does not depend on which of them apply
+        latency = fault.latency(rng) if fault.latency is not None else 0.0
+        failed = rng.random() < fault.error_rate or call in fault.errors
+        throttled = rng.random() < fault.throttle_rate or call in fault.throttles
+        if call in fault.stalls:
+            self._count(target, "stall")
+        self.clock.sleep(fault.stalls.get(call, 0.0) + latency + (fault.throttle_seconds if throttled else 0.0))
+        if failed:
+            self._count(target, "error")
+            raise fault.error(f"Injected error in call {call} to {target} ({self.name})")
+        if throttled:
+            self._count(target, "throttle")
+        return throttled
+
+    # Replaces the time module of the consumer modules with the virtual clock and their random module (the retry
+    # jitter) with a generator seeded by the scenario
+    def patch(self, monkeypatch, *modules) -> None:
+        for module in modules:
+            monkeypatch.setattr(module, "time", self.clock)
+            if hasattr(module, "random"):
+                monkeypatch.setattr(module, "random", random.Random(f"{self.name}:{self.seed}:{module.__name__}"))
+
+
+# Wraps a LocalTable. Throttled BatchWriteItem calls return all requests as unprocessed items.
+class FaultyTable:
+    def __init__(self, table, scenario: FaultScenario, target: str = "table"):
+        self.table = table
+        self.scenario = scenario
+        self.target = target
+
+    def __getattr__(self, name):
+        return getattr(self.table, name)
+
+    def batch_write_item(self, RequestItems: dict) -> dict:
+        if self.scenario.inject(self.target):
+            return {"UnprocessedItems": RequestItems}
+        return self.table.batch_write_item(RequestItems=RequestItems)
+
+
+# Wraps a LocalProducer. Faults apply to the flush: an injected error fails all buffered records, throttling delays
+# the flush like a broker quota (by "throttle_seconds").
+class FaultyProducer:
+    def __init__(self, producer, scenario: FaultScenario, target: str = "producer"):
+        self.producer = producer
+        self.scenario = scenario
+        self.target = target
+
+    def __getattr__(self, name):
+        return getattr(self.producer, name)
+
+    def flush(self, timeout=None) -> None:
+        try:
+            self.scenario.inject(self.target)
+        except Exception as error:
+            for *_, future in self.producer.buffer:
+                future.exception = error
+            self.producer.buffer = []
+            return
+        self.producer.flush(timeout)
+
+
+# Wraps a function, e.g. a decoder, with the faults of the target (throttling does not apply)
+def faulty(function, scenario: FaultScenario, target: str):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        scenario.inject(target)
+        return function(*args, **kwargs)
+    return wrapper
+
+
+# Lambda context whose remaining time runs down with the virtual clock
+class VirtualLambdaContext(LambdaContextStub):
+    def __init__(self, clock: VirtualClock, timeout_ms: int):
+        self.clock = clock
+        self.timeout_ms = timeout_ms
+        self.started_at = clock.monotonic()
+
+    def get_remaining_time_in_millis(self) -> int:
+        return int(self.timeout_ms - (self.clock.monotonic() - self.started_at) * 1000)
+
+
+# Outcome of a scenario run: processed records, invocations (including retries), failed invocations and their error
+# types (invocations running longer than the timeout count as "Timeout"), and the virtual duration and throughput
+ScenarioResult = namedtuple("ScenarioResult", ["records", "invocations", "failed_invocations", "errors", "elapsed_seconds", "throughput"])
+
+
+# Invokes the handler with the events like the event source mapping does for a partition: the events are processed in
+# order and a failed event is retried (at most "max_attempts" times) before the next one
+def run_scenario(handler, events: list, scenario: FaultScenario, timeout_ms: int = 60000, max_attempts: int = 3) -> ScenarioResult:
+    clock = scenario.clock
+    started_at = clock.monotonic()
+    records = invocations = 0
+    errors = []
+    for event in events:
+        for _ in range(max_attempts):
+            invocations += 1
+            context = VirtualLambdaContext(clock, timeout_ms)
+            try:
+                handler(event, context)
+            except Exception as error:
+                errors.append(type(error).__name__)
+                continue
+            if context.get_remaining_time_in_millis() < 0:
+                errors.append("Timeout")
+                continue
+            records += sum(len(batch) for batch in event["records"].values())
+            break
+    elapsed = clock.monotonic() - started_at
+    return ScenarioResult(records, invocations, len(errors), errors, elapsed, records / elapsed if elapsed else float("inf"))
@@ -0,0 +1,55 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Stand-in for the Lambda Extensions API on a local port. Extensions register and long-poll for events, invoke()
+# hands an INVOKE event to the extension and waits until the extension asks for the next event again, which is when
+# Lambda would freeze the execution environment.
+class LocalRuntimeApi:
+    def __init__(self):
+        self.registrations = []
+        self._events = queue.Queue()
+        self._ready = threading.Semaphore(0)
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                api.registrations.append((self.headers["Lambda-Extension-Name"], body["events"]))
+                self.send_response(200)
+                self.send_header("Lambda-Extension-Identifier", "local-extension-id")
+                self.end_headers()
+
+            def do_GET(self):
+                api._ready.release()
+                event = json.dumps(api._events.get()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(event)))
+                self.end_headers()
+                self.wfile.write(event)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def address(self) -> str:
+        return f"127.0.0.1:{self._server.server_address[1]}"
+
+    # Waits until the extension polls for the next event (it finished init or the previous invocation)
+    def wait_for_extension(self, timeout: float = 5) -> bool:
+        return self._ready.acquire(timeout=timeout)
+
+    def invoke(self, request_id: str = "request", timeout_seconds: float = 30) -> None:
+        self._events.put({"eventType": "INVOKE", "requestId": request_id, "deadlineMs": int((time.time() + timeout_seconds) * 1000)})
+
+    def shutdown(self) -> None:
+        self._events.put({"eventType": "SHUTDOWN"})
+        self._server.shutdown()
@@ -0,0 +1,62 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import threading
+import time
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+
+# Stand-in for the DynamoDB client's batch_write_item and batch_get_item. It enforces the service limits (25 requests,
+# no duplicate keys), can leave items or keys unprocessed to simulate throttling and can add a per call latency.
+class LocalTable:
+    def __init__(self, table_name: str, key_attributes: list, throttled_calls: int = 0, latency_seconds: float = 0):
+        self.table_name = table_name
+        self.key_attributes = key_attributes
+        self.throttled_calls = throttled_calls
+        self.latency_seconds = latency_seconds
+        self.items = {}
+        self.calls = 0
+        self._deserializer = TypeDeserializer()
+        self._serializer = TypeSerializer()
+        self._lock = threading.Lock()
+
+    def batch_write_item(self, RequestItems: dict) -> dict:
+        requests = RequestItems[self.table_name]
+        items = [{k: self._deserializer.deserialize(v) for k, v in request["PutRequest"]["Item"].items()} for request in requests]
+        keys = [tuple(item[attribute] for attribute in self.key_attributes) for item in items]
+        if len(requests) > 25:
+            raise ValueError("Too many items requested for the BatchWriteItem call")
+        if len(set(keys)) != len(keys):
+            raise ValueError("Provided list of item keys contains duplicates")
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+        with self._lock:
+            self.calls += 1
+            throttled = self.calls <= self.throttled_calls
+        # A throttled call only writes the first half of the requests
+        processed = len(requests) // 2 if throttled else len(requests)
+        with self._lock:
+            for key, item in zip(keys[:processed], items[:processed]):
+                self.items[key] = item
+        unprocessed = requests[processed:]
+        return {"UnprocessedItems": {self.table_name: unprocessed} if unprocessed else {}}
+
+    # Stand-in for single item writes, used to compare against batched writes
+    def put_item(self, TableName: str, Item: dict) -> dict:
+        return self.batch_write_item(RequestItems={TableName: [{"PutRequest": {"Item": Item}}]})
+
+    # A throttled call only reads the first half of the keys
+    def batch_get_item(self, RequestItems: dict) -> dict:
+        keys = RequestItems[self.table_name]["Keys"]
+        with self._lock:
+            self.calls += 1
+            throttled = self.calls <= self.throttled_calls
+        processed = len(keys) // 2 if throttled else len(keys)
+        responses = []
+        for key in keys[:processed]:
+            item = self.items.get(tuple(self._deserializer.deserialize(key[attribute]) for attribute in self.key_attributes))
+            if item is not None:
+                responses.append({k: self._serializer.serialize(v) for k, v in item.items()})
+        unprocessed = keys[processed:]
+        return {"Responses": {self.table_name: responses}, "UnprocessedKeys": {self.table_name: {"Keys": unprocessed}} if unprocessed else {}}
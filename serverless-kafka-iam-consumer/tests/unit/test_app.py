@@ -0,0 +1,154 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import json
+
+import app
+import columnar
+import dynamodb_sink
+import enrichment
+import kafka_sink
+import materialized_view
+import offset_tracker
+import rate_limiter
+import trace_context
+from conftest import make_event, make_record
+from local_broker import LocalBroker, LocalProducer
+from local_table import LocalTable
+
+
+def test_lambda_handler_processes_records(lambda_context):
+    event = make_event([make_record({"amount": i}, offset=i) for i in range(3)])
+
+    response = app.lambda_handler(event, lambda_context)
+
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["message"] == "3 Records processed"
+
+
+def test_lambda_handler_columnar_mode(lambda_context, monkeypatch):
+    monkeypatch.setattr(app, "COLUMNAR_FIELDS", ["amount"])
+    monkeypatch.setattr(app, "COLUMNAR_FILTER", "amount>0")
+    monkeypatch.setattr(app, "COLUMNAR_AGGREGATIONS", columnar.parse_aggregations("amount:sum"))
+    records = [make_record({"amount": i}, offset=i) for i in range(4)]
+
+    aggregates = app.process_columnar(records)
+    response = app.lambda_handler(make_event(records), lambda_context)
+
+    assert aggregates == {"amount_sum": 6.0}
+    assert json.loads(response["body"])["message"] == "4 Records processed"
+
+
+def test_lambda_handler_enriches_records(lambda_context, monkeypatch, tmp_path):
+    snapshot = tmp_path / "reference.ndjson"
+    snapshot.write_text(json.dumps({"id": "c1", "segment": "gold"}) + "\n")
+    enricher = enrichment.ReferenceDataEnricher(key_field="customer", snapshot_source=str(snapshot),
+                                                 snapshot_path=str(tmp_path / "snapshot.ndjson"))
+    monkeypatch.setattr(app, "ENRICHER", enricher)
+    values = [{"customer": "c1"}, {"customer": "c2"}]
+
+    app.enrich_values(values)
+    response = app.lambda_handler(make_event([make_record(value) for value in values]), lambda_context)
+
+    assert values[0]["reference"] == {"id": "c1", "segment": "gold"}
+    assert values[1]["reference"] is None
+    assert response["statusCode"] == 200
+
+
+def test_lambda_handler_produces_transformed_records(lambda_context, monkeypatch):
+    broker = LocalBroker(partitions=1)
+    producer = LocalProducer(broker)
+    monkeypatch.setattr(app, "OUTPUT_SINK", kafka_sink.KafkaOutputSink("OutputTopic", lambda: producer))
+    records = [make_record({"amount": i}, key=f"key-{i}", offset=i) for i in range(3)]
+
+    app.lambda_handler(make_event(records), lambda_context)
+
+    written = broker.records("OutputTopic")
+    assert [record.value for record in written] == [b'{"amount": 0}', b'{"amount": 1}', b'{"amount": 2}']
+    assert [record.key for record in written] == [b"key-0", b"key-1", b"key-2"]
+    assert producer.flushes == 1
+
+
+def test_lambda_handler_writes_key_values(lambda_context, monkeypatch):
+    table = LocalTable("Orders", ["id"])
+    monkeypatch.setattr(app, "KV_SINK", dynamodb_sink.DynamoDBBatchSink("Orders", ["id"], client=table))
+    records = [make_record({"id": "a", "amount": 1}), make_record({"id": "a", "amount": 2}), make_record({"id": "b", "amount": 3})]
+
+    app.lambda_handler(make_event(records), lambda_context)
+
+    assert table.items == {("a",): {"id": "a", "amount": 2}, ("b",): {"id": "b", "amount": 3}}
+
+
+def test_lambda_handler_shrinks_downstream_writes_to_available_tokens(lambda_context, monkeypatch):
+    table = LocalTable("Orders", ["id"])
+    store = rate_limiter.InMemoryTokenStore()
+    monkeypatch.setattr(app, "KV_SINK", dynamodb_sink.DynamoDBBatchSink("Orders", ["id"], client=table))
+    monkeypatch.setattr(app, "RATE_LIMITER", rate_limiter.TokenBucketRateLimiter(store, "bucket", rate_per_second=1000, capacity=4, lease_size=1))
+    monkeypatch.setattr(app, "RATE_LIMIT_MODE", "shrink")
+    records = [make_record({"id": str(i)}, offset=i) for i in range(10)]
+
+    app.lambda_handler(make_event(records), lambda_context)
+
+    assert len(table.items) == 10
+    assert table.calls >= 3
+
+
+def test_lambda_handler_updates_latest_value_view(lambda_context, monkeypatch, tmp_path):
+    view = materialized_view.SnapshottingView(materialized_view.LatestValueView(snapshot_path=str(tmp_path / "view.bin")))
+    monkeypatch.setattr(app, "LATEST_VALUE_VIEW", view)
+
+    app.lambda_handler(make_event([make_record({"v": 1}, key="a", offset=0), make_record({"v": 2}, key="a", offset=1)]), lambda_context)
+
+    assert app.lookup_latest_value("a") == {"v": 2}
+
+
+def test_lambda_handler_dispatches_topics_to_their_processors(lambda_context, monkeypatch):
+    monkeypatch.setattr(app, "COLUMNAR_FIELDS", ["amount"])
+    monkeypatch.setattr(app.PROCESSORS, "topic_processors", {"Payments": "records"})
+    columnar_batches = []
+    monkeypatch.setattr(app, "process_columnar", lambda records: columnar_batches.append(records))
+    records = [make_record({"amount": 1}, topic="ServerlessKafkaTopic", partition=0),
+               make_record({"amount": 2}, topic="ServerlessKafkaTopic", partition=1),
+               make_record({"amount": 3}, topic="Payments", partition=0)]
+
+    response = app.lambda_handler(make_event(records), lambda_context)
+
+    assert json.loads(response["body"])["message"] == "3 Records processed"
+    assert [[record["topic"] for record in batch] for batch in columnar_batches] == [["ServerlessKafkaTopic"], ["ServerlessKafkaTopic"]]
+
+
+def test_lambda_handler_links_source_traces(lambda_context, monkeypatch):
+    documents = []
+    monkeypatch.setattr(app, "TRACE_LINKER", trace_context.BatchTraceLinker("ServerlessKafkaConsumer", send=documents.append))
+    record = make_record({"amount": 1})
+    record["headers"] = [{trace_context.TRACE_HEADER: list(b"Root=1-5759e988-bd862e3fe1be46a994272793;Parent=53995c3f42cd8ad8;Sampled=1")}]
+
+    app.lambda_handler(make_event([record]), lambda_context)
+
+    assert [document["trace_id"] for document in documents] == ["1-5759e988-bd862e3fe1be46a994272793"]
+
+
+def test_lambda_handler_tracks_offsets_per_partition(lambda_context, monkeypatch):
+    tracker = offset_tracker.PartitionOffsetTracker()
+    monkeypatch.setattr(app, "OFFSET_TRACKER", tracker)
+    event = make_event([make_record({"amount": i}, offset=i) for i in range(3)])
+
+    app.lambda_handler(event, lambda_context)
+
+    assert tracker.last_offsets == {"ServerlessKafkaTopic-0": 2}
+    assert tracker.track("ServerlessKafkaTopic-0", event["records"]["ServerlessKafkaTopic-0"]) == (offset_tracker.OVERLAPPING, 3)
+
+
+def test_snapstart_hooks_prime_and_reset_the_stages(lambda_context, monkeypatch):
+    table = LocalTable("Orders", ["id"])
+    sink = dynamodb_sink.DynamoDBBatchSink("Orders", ["id"], client=table)
+    limiter = rate_limiter.TokenBucketRateLimiter(rate_limiter.InMemoryTokenStore(), "bucket", rate_per_second=1000, lease_size=100)
+    monkeypatch.setattr(app, "KV_SINK", sink)
+    monkeypatch.setattr(app, "RATE_LIMITER", limiter)
+    limiter.acquire(1, deadline=float("inf"))
+
+    app.prime_before_snapshot()
+    app.reset_after_restore()
+
+    assert sink._client is None
+    assert limiter._local_tokens == 0
+    assert table.items == {}
@@ -0,0 +1,72 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import math
+
+import numpy as np
+import pytest
+
+import columnar
+from conftest import make_record
+
+
+def test_decode_json_values_falls_back_on_invalid_json():
+    records = [make_record({"amount": 1}), make_record("not json"), make_record({"amount": 3})]
+
+    assert columnar.decode_json_values(records) == [{"amount": 1}, None, {"amount": 3}]
+
+
+def test_decode_json_values_keeps_values_aligned_with_records():
+    records = [make_record("1, 2"), make_record(3)]
+
+    assert columnar.decode_json_values(records) == [None, 3]
+
+
+def test_from_values_uses_nan_for_missing_and_non_numeric_fields():
+    values = [{"order": {"amount": 5}}, {"order": {}}, {"order": {"amount": "abc"}}, None]
+
+    batch = columnar.ColumnarBatch.from_values(values, ["order.amount"])
+
+    assert batch["order.amount"][0] == 5.0
+    assert all(math.isnan(v) for v in batch["order.amount"][1:])
+
+
+def test_filter_project_and_aggregate():
+    values = [{"amount": a, "quantity": q} for a, q in [(5, 1), (15, 2), (25, 3), (None, 4)]]
+    batch = columnar.ColumnarBatch.from_values(values, ["amount", "quantity"])
+
+    selected = batch.filter("amount>=10").project(["quantity"])
+
+    assert list(selected.index) == [1, 2]
+    assert list(selected.columns) == ["quantity"]
+    assert batch.aggregate(columnar.parse_aggregations("amount:sum,amount:count,quantity:max")) == {
+        "amount_sum": 45.0,
+        "amount_count": 3,
+        "quantity_max": 4.0,
+    }
+
+
+def test_filter_accepts_boolean_mask():
+    batch = columnar.ColumnarBatch.from_values([{"a": 1}, {"a": 2}], ["a"])
+
+    assert list(batch.filter(np.array([False, True]))["a"]) == [2.0]
+
+
+@pytest.mark.parametrize("expression", ["amount", ">5", "amount>"])
+def test_parse_filter_rejects_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        columnar.parse_filter(expression)
+
+
+def test_parse_aggregations_rejects_unknown_function():
+    with pytest.raises(ValueError):
+        columnar.parse_aggregations("amount:median")
+
+
+def test_to_arrow():
+    pytest.importorskip("pyarrow")
+    batch = columnar.ColumnarBatch.from_values([{"a": 1, "b": 2}], ["a", "b"])
+
+    record_batch = batch.to_arrow()
+
+    assert record_batch.num_rows == 1
+    assert record_batch.schema.names == ["a", "b"]
@@ -0,0 +1,69 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import time
+from decimal import Decimal
+
+import pytest
+
+import dynamodb_sink
+from local_table import LocalTable
+
+
+def create_sink(table: LocalTable, **kwargs) -> dynamodb_sink.DynamoDBBatchSink:
+    return dynamodb_sink.DynamoDBBatchSink(table.table_name, table.key_attributes, client=table, base_backoff_seconds=0.001, **kwargs)
+
+
+def test_warm_up_does_not_write():
+    table = LocalTable("Orders", ["id"])
+    sink = create_sink(table)
+
+    sink.warm_up({"id": "warm-up", "amount": 1.0})
+
+    assert sink._serializer is not None
+    assert table.items == {}
+
+
+def test_write_splits_into_batches_of_25():
+    table = LocalTable("Orders", ["id"])
+
+    statistics = create_sink(table).write([{"id": str(i), "amount": 1.5} for i in range(60)], time.monotonic() + 10)
+
+    assert statistics["written"] == 60
+    assert statistics["batches"] == 3
+    assert table.items[("7",)] == {"id": "7", "amount": Decimal("1.5")}
+
+
+def test_write_merges_duplicate_keys_last_write_wins():
+    table = LocalTable("Orders", ["id", "sk"])
+    items = [{"id": "a", "sk": 1, "v": 1}, {"id": "b", "sk": 1, "v": 2}, {"id": "a", "sk": 1, "v": 3}, {"no": "key"}]
+
+    statistics = create_sink(table).write(items, time.monotonic() + 10)
+
+    assert table.items[("a", 1)]["v"] == 3
+    assert statistics["merged"] == 1
+    assert statistics["skipped"] == 1
+    assert statistics["written"] == 2
+
+
+def test_write_retries_unprocessed_items():
+    table = LocalTable("Orders", ["id"], throttled_calls=3)
+
+    statistics = create_sink(table, max_concurrency=1).write([{"id": str(i)} for i in range(20)], time.monotonic() + 10)
+
+    assert len(table.items) == 20
+    assert statistics["retries"] == 3
+
+
+def test_write_raises_when_deadline_is_reached():
+    table = LocalTable("Orders", ["id"], throttled_calls=1000)
+
+    with pytest.raises(dynamodb_sink.UnprocessedItemsError):
+        create_sink(table).write([{"id": str(i)} for i in range(20)], time.monotonic() + 0.05)
+
+
+def test_create_sink_from_environment():
+    assert dynamodb_sink.create_sink_from_environment({}) is None
+
+    sink = dynamodb_sink.create_sink_from_environment({"KV_TABLE_NAME": "Orders", "KV_TABLE_KEY_ATTRIBUTES": "pk, sk"})
+
+    assert sink.key_attributes == ["pk", "sk"]
@@ -0,0 +1,137 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import json
+import time
+from decimal import Decimal
+
+import pytest
+
+import enrichment
+from local_table import LocalTable
+
+
+# Remote lookup stand-in that records the keys it was asked for
+class StubLookup:
+    def __init__(self, documents: dict):
+        self.documents = documents
+        self.calls = []
+
+    def lookup_many(self, keys: list) -> tuple:
+        self.calls.append(sorted(keys))
+        return {key: self.documents[key] for key in keys if key in self.documents}, []
+
+
+@pytest.fixture
+def snapshot_file(tmp_path):
+    path = tmp_path / "reference.ndjson"
+    path.write_text("\n".join(json.dumps({"id": i, "name": f"customer-{i}"}) for i in range(3)) + "\n")
+    return path
+
+
+def test_lru_cache_evicts_least_recently_used_and_counts_hits():
+    cache = enrichment.LRUCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.hit_rate == pytest.approx(2 / 3)
+
+
+def test_lru_cache_expires_entries():
+    cache = enrichment.LRUCache(ttl_seconds=0)
+    cache.put("a", 1)
+
+    assert cache.get("a") == (False, None)
+    assert len(cache) == 0
+
+
+def test_reference_snapshot_reads_documents_from_mapping(snapshot_file):
+    snapshot = enrichment.ReferenceSnapshot(str(snapshot_file), "id")
+
+    assert len(snapshot) == 3
+    assert snapshot.get(2) == {"id": 2, "name": "customer-2"}
+    assert snapshot.get("unknown") is None
+    snapshot.close()
+
+
+def test_enricher_resolves_snapshot_then_cache_then_remote(snapshot_file, tmp_path):
+    lookup = StubLookup({"10": {"id": "10", "name": "remote"}})
+    enricher = enrichment.ReferenceDataEnricher(
+        key_field="customer",
+        snapshot_source=str(snapshot_file),
+        snapshot_path=str(tmp_path / "snapshot.ndjson"),
+        remote_lookup=lookup,
+    )
+    values = [{"customer": 1}, {"customer": "10"}, {"customer": 11}, {"other": True}]
+
+    first = enricher.enrich_all(values)
+    second = enricher.enrich_all([{"customer": "10"}, {"customer": 11}])
+
+    assert values[0]["reference"] == {"id": 1, "name": "customer-1"}
+    assert values[1]["reference"] == {"id": "10", "name": "remote"}
+    assert values[2]["reference"] is None
+    assert "reference" not in values[3]
+    assert first == {"snapshot_hits": 1, "cache_hits": 0, "remote_lookups": 2}
+    assert second == {"snapshot_hits": 0, "cache_hits": 2, "remote_lookups": 0}
+    assert lookup.calls == [["10", "11"]]
+
+
+def test_dynamodb_lookup_returns_json_serializable_documents():
+    table = LocalTable("reference", ["id"])
+    table.items[("c-1",)] = {"id": "c-1", "tier": Decimal(2), "discount": Decimal("0.5"), "tags": {"a"}}
+    enricher = enrichment.ReferenceDataEnricher(key_field="customer", remote_lookup=enrichment.DynamoDBReferenceLookup("reference", "id", client=table))
+    values = [{"customer": "c-1"}]
+
+    enricher.enrich_all(values)
+
+    assert values[0]["reference"] == {"id": "c-1", "tier": 2, "discount": 0.5, "tags": ["a"]}
+    assert json.loads(json.dumps(values[0]))["reference"]["tier"] == 2
+
+
+def test_dynamodb_lookup_does_not_cache_unprocessed_keys(monkeypatch):
+    monkeypatch.setattr(enrichment.time, "sleep", lambda seconds: None)
+    # Every attempt of the first lookup is throttled, so one of the two keys stays unprocessed
+    table = LocalTable("reference", ["id"], throttled_calls=3)
+    table.items[("c-1",)] = {"id": "c-1", "name": "first"}
+    table.items[("c-2",)] = {"id": "c-2", "name": "second"}
+    enricher = enrichment.ReferenceDataEnricher(key_field="customer", remote_lookup=enrichment.DynamoDBReferenceLookup("reference", "id", client=table))
+
+    first = [{"customer": "c-1"}, {"customer": "c-2"}]
+    enricher.enrich_all(first)
+    second = [{"customer": "c-1"}, {"customer": "c-2"}]
+    statistics = enricher.enrich_all(second)
+
+    assert [value["reference"] is None for value in first].count(True) == 1
+    assert [value["reference"]["name"] for value in second] == ["first", "second"]
+    assert statistics["cache_hits"] == 1
+
+
+def test_enricher_refreshes_snapshot_in_background(snapshot_file, tmp_path):
+    enricher = enrichment.ReferenceDataEnricher(
+        key_field="customer",
+        snapshot_source=str(snapshot_file),
+        snapshot_path=str(tmp_path / "snapshot.ndjson"),
+        snapshot_ttl_seconds=0,
+    )
+    enricher.ensure_snapshot()
+    snapshot_file.write_text(json.dumps({"id": 7, "name": "new"}) + "\n")
+
+    enricher.ensure_snapshot()
+    for _ in range(100):
+        if enricher._refresh_thread is None:
+            break
+        time.sleep(0.01)
+
+    assert enricher.snapshot.get(7) == {"id": 7, "name": "new"}
+
+
+def test_create_enricher_from_environment():
+    assert enrichment.create_enricher_from_environment({}) is None
+
+    enricher = enrichment.create_enricher_from_environment({"ENRICHMENT_KEY_FIELD": "customer", "ENRICHMENT_CACHE_SIZE": "5"})
+
+    assert enricher.key_field == "customer"
+    assert enricher.cache.max_size == 5
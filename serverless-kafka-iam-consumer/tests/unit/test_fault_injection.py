@@ -0,0 +1,107 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import app
+import columnar
+import dynamodb_sink
+import kafka_sink
+import rate_limiter
+from conftest import make_event, make_record
+from local_broker import LocalBroker, LocalProducer
+from local_faults import Exponential, Fault, FaultScenario, FaultyProducer, FaultyTable, Uniform, faulty, run_scenario
+from local_table import LocalTable
+
+
+# Events of "count" batches with "size" records each, the records of a partition have consecutive offsets
+def make_events(count: int, size: int) -> list:
+    return [make_event([make_record({"id": str(i * size + j), "amount": j}, offset=i * size + j) for j in range(size)]) for i in range(count)]
+
+
+# Writes the key-value table through the faults of the scenario, with one writer thread so the faults are deterministic
+def use_faulty_table(monkeypatch, scenario: FaultScenario) -> LocalTable:
+    table = LocalTable("Orders", ["id"])
+    monkeypatch.setattr(app, "KV_SINK", dynamodb_sink.DynamoDBBatchSink("Orders", ["id"], client=FaultyTable(table, scenario), max_concurrency=1))
+    scenario.patch(monkeypatch, app, dynamodb_sink)
+    return table
+
+
+def test_slow_sink_keeps_throughput_above_bound(monkeypatch):
+    scenario = FaultScenario("slow-sink", table=Fault(latency=Exponential(mean=0.05, cap=1.0)))
+    table = use_faulty_table(monkeypatch, scenario)
+
+    result = run_scenario(app.lambda_handler, make_events(20, 100), scenario)
+
+    assert result.failed_invocations == 0
+    assert len(table.items) == 2000
+    assert result.throughput >= 300
+
+
+def test_throttled_sink_is_retried_within_the_deadline(monkeypatch):
+    scenario = FaultScenario("throttled-sink", table=Fault(latency=Uniform(0.005, 0.02), throttle_rate=0.3))
+    table = use_faulty_table(monkeypatch, scenario)
+
+    result = run_scenario(app.lambda_handler, make_events(20, 100), scenario, timeout_ms=10000)
+
+    assert result.failed_invocations == 0
+    assert scenario.injected[("table", "throttle")] > 0
+    assert len(table.items) == 2000
+    assert result.throughput >= 200
+
+
+def test_stalled_sink_fails_the_invocation_before_the_timeout(monkeypatch):
+    # The first call hangs past the deadline and is throttled, the retry of the unprocessed items would end after it
+    scenario = FaultScenario("stalled-sink", table=Fault(stalls={1: 4.0}, throttles={1}))
+    table = use_faulty_table(monkeypatch, scenario)
+
+    result = run_scenario(app.lambda_handler, make_events(2, 20), scenario, timeout_ms=8000)
+
+    assert result.errors == ["UnprocessedItemsError"]
+    assert result.invocations == 3
+    assert len(table.items) == 40
+    assert result.elapsed_seconds < 8
+
+
+def test_rate_limiter_applies_backpressure_to_a_fast_sink(monkeypatch):
+    scenario = FaultScenario("fast-sink")
+    use_faulty_table(monkeypatch, scenario)
+    clock = scenario.clock
+    limiter = rate_limiter.TokenBucketRateLimiter(rate_limiter.InMemoryTokenStore(clock=clock.time), "Orders", rate_per_second=200,
+                                                  sleep=clock.sleep, clock=clock.monotonic)
+    monkeypatch.setattr(app, "RATE_LIMITER", limiter)
+
+    result = run_scenario(app.lambda_handler, make_events(20, 50), scenario)
+
+    assert result.failed_invocations == 0
+    assert 150 <= result.throughput <= 250
+
+
+def test_decoder_errors_are_retried_by_the_event_source_mapping(monkeypatch):
+    scenario = FaultScenario("corrupt-decoder", seed=7, decoder=Fault(error_rate=0.2))
+    use_faulty_table(monkeypatch, scenario)
+    monkeypatch.setattr(columnar, "decode_json_values", faulty(columnar.decode_json_values, scenario, "decoder"))
+
+    result = run_scenario(app.lambda_handler, make_events(10, 10), scenario, max_attempts=5)
+
+    assert result.failed_invocations == scenario.injected[("decoder", "error")] > 0
+    assert set(result.errors) == {"InjectedError"}
+    assert result.records == 100
+
+
+def test_producer_errors_fail_the_batch_until_it_is_written(monkeypatch):
+    scenario = FaultScenario("broken-broker", producer=Fault(errors={1, 2}, throttle_rate=0.5, throttle_seconds=0.1))
+    broker = LocalBroker(partitions=1)
+    monkeypatch.setattr(app, "OUTPUT_SINK", kafka_sink.KafkaOutputSink("OutputTopic", lambda: FaultyProducer(LocalProducer(broker), scenario)))
+    scenario.patch(monkeypatch, app)
+
+    result = run_scenario(app.lambda_handler, make_events(3, 10), scenario)
+
+    assert result.errors == ["InjectedError", "InjectedError"]
+    assert len(broker.records("OutputTopic")) == 30
+
+
+def test_same_scenario_gives_the_same_result(monkeypatch):
+    def run() -> tuple:
+        scenario = FaultScenario("replayable", seed=3, table=Fault(latency=Exponential(mean=0.02), throttle_rate=0.2, error_rate=0.05))
+        table = use_faulty_table(monkeypatch, scenario)
+        return run_scenario(app.lambda_handler, make_events(10, 60), scenario), scenario.injected, len(table.items)
+
+    assert run() == run()
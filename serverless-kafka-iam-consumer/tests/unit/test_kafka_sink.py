@@ -0,0 +1,63 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import pytest
+
+import kafka_sink
+from local_broker import LocalBroker, LocalProducer
+
+
+@pytest.fixture
+def broker() -> LocalBroker:
+    return LocalBroker()
+
+
+def test_producer_is_created_once_and_reused(broker):
+    created = []
+    sink = kafka_sink.KafkaOutputSink("OutputTopic", lambda: created.append(LocalProducer(broker)) or created[-1])
+
+    sink.write_batch([kafka_sink.OutputRecord(b"1", b"a")])
+    sink.write_batch([kafka_sink.OutputRecord(b"2", b"a")])
+
+    assert len(created) == 1
+    assert created[0].flushes == 2
+
+
+def test_write_batch_keeps_source_order_and_adds_source_headers(broker):
+    producer = LocalProducer(broker)
+    sink = kafka_sink.KafkaOutputSink("OutputTopic", lambda: producer)
+    records = [kafka_sink.OutputRecord(str(offset).encode(), b"key", "SourceTopic", 0, offset) for offset in [2, 0, 1]]
+
+    metadata = sink.write_batch(records)
+
+    written = broker.records("OutputTopic", broker.partition_for(b"key"))
+    assert [record.value for record in written] == [b"0", b"1", b"2"]
+    assert written[0].headers == [("source-topic", b"SourceTopic"), ("source-partition", b"0"), ("source-offset", b"0")]
+    assert [m.offset for m in metadata] == [0, 1, 2]
+    assert producer.flushes == 1
+
+
+def test_write_batch_raises_if_a_record_failed(broker):
+    sink = kafka_sink.KafkaOutputSink("OutputTopic", lambda: LocalProducer(broker, failing_values={b"bad"}))
+
+    with pytest.raises(RuntimeError):
+        sink.write_batch([kafka_sink.OutputRecord(b"good"), kafka_sink.OutputRecord(b"bad")])
+
+
+def test_close_flushes_and_releases_producer(broker):
+    producer = LocalProducer(broker)
+    sink = kafka_sink.KafkaOutputSink("OutputTopic", lambda: producer)
+    sink.write_batch([kafka_sink.OutputRecord(b"1")])
+
+    sink.close()
+
+    assert producer.closed
+
+
+def test_create_sink_from_environment():
+    assert kafka_sink.create_sink_from_environment({}) is None
+    with pytest.raises(ValueError):
+        kafka_sink.create_sink_from_environment({"OUTPUT_TOPIC_NAME": "OutputTopic"})
+
+    sink = kafka_sink.create_sink_from_environment({"OUTPUT_TOPIC_NAME": "OutputTopic", "BOOTSTRAP_SERVER": "broker:9098"})
+
+    assert sink.topic == "OutputTopic"
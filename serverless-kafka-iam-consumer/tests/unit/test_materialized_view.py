@@ -0,0 +1,121 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import os
+
+import pytest
+
+import materialized_view
+from conftest import make_event, make_record
+
+
+@pytest.fixture
+def view(tmp_path) -> materialized_view.LatestValueView:
+    return materialized_view.LatestValueView(snapshot_path=str(tmp_path / "view.bin"))
+
+
+def tombstone(key: str, offset: int) -> dict:
+    record = make_record("", key=key, offset=offset)
+    del record["value"]
+    return record
+
+
+def test_apply_keeps_latest_value_and_handles_tombstones(view):
+    view.apply("ServerlessKafkaTopic-0", [
+        make_record({"v": 1}, key="a", offset=0),
+        make_record({"v": 2}, key="b", offset=1),
+        make_record({"v": 3}, key="a", offset=2),
+        tombstone("b", 3),
+    ])
+
+    assert view.get_json("a") == {"v": 3}
+    assert view.get("b") is None
+    assert len(view) == 1
+    assert view.offsets == {"ServerlessKafkaTopic-0": 3}
+
+
+def test_apply_skips_already_applied_offsets_and_counts_gaps(view):
+    view.apply("ServerlessKafkaTopic-0", [make_record({"v": 1}, key="a", offset=0)])
+
+    applied = view.apply("ServerlessKafkaTopic-0", [make_record({"v": 0}, key="a", offset=0), make_record({"v": 5}, key="a", offset=5)])
+
+    assert applied == 1
+    assert view.gaps == 1
+    assert view.get_json("a") == {"v": 5}
+
+
+def test_snapshot_is_restored_and_only_new_offsets_are_applied(view, tmp_path):
+    view.apply("ServerlessKafkaTopic-0", [make_record({"v": i}, key=f"k{i % 3}", offset=i) for i in range(10)])
+    view.write_snapshot()
+
+    restored = materialized_view.LatestValueView(snapshot_path=str(tmp_path / "view.bin"))
+    assert restored.load_snapshot()
+    applied = restored.apply("ServerlessKafkaTopic-0", [make_record({"v": i}, key="k0", offset=i) for i in range(8, 12)])
+
+    assert applied == 2
+    assert restored.get_json("k1") == {"v": 7}
+    assert restored.get_json("k0") == {"v": 11}
+    assert len(restored) == 3
+
+
+def test_snapshotting_view_restores_and_snapshots_on_interval(view):
+    view.apply("ServerlessKafkaTopic-0", [make_record({"v": 1}, key="a", offset=0)])
+    view.write_snapshot()
+    snapshotting = materialized_view.SnapshottingView(materialized_view.LatestValueView(snapshot_path=view.snapshot_path), interval_seconds=0)
+
+    assert snapshotting.restore()
+    snapshotting.apply_event(make_event([make_record({"v": 2}, key="b", offset=1)]))
+
+    assert snapshotting.view._overlay == {}
+    assert snapshotting.view.get_json("a") == {"v": 1}
+    assert snapshotting.view.get_json("b") == {"v": 2}
+
+
+def test_write_snapshot_closes_the_previous_mapping(view):
+    view.apply("ServerlessKafkaTopic-0", [make_record({"v": 1}, key="a", offset=0)])
+    view.write_snapshot()
+    previous = view._mmap
+
+    view.apply("ServerlessKafkaTopic-0", [make_record({"v": 2}, key="a", offset=1)])
+    view.write_snapshot()
+
+    assert previous.closed
+    assert view.get_json("a") == {"v": 2}
+    view.close()
+
+
+def test_truncated_snapshot_starts_empty(view):
+    view.apply("ServerlessKafkaTopic-0", [make_record({"v": 1}, key="a", offset=0)])
+    view.write_snapshot()
+    view.close()
+    with open(view.snapshot_path, "r+b") as snapshot:
+        # Cut the last entry in half
+        snapshot.truncate(os.path.getsize(view.snapshot_path) - 3)
+    snapshotting = materialized_view.SnapshottingView(materialized_view.LatestValueView(snapshot_path=view.snapshot_path))
+
+    assert not snapshotting.restore()
+    assert len(snapshotting.view) == 0
+
+
+@pytest.mark.parametrize("content", [b"", materialized_view.SNAPSHOT_MAGIC, b"LVV0" + bytes(8)])
+def test_invalid_snapshot_starts_empty(view, content):
+    with open(view.snapshot_path, "wb") as snapshot:
+        snapshot.write(content)
+    snapshotting = materialized_view.SnapshottingView(view)
+
+    assert not snapshotting.restore()
+    assert len(snapshotting.view) == 0
+
+
+def test_create_view_from_environment():
+    assert materialized_view.create_view_from_environment({}) is None
+    assert materialized_view.create_view_from_environment({"VIEW_ENABLED": "yes"}) is not None
+
+
+def test_apply_merges_salted_hot_keys(view):
+    salted = make_record({"v": 2}, key="a#1", offset=1)
+    salted["headers"] = [{"X-Key-Salt": list(b"1")}]
+
+    view.apply("ServerlessKafkaTopic-0", [make_record({"v": 1}, key="a", offset=0), salted])
+
+    assert view.get_json("a") == {"v": 2}
+    assert len(view) == 1
@@ -0,0 +1,38 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+from conftest import make_event, make_record
+from offset_tracker import CONTIGUOUS, FIRST, GAPPED, OVERLAPPING, PartitionOffsetTracker
+
+
+def batch(first: int, last: int) -> list:
+    return [make_record({"n": offset}, offset=offset) for offset in range(first, last + 1)]
+
+
+def test_track_classifies_batches():
+    tracker = PartitionOffsetTracker()
+
+    assert tracker.track("Topic-0", batch(0, 9)) == (FIRST, 0)
+    assert tracker.track("Topic-0", batch(10, 19)) == (CONTIGUOUS, 0)
+    assert tracker.track("Topic-0", batch(25, 29)) == (GAPPED, 5)
+    assert tracker.track("Topic-0", batch(27, 34)) == (OVERLAPPING, 3)
+    assert tracker.track("Topic-0", batch(35, 36)) == (CONTIGUOUS, 0)
+
+
+def test_redelivered_older_batch_does_not_move_the_last_offset_back():
+    tracker = PartitionOffsetTracker()
+    tracker.track("Topic-0", batch(0, 9))
+
+    assert tracker.track("Topic-0", batch(0, 4)) == (OVERLAPPING, 5)
+    assert tracker.track("Topic-0", batch(10, 11)) == (CONTIGUOUS, 0)
+
+
+def test_track_event_counts_partitions_independently():
+    tracker = PartitionOffsetTracker()
+    tracker.track_event(make_event([make_record({}, partition=0, offset=0), make_record({}, partition=1, offset=0)]))
+
+    statistics = tracker.track_event(make_event([make_record({}, partition=0, offset=0), make_record({}, partition=0, offset=1),
+                                                 make_record({}, partition=1, offset=4)]))
+
+    assert statistics[OVERLAPPING] == 1 and statistics["redelivered_records"] == 1
+    assert statistics[GAPPED] == 1 and statistics["skipped_offsets"] == 3
+    assert statistics[CONTIGUOUS] == 0
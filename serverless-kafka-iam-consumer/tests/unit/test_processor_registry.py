@@ -0,0 +1,54 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import pytest
+
+from conftest import make_event, make_record
+from processor_registry import ProcessorRegistry, parse_topic_processors, split_topic_partition
+
+
+def create_registry(calls: list) -> ProcessorRegistry:
+    registry = ProcessorRegistry()
+
+    @registry.register("default")
+    def process_default(records, context):
+        calls.append(("default", records[0]["topic"], len(records)))
+        return len(records)
+
+    @registry.register("audit")
+    def process_audit(records, context):
+        calls.append(("audit", records[0]["topic"], len(records)))
+        return len(records)
+
+    return registry
+
+
+def test_parse_topic_processors():
+    assert parse_topic_processors(" orders=records, audit-log=audit ,") == {"orders": "records", "audit-log": "audit"}
+    assert parse_topic_processors("") == {}
+    with pytest.raises(ValueError):
+        parse_topic_processors("orders")
+
+
+def test_split_topic_partition_keeps_dashes_in_topic_names():
+    assert split_topic_partition("audit-log-12") == ("audit-log", 12)
+
+
+def test_dispatch_routes_every_topic_partition_to_its_processor():
+    calls = []
+    registry = create_registry(calls)
+    registry.assign({"audit-log": "audit"})
+    event = make_event([make_record({"n": 1}, topic="orders", partition=0), make_record({"n": 2}, topic="orders", partition=1),
+                        make_record({"n": 3}, topic="audit-log", partition=0, offset=0),
+                        make_record({"n": 4}, topic="audit-log", partition=0, offset=1)])
+
+    processed = registry.dispatch(event, None)
+
+    assert processed == 4
+    assert sorted(calls) == [("audit", "audit-log", 2), ("default", "orders", 1), ("default", "orders", 1)]
+
+
+def test_assign_rejects_unknown_processors():
+    registry = create_registry([])
+
+    with pytest.raises(ValueError, match="missing"):
+        registry.assign({"orders": "missing"})
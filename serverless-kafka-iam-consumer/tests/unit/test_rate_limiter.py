@@ -0,0 +1,151 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import re
+import time
+
+import pytest
+
+import rate_limiter
+
+
+# Deterministic clock shared by the store and the limiters, sleeping advances the time
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+# Stand-in for the DynamoDB client of the token store, records the requests and fails the first "conflicts" updates
+# like a concurrent update of another instance would
+class StubTokenTableClient:
+    class exceptions:
+        class ConditionalCheckFailedException(Exception):
+            pass
+
+    def __init__(self, conflicts: int = 0):
+        self.conflicts = conflicts
+        self.item = None
+        self.updates = []
+
+    def get_item(self, TableName: str, Key: dict, ConsistentRead: bool) -> dict:
+        return {"Item": self.item} if self.item else {}
+
+    def update_item(self, **request) -> dict:
+        self.updates.append(request)
+        if self.conflicts:
+            self.conflicts -= 1
+            # Another instance took tokens in the meantime
+            self.item = {"tokens": {"N": "5"}, "updated_at": {"N": str(time.time())}, "version": {"N": "1"}}
+            raise self.exceptions.ConditionalCheckFailedException()
+        values = request["ExpressionAttributeValues"]
+        self.item = {"tokens": values[":tokens"], "updated_at": values[":now"], "version": values[":next"]}
+        return {}
+
+
+def create_limiter(store, clock, **kwargs) -> rate_limiter.TokenBucketRateLimiter:
+    return rate_limiter.TokenBucketRateLimiter(store, "bucket", sleep=clock.sleep, clock=clock, **kwargs)
+
+
+def test_tokens_are_leased_in_chunks(clock):
+    store = rate_limiter.InMemoryTokenStore(clock=clock)
+    limiter = create_limiter(store, clock, rate_per_second=100, lease_size=50)
+
+    granted = [limiter.acquire(1, deadline=clock() + 1) for _ in range(50)]
+
+    assert sum(granted) == 50
+    assert store.calls == 1
+
+
+def test_acquire_waits_for_refill(clock):
+    store = rate_limiter.InMemoryTokenStore(clock=clock)
+    limiter = create_limiter(store, clock, rate_per_second=10, capacity=10, lease_size=1)
+
+    assert limiter.acquire(30, deadline=clock() + 10) == 30
+    assert limiter.waited_seconds == pytest.approx(2.0)
+
+
+def test_acquire_partial_returns_available_tokens(clock):
+    store = rate_limiter.InMemoryTokenStore(clock=clock)
+    limiter = create_limiter(store, clock, rate_per_second=10, capacity=10, lease_size=1)
+
+    assert limiter.acquire(30, deadline=clock() + 10, partial=True) == 10
+    assert limiter.waited_seconds == 0
+
+
+def test_acquire_raises_at_deadline(clock):
+    store = rate_limiter.InMemoryTokenStore(clock=clock)
+    limiter = create_limiter(store, clock, rate_per_second=10, capacity=10, lease_size=1)
+
+    with pytest.raises(rate_limiter.RateLimitExceededError):
+        limiter.acquire(100, deadline=clock() + 1)
+
+
+def test_bucket_is_shared_between_instances(clock):
+    store = rate_limiter.InMemoryTokenStore(clock=clock)
+    first = create_limiter(store, clock, rate_per_second=10, capacity=10, lease_size=10)
+    second = create_limiter(store, clock, rate_per_second=10, capacity=10, lease_size=10)
+
+    # The first instance leases the whole bucket, the second one has to wait for the refill
+    assert first.acquire(5, deadline=clock() + 1) == 5
+    with pytest.raises(rate_limiter.RateLimitExceededError):
+        second.acquire(5, deadline=clock() + 0.1)
+    assert first.acquire(5, deadline=clock() + 0.1) == 5
+
+
+def test_unused_leased_tokens_expire(clock):
+    store = rate_limiter.InMemoryTokenStore(clock=clock)
+    limiter = create_limiter(store, clock, rate_per_second=10, capacity=10, lease_size=10, lease_ttl_seconds=1)
+    limiter.acquire(1, deadline=clock() + 1)
+
+    clock.sleep(5)
+    limiter.acquire(1, deadline=clock() + 1)
+
+    assert store.calls == 2
+
+
+def test_dynamodb_token_store_aliases_attribute_names():
+    client = StubTokenTableClient()
+    store = rate_limiter.DynamoDBTokenStore("RateLimitTable", client=client)
+
+    assert store.take("bucket", 3, rate=10, capacity=10) == 3
+
+    request = client.updates[0]
+    assert request["Key"] == {"bucket": {"S": "bucket"}}
+    assert request["ConditionExpression"] == "attribute_not_exists(#bucket) OR #version = :version"
+    # Every attribute name of the expressions is aliased, "bucket" is a reserved word of DynamoDB
+    names = request["ExpressionAttributeNames"]
+    expressions = request["UpdateExpression"] + " " + request["ConditionExpression"]
+    assert set(names) == set(re.findall(r"#\w+", expressions))
+    assert set(names.values()) == {"bucket", "tokens", "updated_at", "version"}
+    assert request["ExpressionAttributeValues"][":version"] == {"N": "0"}
+
+
+def test_dynamodb_token_store_retries_conflicting_updates():
+    client = StubTokenTableClient(conflicts=1)
+    store = rate_limiter.DynamoDBTokenStore("RateLimitTable", client=client)
+
+    # The retry reads the bucket the other instance updated and takes the tokens that are left
+    assert store.take("bucket", 10, rate=10, capacity=10) == 5
+    assert store.calls == 2
+    assert client.updates[1]["ExpressionAttributeValues"][":version"] == {"N": "1"}
+    assert client.item["version"] == {"N": "2"}
+
+
+def test_create_rate_limiter_from_environment():
+    assert rate_limiter.create_rate_limiter_from_environment({}) is None
+    assert rate_limiter.create_rate_limiter_from_environment({"RATE_LIMIT_PER_SECOND": "0", "RATE_LIMIT_BURST": "0"}) is None
+
+    limiter = rate_limiter.create_rate_limiter_from_environment({"RATE_LIMIT_PER_SECOND": "100", "RATE_LIMIT_BURST": "200"})
+
+    assert isinstance(limiter.store, rate_limiter.InMemoryTokenStore)
+    assert limiter.capacity == 200
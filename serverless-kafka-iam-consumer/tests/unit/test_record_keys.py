@@ -0,0 +1,23 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import record_keys
+from conftest import make_record
+
+
+def salted_record(key: str, salt: str) -> dict:
+    record = make_record({"v": 1}, key=key)
+    record["headers"] = [{record_keys.SALT_HEADER: list(salt.encode("utf-8"))}]
+    return record
+
+
+def test_record_key_merges_salted_hot_keys():
+    assert record_keys.record_key(salted_record("customer-1#3", "3")) == b"customer-1"
+    assert record_keys.record_key(salted_record("customer#1#12", "12")) == b"customer#1"
+
+
+def test_record_key_keeps_unsalted_keys():
+    assert record_keys.record_key(make_record({"v": 1}, key="customer-1#3")) == b"customer-1#3"
+    assert record_keys.record_key(salted_record("customer-1", "3")) == b"customer-1"
+    record = make_record({"v": 1})
+    del record["key"]
+    assert record_keys.record_key(record) is None
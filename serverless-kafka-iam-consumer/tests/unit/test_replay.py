@@ -0,0 +1,49 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import base64
+import json
+
+import replay
+
+
+def write_export(path, records: list) -> str:
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+    return str(path)
+
+
+def test_load_export_converts_records_to_event_format(tmp_path):
+    export = write_export(tmp_path / "export.ndjson", [
+        {"topic": "Orders", "partition": 1, "offset": 7, "key": "a", "value": {"amount": 1}, "headers": {"source": "api"}},
+        {"topic": "Orders", "partition": 1, "offset": 5, "key": "b", "value": "plain"},
+        {"topic": "Orders", "partition": 1, "offset": 9, "key": "a"},
+    ])
+
+    partitions = replay.load_export(export, start_offset=5, end_offset=8)
+
+    records = partitions[("Orders", 1)]
+    assert [record["offset"] for record in records] == [5, 7]
+    assert base64.b64decode(records[1]["value"]) == b'{"amount": 1}'
+    assert base64.b64decode(records[0]["key"]) == b"b"
+    assert records[1]["headers"] == [{"source": list(b"api")}]
+    assert "value" not in replay.to_event_record({"topic": "Orders", "partition": 1, "offset": 9, "key": "a"})
+
+
+def test_build_events_splits_partition_into_batches():
+    records = [replay.to_event_record({"topic": "Orders", "partition": 0, "offset": i, "value": i}) for i in range(5)]
+
+    events = replay.build_events(records, batch_size=2)
+
+    assert [len(event["records"]["Orders-0"]) for event in events] == [2, 2, 1]
+    assert events[0]["eventSource"] == "aws:kafka"
+
+
+def test_replay_processes_partitions_in_parallel_workers(tmp_path):
+    export = write_export(tmp_path / "export.ndjson",
+                          [{"topic": "ServerlessKafkaTopic", "partition": i % 2, "offset": i // 2, "key": str(i), "value": {"n": i}} for i in range(10)])
+    arguments = replay.parse_arguments(["--export", export, "--batch-size", "2", "--workers", "2"])
+
+    results, duration = replay.replay(replay.create_tasks(arguments), arguments.workers)
+
+    assert [(result["partition"], result["records"], result["batches"], result["last_offset"], result["error"]) for result in results] == [
+        (0, 5, 3, 4, None), (1, 5, 3, 4, None)]
+    assert duration > 0
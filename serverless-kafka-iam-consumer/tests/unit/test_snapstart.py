@@ -0,0 +1,23 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import snapstart
+
+
+def test_hooks_are_not_registered_without_snapstart():
+    assert not snapstart.register_hooks(lambda: None, lambda: None, {})
+
+
+def test_hooks_are_registered_during_snapstart_initialization(monkeypatch):
+    registered = []
+    monkeypatch.setattr(snapstart, "register_before_snapshot", lambda hook: registered.append(("before", hook)))
+    monkeypatch.setattr(snapstart, "register_after_restore", lambda hook: registered.append(("after", hook)))
+
+    def before():
+        pass
+
+    def after():
+        pass
+
+    assert not snapstart.register_hooks(before, after, {"AWS_LAMBDA_INITIALIZATION_TYPE": "on-demand"})
+    assert snapstart.register_hooks(before, after, {"AWS_LAMBDA_INITIALIZATION_TYPE": "snap-start"})
+    assert registered == [("before", before), ("after", after)]
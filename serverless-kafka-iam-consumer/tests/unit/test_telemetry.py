@@ -0,0 +1,99 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import json
+import logging
+
+import pytest
+from aws_lambda_powertools.metrics import EphemeralMetrics, MetricUnit
+
+import telemetry
+import telemetry_extension
+from local_runtime_api import LocalRuntimeApi
+
+
+def create_channel(lines: list) -> telemetry.TelemetryChannel:
+    return telemetry.TelemetryChannel(write=lines.extend)
+
+
+def create_logger(channel: telemetry.TelemetryChannel) -> logging.Logger:
+    logger = logging.getLogger(f"telemetry-test-{id(channel)}")
+    logger.propagate = False
+    handler = telemetry.TelemetryLogHandler(channel)
+    handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+    logger.addHandler(handler)
+    return logger
+
+
+def test_channel_writes_directly_without_extension():
+    lines = []
+    channel = create_channel(lines)
+
+    channel.emit({"metric": 1})
+    create_logger(channel).warning("value %s", 1)
+
+    assert lines == ['{"metric":1}', "WARNING value 1"]
+
+
+def test_extension_ships_telemetry_after_the_invocation():
+    lines = []
+    channel = create_channel(lines)
+    runtime_api = LocalRuntimeApi()
+    extension = telemetry_extension.TelemetryExtension(channel, telemetry_extension.ExtensionsApiClient(runtime_api.address))
+    assert extension.start()
+    assert runtime_api.registrations == [(telemetry_extension.EXTENSION_NAME, ["INVOKE"])]
+    assert runtime_api.wait_for_extension()
+
+    @channel.flush_after_invocation
+    def handler(event, context):
+        channel.emit({"metric": 1})
+        create_logger(channel).warning("value %s", event["value"])
+        # Nothing is written during the invocation
+        assert lines == []
+        return "response"
+
+    runtime_api.invoke()
+    assert handler({"value": 1}, None) == "response"
+    assert runtime_api.wait_for_extension()
+
+    assert [line if line.startswith("WARNING") else json.loads(line) for line in lines] == [{"metric": 1}, "WARNING value 1"]
+    assert extension.flushes == 1
+    runtime_api.shutdown()
+
+
+def test_channel_emits_the_metrics_of_every_invocation_once(lambda_context):
+    lines = []
+    channel = create_channel(lines)
+    metrics = EphemeralMetrics(namespace="ServerlessKafka", service="ServerlessKafkaConsumer")
+
+    @channel.flush_after_invocation(metrics=metrics, capture_cold_start_metric=True)
+    def handler(event, context):
+        metrics.add_metric(name="Records", unit=MetricUnit.Count, value=event["records"])
+        if not event["records"]:
+            raise ValueError("empty batch")
+
+    handler({"records": 2}, lambda_context)
+    with pytest.raises(ValueError):
+        handler({"records": 0}, lambda_context)
+
+    documents = [json.loads(line) for line in lines]
+    assert [(document.get("ColdStart"), document.get("Records")) for document in documents] == [([1.0], None), (None, [2.0]), (None, [0.0])]
+    assert documents[0]["function_name"] == "ServerlessKafkaConsumerLambda"
+
+
+def test_extension_is_not_started_outside_of_lambda():
+    channel = create_channel([])
+
+    assert telemetry_extension.start_extension_from_environment(channel, {"TELEMETRY_EXTENSION_ENABLED": "yes"}) is None
+    assert telemetry_extension.start_extension_from_environment(channel, {"AWS_LAMBDA_RUNTIME_API": "127.0.0.1:1"}) is None
+    assert not channel.buffered
+
+
+def test_extension_falls_back_to_direct_writes_if_registration_fails():
+    lines = []
+    channel = create_channel(lines)
+
+    assert telemetry_extension.start_extension_from_environment(
+        channel, {"TELEMETRY_EXTENSION_ENABLED": "yes", "AWS_LAMBDA_RUNTIME_API": "127.0.0.1:1"}) is None
+    channel.emit({"metric": 1})
+
+    assert lines[-1] == '{"metric":1}'
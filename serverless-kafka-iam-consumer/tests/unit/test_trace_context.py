@@ -0,0 +1,57 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import trace_context
+from conftest import make_event, make_record
+
+TRACE_HEADER = "Root=1-5759e988-bd862e3fe1be46a994272793;Parent=53995c3f42cd8ad8;Sampled=1"
+
+
+def traced_record(trace_header: str, offset: int) -> dict:
+    record = make_record({"n": offset}, offset=offset)
+    record["headers"] = [{"other": list(b"x")}, {trace_context.TRACE_HEADER: list(trace_header.encode("utf-8"))}]
+    return record
+
+
+def test_parse_trace_header():
+    assert trace_context.parse_trace_header(TRACE_HEADER) == {"Root": "1-5759e988-bd862e3fe1be46a994272793", "Parent": "53995c3f42cd8ad8", "Sampled": "1"}
+
+
+def test_group_by_trace_skips_records_without_sampled_trace():
+    records = [traced_record(TRACE_HEADER, 0), traced_record(TRACE_HEADER, 1),
+               traced_record(TRACE_HEADER.replace("Sampled=1", "Sampled=0"), 2), make_record({"n": 3}, offset=3)]
+
+    traces = trace_context.group_by_trace(records)
+
+    assert list(traces) == [("1-5759e988-bd862e3fe1be46a994272793", "53995c3f42cd8ad8")]
+    assert [record["offset"] for record in traces[("1-5759e988-bd862e3fe1be46a994272793", "53995c3f42cd8ad8")]] == [0, 1]
+
+
+def test_link_sends_segment_with_broker_wait_and_processing_time():
+    documents = []
+    linker = trace_context.BatchTraceLinker("ServerlessKafkaConsumer", send=documents.append)
+    event = make_event([traced_record(TRACE_HEADER, 0), traced_record(TRACE_HEADER, 1)])
+
+    linked = linker.link(event, started_at=1690000002.0, ended_at=1690000003.0, consumer_trace_id="1-consumer")
+
+    assert linked == ["1-5759e988-bd862e3fe1be46a994272793"]
+    segment = documents[0]
+    assert (segment["trace_id"], segment["parent_id"]) == ("1-5759e988-bd862e3fe1be46a994272793", "53995c3f42cd8ad8")
+    assert segment["annotations"]["consumer_trace_id"] == "1-consumer"
+    assert segment["annotations"]["records"] == 2
+    assert [(s["name"], s["start_time"], s["end_time"]) for s in segment["subsegments"]] == [
+        ("Kafka", 1690000000.0, 1690000002.0), ("Processing", 1690000002.0, 1690000003.0)]
+
+
+def test_link_limits_segments_per_invocation():
+    documents = []
+    linker = trace_context.BatchTraceLinker("ServerlessKafkaConsumer", send=documents.append, max_segments=2)
+    event = make_event([traced_record(TRACE_HEADER.replace("Parent=53995c3f42cd8ad8", f"Parent={i:016x}"), i) for i in range(5)])
+
+    assert len(linker.link(event, started_at=1690000002.0)) == 2
+    assert len(documents) == 2
+
+
+def test_linker_is_disabled_without_tracing():
+    assert trace_context.create_linker_from_environment({"POWERTOOLS_TRACE_DISABLED": "1", "TRACE_LINKING_ENABLED": "yes"}) is None
+    assert trace_context.create_linker_from_environment({}) is None
+    assert trace_context.create_linker_from_environment({"TRACE_LINKING_ENABLED": "yes"}) is not None
@@ -0,0 +1,238 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+# Replays a range of records through the consumer handler locally, e.g. to backfill a downstream system after the
+# consumer logic changed. The records are read from a topic of the MSK cluster or from an NDJSON export and turned
+# into batches in the format of the MSK event source mapping, so app.lambda_handler processes them exactly like the
+# live consumer. Every partition is replayed by one worker process in offset order, partitions run in parallel.
+# The handler is configured through the same environment variables as the function. Run from the
+# "serverless-kafka-iam-consumer" directory:
+#
+#   python tools/replay.py --export orders.ndjson --workers 4
+#   python tools/replay.py --bootstrap-servers <brokers> --topic ServerlessKafkaTopic --start-offset 1000 --end-offset 5000
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Batch size of the event source mapping (function_event_source_batch_size)
+DEFAULT_BATCH_SIZE = 100
+
+
+# Minimal Lambda context passed to the handler, every invocation gets the full function timeout
+class ReplayContext:
+    function_name = "ServerlessKafkaConsumerReplay"
+    function_version = "$LATEST"
+    memory_limit_in_mb = 256
+    invoked_function_arn = "arn:aws:lambda:local:000000000000:function:ServerlessKafkaConsumerReplay"
+    aws_request_id = "replay"
+
+    def __init__(self, timeout_seconds: float = 150):
+        self.timeout_seconds = timeout_seconds
+
+    def get_remaining_time_in_millis(self) -> int:
+        return int(self.timeout_seconds * 1000)
+
+
+def _encode(value) -> str:
+    if value is None:
+        return None
+    if not isinstance(value, (str, bytes)):
+        value = json.dumps(value)
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return base64.b64encode(value).decode("utf-8")
+
+
+# Record headers in the format of the event source mapping: a list of {name: [byte values]}
+def to_event_headers(headers) -> list:
+    return [{name: list(value if isinstance(value, bytes) else str(value).encode("utf-8"))} for name, value in headers]
+
+
+# Converts an exported record into a record of the event source mapping. Exports contain one JSON object per line
+# with topic, partition, offset, optional timestamp and headers ({name: value}), key and value as plain strings or
+# JSON. Lines that were exported from an event (base64 encoded key and value) are kept as they are if "encoded" is set.
+def to_event_record(exported: dict, encoded: bool = False) -> dict:
+    if encoded:
+        return exported
+    record = {
+        "topic": exported["topic"],
+        "partition": int(exported["partition"]),
+        "offset": int(exported["offset"]),
+        "timestamp": exported.get("timestamp", int(time.time() * 1000)),
+        "timestampType": exported.get("timestampType", "CREATE_TIME"),
+        "key": _encode(exported.get("key")),
+        "value": _encode(exported.get("value")),
+        "headers": to_event_headers((exported.get("headers") or {}).items()),
+    }
+    # Like in the events of the event source mapping, records without key or value (tombstones) do not contain the field
+    return {field: value for field, value in record.items() if value is not None}
+
+
+# Converts a kafka-python ConsumerRecord into a record of the event source mapping
+def from_consumer_record(record) -> dict:
+    event_record = {
+        "topic": record.topic,
+        "partition": record.partition,
+        "offset": record.offset,
+        "timestamp": record.timestamp,
+        "timestampType": "LOG_APPEND_TIME" if record.timestamp_type == 1 else "CREATE_TIME",
+        "key": _encode(record.key),
+        "value": _encode(record.value),
+        "headers": to_event_headers(record.headers or []),
+    }
+    return {field: value for field, value in event_record.items() if value is not None}
+
+
+# Reads an NDJSON export and returns the records per (topic, partition) in offset order, limited to the offset range
+def load_export(path: str, start_offset: int = 0, end_offset: int = None, encoded: bool = False) -> dict:
+    partitions = {}
+    with open(path, encoding="utf-8") as export:
+        for line in export:
+            if not line.strip():
+                continue
+            record = to_event_record(json.loads(line), encoded)
+            if record["offset"] < start_offset or (end_offset is not None and record["offset"] > end_offset):
+                continue
+            partitions.setdefault((record["topic"], record["partition"]), []).append(record)
+    for records in partitions.values():
+        records.sort(key=lambda record: record["offset"])
+    return partitions
+
+
+# Splits the records of one partition into events of at most "batch_size" records
+def build_events(records: list, batch_size: int = DEFAULT_BATCH_SIZE, event_source_arn: str = None) -> list:
+    events = []
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        event = {"eventSource": "aws:kafka", "records": {f"{batch[0]['topic']}-{batch[0]['partition']}": batch}}
+        if event_source_arn:
+            event["eventSourceArn"] = event_source_arn
+        events.append(event)
+    return events
+
+
+# Reads the offset range of one partition from the cluster, in chunks of "batch_size" records
+def read_partition(bootstrap_servers: str, region: str, topic: str, partition: int, start_offset: int, end_offset: int, batch_size: int):
+    import kafka_sink
+    from kafka import TopicPartition
+
+    consumer = kafka_sink.create_iam_consumer(bootstrap_servers, region, max_poll_records=batch_size)
+    topic_partition = TopicPartition(topic, partition)
+    consumer.assign([topic_partition])
+    last_offset = consumer.end_offsets([topic_partition])[topic_partition] - 1
+    if end_offset is not None:
+        last_offset = min(last_offset, end_offset)
+    consumer.seek(topic_partition, max(start_offset, consumer.beginning_offsets([topic_partition])[topic_partition]))
+    try:
+        while consumer.position(topic_partition) <= last_offset:
+            polled = consumer.poll(timeout_ms=1000, max_records=batch_size).get(topic_partition, [])
+            records = [from_consumer_record(record) for record in polled if record.offset <= last_offset]
+            if records:
+                yield records
+    finally:
+        consumer.close()
+
+
+# Replays one partition in a worker process and returns its statistics. The handler (and the stages configured
+# through the environment) is imported once per worker process, like the init phase of a Lambda execution environment.
+# The first failing batch stops the partition, later batches are not processed so that the order is kept.
+def replay_partition(task: dict) -> dict:
+    # Same Powertools settings as the function, but without tracing and without logging every record
+    os.environ.setdefault("POWERTOOLS_TRACE_DISABLED", "1")
+    os.environ.setdefault("POWERTOOLS_METRICS_NAMESPACE", "ServerlessKafka")
+    os.environ.setdefault("POWERTOOLS_SERVICE_NAME", "ServerlessKafkaConsumerLambda")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import app
+
+    statistics = {"topic": task["topic"], "partition": task["partition"], "records": 0, "batches": 0, "last_offset": None, "error": None}
+    context = ReplayContext(task.get("timeout_seconds", 150))
+    if task.get("records") is not None:
+        chunks = [task["records"]]
+    else:
+        chunks = read_partition(task["bootstrap_servers"], task["region"], task["topic"], task["partition"],
+                                task["start_offset"], task["end_offset"], task["batch_size"])
+    start = time.perf_counter()
+    try:
+        for records in chunks:
+            for event in build_events(records, task["batch_size"], task.get("event_source_arn")):
+                batch = next(iter(event["records"].values()))
+                try:
+                    app.lambda_handler(event, context)
+                except Exception as error:
+                    statistics["error"] = f"Batch starting at offset {batch[0]['offset']} failed: {error!r}"
+                    return statistics
+                statistics["records"] += len(batch)
+                statistics["batches"] += 1
+                statistics["last_offset"] = batch[-1]["offset"]
+    finally:
+        statistics["seconds"] = time.perf_counter() - start
+    return statistics
+
+
+# Replays the partitions with one task per partition on "workers" processes, returns the statistics per partition
+# and the overall duration
+def replay(tasks: list, workers: int) -> tuple:
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(tasks)))) as executor:
+        results = list(executor.map(replay_partition, tasks))
+    return results, time.perf_counter() - start
+
+
+def print_report(results: list, duration: float) -> None:
+    print(f"{'partition':>32} | {'records':>9} | {'batches':>7} | {'last offset':>11} | {'records/s':>9}")
+    for result in results:
+        rate = result["records"] / result["seconds"] if result["seconds"] else 0
+        print(f"{result['topic'] + '-' + str(result['partition']):>32} | {result['records']:>9} | {result['batches']:>7} | "
+              f"{str(result['last_offset']):>11} | {rate:>9.0f}")
+        if result["error"]:
+            print(f"{'':>32}   {result['error']}")
+    total = sum(result["records"] for result in results)
+    print(f"{'total':>32} | {total:>9} | {sum(result['batches'] for result in results):>7} | {'':>11} | {total / duration if duration else 0:>9.0f}")
+
+
+def parse_arguments(arguments=None):
+    parser = argparse.ArgumentParser(description="Replays Kafka records through the consumer handler")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--export", help="NDJSON export with one record per line")
+    source.add_argument("--bootstrap-servers", help="IAM bootstrap servers of the MSK cluster")
+    parser.add_argument("--encoded", action="store_true", help="the export contains records of events (base64 encoded key and value)")
+    parser.add_argument("--topic", default=os.environ.get("TOPIC_NAME", "ServerlessKafkaTopic"), help="topic to read from the cluster")
+    parser.add_argument("--partitions", help="comma separated partitions to read from the cluster, default all")
+    parser.add_argument("--start-offset", type=int, default=0, help="first offset to replay")
+    parser.add_argument("--end-offset", type=int, help="last offset to replay, default the end of the partition")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="records per event")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--region", default=os.environ.get("AWS_REGION", "eu-central-1"))
+    parser.add_argument("--event-source-arn", help="eventSourceArn added to the events")
+    parser.add_argument("--timeout-seconds", type=float, default=150, help="remaining time reported to the handler")
+    return parser.parse_args(arguments)
+
+
+def create_tasks(arguments) -> list:
+    common = {"batch_size": arguments.batch_size, "event_source_arn": arguments.event_source_arn, "timeout_seconds": arguments.timeout_seconds}
+    if arguments.export:
+        partitions = load_export(arguments.export, arguments.start_offset, arguments.end_offset, arguments.encoded)
+        return [dict(common, topic=topic, partition=partition, records=records) for (topic, partition), records in sorted(partitions.items())]
+
+    if arguments.partitions:
+        partitions = [int(partition) for partition in arguments.partitions.split(",")]
+    else:
+        import kafka_sink
+        consumer = kafka_sink.create_iam_consumer(arguments.bootstrap_servers, arguments.region)
+        partitions = sorted(consumer.partitions_for_topic(arguments.topic) or [])
+        consumer.close()
+    return [dict(common, topic=arguments.topic, partition=partition, records=None, bootstrap_servers=arguments.bootstrap_servers,
+                 region=arguments.region, start_offset=arguments.start_offset, end_offset=arguments.end_offset) for partition in partitions]
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    results, duration = replay(create_tasks(arguments), arguments.workers)
+    print_report(results, duration)
+    sys.exit(1 if any(result["error"] for result in results) else 0)
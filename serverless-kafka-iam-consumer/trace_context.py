@@ -0,0 +1,133 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+import json
+import os
+import secrets
+import socket
+import time
+
+from aws_lambda_powertools import Logger
+
+logger = Logger(child=True)
+
+# Record header written by the producer (SimpleApiGatewayKafkaProxy.TRACE_HEADER) with the X-Ray trace header of the request
+TRACE_HEADER = "X-Amzn-Trace-Id"
+
+# Header of the segment documents sent to the X-Ray daemon
+DAEMON_DOCUMENT_HEADER = '{"format": "json", "version": 1}\n'
+
+
+# Parses an X-Ray trace header ("Root=...;Parent=...;Sampled=1") into a dict of its fields
+def parse_trace_header(value: str) -> dict:
+    fields = {}
+    for field in value.split(";"):
+        name, _, field_value = field.strip().partition("=")
+        if name:
+            fields[name] = field_value
+    return fields
+
+
+# Returns the value of a record header of the event source mapping (a list of {name: [byte values]}) or None
+def record_header(record: dict, name: str):
+    for header in record.get("headers") or []:
+        if name in header:
+            return bytes(header[name])
+    return None
+
+
+# Groups the records of a topic partition batch by the trace (root, parent) they were produced in. Records without
+# trace header or produced in traces that were not sampled are skipped, there is nothing to link them to.
+def group_by_trace(records: list) -> dict:
+    traces = {}
+    for record in records:
+        value = record_header(record, TRACE_HEADER)
+        if value is None:
+            continue
+        fields = parse_trace_header(value.decode("utf-8", errors="replace"))
+        if fields.get("Root") and fields.get("Parent") and fields.get("Sampled") == "1":
+            traces.setdefault((fields["Root"], fields["Parent"]), []).append(record)
+    return traces
+
+
+# Sends segment documents to the X-Ray daemon over UDP, the address is provided by Lambda in AWS_XRAY_DAEMON_ADDRESS
+class DaemonSender:
+    def __init__(self, address: str = None):
+        host, _, port = (address or os.environ.get("AWS_XRAY_DAEMON_ADDRESS", "127.0.0.1:2000")).rpartition(":")
+        self.address = (host, int(port))
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def __call__(self, document: dict) -> None:
+        self._socket.sendto((DAEMON_DOCUMENT_HEADER + json.dumps(document)).encode("utf-8"), self.address)
+
+
+# Links the batches of an invocation to the traces of the requests that produced their records. For every source
+# trace a segment is added to that trace as child of the producer, with a subsegment for the time the records waited
+# in the broker and in the event source mapping (from the record timestamp to the start of the invocation) and one
+# for the processing. The segments carry the trace ID of the invocation as annotation, and the invocation segment
+# lists the linked traces, so both sides of the Kafka hop can be found from each other.
+class BatchTraceLinker:
+    def __init__(self, name: str, send=None, max_segments: int = 100):
+        self.name = name
+        self.max_segments = max_segments
+        self._send = send
+
+    @property
+    def send(self):
+        if self._send is None:
+            self._send = DaemonSender()
+        return self._send
+
+    def _segment(self, root: str, parent: str, topic_partition: str, records: list, started_at: float, ended_at: float, consumer_trace_id: str) -> dict:
+        produced_at = min(record["timestamp"] for record in records) / 1000
+        return {
+            "name": self.name,
+            "id": secrets.token_hex(8),
+            "trace_id": root,
+            "parent_id": parent,
+            "start_time": min(produced_at, started_at),
+            "end_time": ended_at,
+            "origin": "AWS::Lambda::Function",
+            "annotations": {
+                "topic_partition": topic_partition,
+                "records": len(records),
+                "first_offset": records[0]["offset"],
+                "last_offset": records[-1]["offset"],
+                "consumer_trace_id": consumer_trace_id or "",
+            },
+            "subsegments": [
+                {"id": secrets.token_hex(8), "name": "Kafka", "namespace": "remote", "start_time": min(produced_at, started_at), "end_time": started_at},
+                {"id": secrets.token_hex(8), "name": "Processing", "start_time": started_at, "end_time": ended_at},
+            ],
+        }
+
+    # Sends one segment per source trace of the event and returns the IDs of the linked traces. At most "max_segments"
+    # segments are sent per invocation, so a batch of unrelated requests does not flood the daemon.
+    def link(self, event: dict, started_at: float, ended_at: float = None, consumer_trace_id: str = None) -> list:
+        ended_at = ended_at if ended_at is not None else time.time()
+        linked = []
+        for topic_partition, records in event.get("records", {}).items():
+            for (root, parent), trace_records in group_by_trace(records).items():
+                if len(linked) >= self.max_segments:
+                    return linked
+                try:
+                    self.send(self._segment(root, parent, topic_partition, trace_records, started_at, ended_at, consumer_trace_id))
+                except OSError:
+                    logger.exception("Could not send the segment of a linked trace")
+                    return linked
+                linked.append(root)
+        return linked
+
+
+# Returns the trace ID of the current invocation from the trace header Lambda sets in _X_AMZN_TRACE_ID
+def current_trace_id(environment=os.environ):
+    return parse_trace_header(environment.get("_X_AMZN_TRACE_ID", "")).get("Root")
+
+
+# Creates the linker or returns None if tracing is disabled (POWERTOOLS_TRACE_DISABLED) or TRACE_LINKING_ENABLED is not "yes"
+def create_linker_from_environment(environment=os.environ):
+    if environment.get("POWERTOOLS_TRACE_DISABLED", "false").lower() in ("1", "true") or environment.get("TRACE_LINKING_ENABLED", "no") != "yes":
+        return None
+    return BatchTraceLinker(
+        name=environment.get("POWERTOOLS_SERVICE_NAME", "ServerlessKafkaConsumer"),
+        max_segments=int(environment.get("TRACE_LINKING_MAX_SEGMENTS", 100)),
+    )